@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import deadline
+from breaker import CircuitBreaker
+
+
+POOL_CONNECTIONS = int(os.getenv('API_POOL_CONNECTIONS', 4))
+POOL_MAXSIZE = int(os.getenv('API_POOL_MAXSIZE', 50))
+POOL_BLOCK = os.getenv('API_POOL_BLOCK', 'true').lower() == 'true'
+CONDITIONAL = os.getenv('API_CONDITIONAL', 'true').lower() == 'true'
+ACCEPT_ENCODING = 'gzip, deflate'
+BREAKER = os.getenv('API_BREAKER', 'true').lower() == 'true'
+CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('API_READ_TIMEOUT', 30))
+
+
+def upstream_failed(status):
+    """Ответ говорит о сбое самого API, а не о запросе пользователя."""
+    return status is not None and (status >= 500 or status == 429)
+
+
+class PracticumClient:
+    """Долгоживущий HTTP-клиент API Практикума с пулом соединений.
+
+    pool_connections — сколько хостов держать в пуле, pool_maxsize —
+    сколько keep-alive соединений хранить для одного хоста, pool_block —
+    ждать ли свободного соединения вместо открытия лишнего.
+
+    Ответы запрашиваются сжатыми. Если conditional включён, ETag и
+    Last-Modified ответа запоминаются для пары адрес и токен, и следующий
+    запрос того же пользователя становится условным.
+
+    Все запросы проходят через общий CircuitBreaker: сетевые ошибки,
+    ответы 5xx и 429 и медленные ответы размыкают цепь, после чего
+    запросы сразу завершаются CircuitOpen. breaker=None отключает
+    предохранитель.
+
+    connect_timeout ограничивает установку соединения, read_timeout —
+    ожидание каждой порции ответа. Внутри deadline.budget() оба
+    ограничения урезаются до остатка срока цикла, а запрос после
+    истечения срока не отправляется вовсе.
+
+    session — транспорт с методом get(**parameters); по умолчанию
+    requests.Session с пулом соединений. Подменив его, можно прогонять
+    цикл опроса на записанных или синтетических ответах.
+    """
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE, pool_block=POOL_BLOCK,
+                 conditional=CONDITIONAL, breaker=BREAKER, session=None,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        self.adapter = HTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize,
+                                   pool_block=pool_block)
+        if session is None:
+            session = requests.Session()
+            session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+        self.session = session
+        self.conditional = conditional
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        if breaker is True:
+            breaker = CircuitBreaker()
+        self.breaker = breaker or None
+        self.validators = {}
+        self.sizes = {}
+        self.lock = threading.Lock()
+        self.not_modified = 0
+        self.bytes_wire = self.bytes_decoded = self.bytes_skipped = 0
+
+    def get(self, **parameters):
+        """Выполняется GET-запрос через общий пул соединений."""
+        key = (parameters.get('url'),
+               (parameters.get('headers') or {}).get('Authorization'))
+        validators = self.validators.get(key) if self.conditional else None
+        if validators:
+            parameters['headers'] = dict(parameters['headers'], **validators)
+        parameters.setdefault('timeout', self.timeout())
+        response = self.request(parameters)
+        if not parameters.get('stream'):
+            self.account(key, response)
+        return response
+
+    def timeout(self):
+        """Пара (connect, read) для requests с учётом срока цикла."""
+        left = deadline.remaining()
+        if left is None:
+            return self.connect_timeout, self.read_timeout
+        deadline.check('запрос к API')
+        return min(self.connect_timeout, left), min(self.read_timeout, left)
+
+    def request(self, parameters):
+        """Запрос через предохранитель с учётом исхода и задержки."""
+        if self.breaker is None:
+            return self.session.get(**parameters)
+        probe = self.breaker.before()
+        started = time.perf_counter()
+        try:
+            response = self.session.get(**parameters)
+        except Exception:
+            self.breaker.record(time.perf_counter() - started, True, probe)
+            raise
+        self.breaker.record(
+            time.perf_counter() - started,
+            upstream_failed(getattr(response, 'status_code', None)), probe)
+        return response
+
+    def account(self, key, response):
+        """Учитываются валидаторы кэша и объём ответа."""
+        status = getattr(response, 'status_code', None)
+        headers = getattr(response, 'headers', None) or {}
+        with self.lock:
+            if status == 304:
+                self.not_modified += 1
+                self.bytes_skipped += self.sizes.get(key, 0)
+                return
+            if status != 200:
+                return
+            content = getattr(response, 'content', None)
+            if isinstance(content, (bytes, bytearray)):
+                raw = getattr(response, 'raw', None)
+                wire = raw.tell() if hasattr(raw, 'tell') else len(content)
+                self.sizes[key] = len(content)
+                self.bytes_wire += wire
+                self.bytes_decoded += len(content)
+            validators = {
+                name: headers[header] for name, header in (
+                    ('If-None-Match', 'ETag'),
+                    ('If-Modified-Since', 'Last-Modified'))
+                if header in headers
+            }
+            if validators:
+                self.validators[key] = validators
+            else:
+                self.validators.pop(key, None)
+
+    def stats(self):
+        """Счётчики запросов и соединений по активным пулам хостов."""
+        pools = self.adapter.poolmanager.pools
+        requests_count = connections = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_count += pool.num_requests
+            connections += pool.num_connections
+        return {
+            'requests': requests_count,
+            'connections': connections,
+            'reused': max(requests_count - connections, 0),
+            'not_modified': self.not_modified,
+            'bytes_wire': self.bytes_wire,
+            'bytes_decoded': self.bytes_decoded,
+            'bytes_saved': (self.bytes_decoded - self.bytes_wire
+                            + self.bytes_skipped),
+        }
+
+    def close(self):
+        """Закрываются все соединения пула."""
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Возвращается общий для всех запросов к ENDPOINT клиент."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PracticumClient()
+    return _client
+
+
+def set_client(client):
+    """Общий клиент заменяется на client; возвращается прежний."""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    return previous
@@ -0,0 +1,178 @@
+import argparse
+import calendar
+import csv
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import homework
+from api_client import PracticumClient
+from api_client import set_client
+from records import Homework
+from records import api_timestamp
+from storage import StatusStore
+from storage import tenant_key
+
+
+BACKFILL_CONCURRENCY = int(os.getenv('BACKFILL_CONCURRENCY', 4))
+BACKFILL_SINCE = os.getenv('BACKFILL_SINCE', '2019-01-01')
+SINCE_FORMAT = '%Y-%m-%d'
+FIELDS = ('tenant', 'homework_name', 'status', 'date_updated',
+          'lesson_name')
+FORMATS = ('csv', 'jsonl', 'parquet')
+NO_PYARROW = 'Для выгрузки в parquet нужен пакет pyarrow'
+NO_TOKENS = 'Не задан PRACTICUM_TOKEN и не передан файл пользователей'
+TENANT_FAILED = 'История пользователя {tenant} не загружена: {fault}'
+INVALID_HOMEWORK = 'Пропущена работа пользователя {tenant}: {fault}'
+BACKFILL_DONE = ('Загружена история пользователей: {tenants}, не '
+                 'загружена: {failed}; записей {entries}, новых в истории '
+                 '{stored}')
+
+
+def fetch_history(token, start, end):
+    """Работы пользователя, изменённые в [start, end).
+
+    У API есть только нижняя граница from_date, поэтому история
+    загружается одним запросом от start, ответ разбирается потоково, а
+    работы позже end отбрасываются по date_updated. Работы проверяются
+    Homework.from_payload, как при опросе; некорректные пропускаются.
+    """
+    stream = homework.stream_homeworks(start, homework.auth_headers(token))
+    key = tenant_key(token)
+    entries = []
+    for item in homework.check_stream(stream):
+        try:
+            record = Homework.from_payload(item)
+        except KeyError as error:
+            logging.warning(INVALID_HOMEWORK.format(tenant=key, fault=error))
+            continue
+        updated = api_timestamp(record.date_updated)
+        if updated is not None and not start <= updated < end:
+            continue
+        entries.append({
+            'tenant': key,
+            'homework_name': record.name,
+            'status': record.status.value,
+            'date_updated': record.date_updated,
+            'lesson_name': item.get('lesson_name'),
+        })
+    return entries
+
+
+def dedupe(entries):
+    """Убираются повторы записей; порядок — по времени."""
+    unique = {
+        (entry['tenant'], entry['homework_name'], entry['status'],
+         entry['date_updated']): entry
+        for entry in entries
+    }
+    return sorted(unique.values(), key=lambda entry: (
+        entry['tenant'], entry['date_updated'] or '',
+        entry['homework_name'] or ''))
+
+
+def backfill(tokens, start, end, concurrency=BACKFILL_CONCURRENCY):
+    """История пользователей tokens за [start, end).
+
+    На пользователя приходится один потоковый запрос; одновременно
+    загружается не больше concurrency пользователей. Возвращаются записи
+    без повторов и число пользователей, историю которых загрузить не
+    удалось.
+    """
+    entries, failed = [], 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(fetch_history, token, start, end)
+                   for token in tokens]
+        for token, future in zip(tokens, futures):
+            try:
+                entries.extend(future.result())
+            except Exception as error:
+                failed += 1
+                logging.error(TENANT_FAILED.format(
+                    tenant=tenant_key(token), fault=error))
+    return dedupe(entries), failed
+
+
+def store_history(store, entries):
+    """Записи дописываются в историю хранилища; возвращается число новых."""
+    rows = {}
+    for entry in entries:
+        changed_at = api_timestamp(entry['date_updated'])
+        if changed_at is not None:
+            rows.setdefault(entry['tenant'], []).append(
+                (entry['homework_name'], entry['status'], changed_at))
+    return sum(store.add_history(key, tenant_rows)
+               for key, tenant_rows in rows.items())
+
+
+def export(entries, path, file_format='csv'):
+    """Записи выгружаются в CSV, JSON Lines или parquet."""
+    if file_format == 'parquet':
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError(NO_PYARROW)
+        table = pyarrow.table({
+            field: [entry[field] for entry in entries] for field in FIELDS})
+        pyarrow.parquet.write_table(table, path)
+        return
+    with open(path, 'w', encoding='UTF-8', newline='') as file:
+        if file_format == 'jsonl':
+            for entry in entries:
+                file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            return
+        writer = csv.DictWriter(file, FIELDS)
+        writer.writeheader()
+        writer.writerows(entries)
+
+
+def read_tokens(tenants):
+    """Токены из файла пользователей или PRACTICUM_TOKEN."""
+    if tenants:
+        from engine import load_entries
+        return [entry['token'] for entry in load_entries(tenants)]
+    if homework.PRACTICUM_TOKEN:
+        return [homework.PRACTICUM_TOKEN]
+    raise ValueError(NO_TOKENS)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='homework.py backfill',
+        description='Загрузка истории работ из API Практикума')
+    parser.add_argument('--since', default=BACKFILL_SINCE,
+                        help='начало истории, ГГГГ-ММ-ДД')
+    parser.add_argument('--until', help='конец истории, ГГГГ-ММ-ДД')
+    parser.add_argument('--concurrency', type=int,
+                        default=BACKFILL_CONCURRENCY)
+    parser.add_argument('--tenants', default=os.getenv('TENANTS_FILE'))
+    parser.add_argument('--output')
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--no-store', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Подкоманда backfill; код возврата 1, если часть истории не загружена."""
+    args = parse_args(argv)
+    start = calendar.timegm(time.strptime(args.since, SINCE_FORMAT))
+    end = (calendar.timegm(time.strptime(args.until, SINCE_FORMAT))
+           if args.until else int(time.time()) + 1)
+    set_client(PracticumClient(conditional=False,
+                               pool_maxsize=max(args.concurrency, 1)))
+    tokens = read_tokens(args.tenants)
+    entries, failed = backfill(tokens, start, end, args.concurrency)
+    stored = 0
+    if not args.no_store:
+        store = StatusStore()
+        stored = store_history(store, entries)
+        store.close()
+    if args.output:
+        export(entries, args.output, args.format)
+    logging.info(BACKFILL_DONE.format(
+        tenants=len(tokens) - failed,
+        failed=failed, entries=len(entries), stored=stored))
+    return 1 if failed else 0
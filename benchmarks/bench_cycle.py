@@ -0,0 +1,170 @@
+"""Бенчмарк цикла опроса: N пользователей против локальных заглушек.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_cycle --tenants 500 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+from telegram import Bot
+from telegram.utils.request import Request
+
+import homework
+from api_client import get_client
+from benchmarks.stubs import PracticumHandler, StubServer, TelegramHandler
+from engine import PollingEngine, Tenant
+from scheduler import AdaptiveSchedule
+from send_queue import SendQueue
+from storage import StatusStore
+
+BOT_TOKEN = '123:bench'
+
+
+class MeasuredEngine(PollingEngine):
+    """Движок опроса, который замеряет длительность каждого цикла."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durations = []
+        self.durations_lock = threading.Lock()
+
+    def poll(self, tenant):
+        started = time.perf_counter()
+        try:
+            return super().poll(tenant)
+        finally:
+            duration = time.perf_counter() - started
+            with self.durations_lock:
+                self.durations.append(duration)
+
+
+def percentile(values, share):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def rss_kb():
+    """Текущий RSS процесса в килобайтах (пиковый, если нет /proc)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def run_for(engine, duration):
+    task = asyncio.ensure_future(engine.run())
+    await asyncio.sleep(duration)
+    engine.stop()
+    await task
+
+
+def run_benchmark(tenants=100, duration=10.0, interval=1.0, concurrency=50,
+                  latency=0.0, error_rate=0.0, telegram_error_rate=0.0,
+                  payload=1, seed=None, send_workers=8, stable=False,
+                  compress=False):
+    """Запускается бенчмарк и возвращается словарь с результатами."""
+    practicum = StubServer(PracticumHandler, latency, error_rate, payload,
+                           seed, stable, compress)
+    telegram = StubServer(TelegramHandler, latency, telegram_error_rate,
+                          seed=seed)
+    with practicum, telegram:
+        endpoint = homework.ENDPOINT
+        homework.ENDPOINT = f'{practicum.url}/api/user_api/homework_statuses/'
+        bot = Bot(BOT_TOKEN, base_url=f'{telegram.url}/bot',
+                  request=Request(con_pool_size=send_workers))
+        outbound = SendQueue(bot, workers=send_workers,
+                             global_rate=10 ** 6, chat_rate=10 ** 6)
+        store = StatusStore(':memory:')
+        policy = AdaptiveSchedule(intervals={}, default=interval,
+                                  max_interval=interval, jitter=0.1)
+        engine = MeasuredEngine(
+            outbound,
+            [Tenant(f'token{number}', number) for number in range(tenants)],
+            concurrency=concurrency, retry_time=interval, policy=policy,
+            store=store)
+        rss_before = rss_kb()
+        started = time.perf_counter()
+        try:
+            asyncio.run(run_for(engine, duration))
+            elapsed = time.perf_counter() - started
+            outbound.join()
+            drained = time.perf_counter() - started - elapsed
+        finally:
+            homework.ENDPOINT = endpoint
+            outbound.close()
+            store.close()
+    durations = engine.durations
+    return {
+        'tenants': tenants,
+        'polls': len(durations),
+        'polls_per_sec': round(len(durations) / elapsed, 1),
+        'p50_ms': round(percentile(durations, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 2),
+        'rss_kb': rss_kb(),
+        'rss_growth_kb': rss_kb() - rss_before,
+        'api_requests': practicum.requests,
+        'api_not_modified': practicum.not_modified,
+        'api_client': get_client().stats(),
+        'telegram_requests': telegram.requests,
+        'send': outbound.stats(),
+        'send_drain_sec': round(drained, 2),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='интервал опроса одного пользователя, с')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='задержка ответа заглушек, с')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--telegram-error-rate', type=float, default=0.0)
+    parser.add_argument('--payload', type=int, default=1,
+                        help='число работ в ответе API')
+    parser.add_argument('--stable', action='store_true',
+                        help='статусы не меняются, API отвечает 304')
+    parser.add_argument('--compress', action='store_true',
+                        help='API отвечает gzip')
+    parser.add_argument('--send-workers', type=int, default=8)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--log-level', default='CRITICAL')
+    parser.add_argument('--min-polls-per-sec', type=float,
+                        help='порог: ниже — код возврата 1')
+    parser.add_argument('--max-p99-ms', type=float,
+                        help='порог: выше — код возврата 1')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    result = run_benchmark(
+        args.tenants, args.duration, args.interval, args.concurrency,
+        args.latency, args.error_rate, args.telegram_error_rate,
+        args.payload, args.seed, args.send_workers, args.stable,
+        args.compress)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if (args.min_polls_per_sec is not None
+            and result['polls_per_sec'] < args.min_polls_per_sec):
+        return 1
+    if args.max_p99_ms is not None and result['p99_ms'] > args.max_p99_ms:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Бенчмарк памяти: байт на одну работу в словарях API и в записях Homework.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_memory --homeworks 100000
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+import decoding
+from benchmarks.stubs import make_homeworks
+from records import to_records
+
+
+def traced(build):
+    """Результат build() и объём памяти, которую он удерживает."""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    return result, tracemalloc.get_traced_memory()[0] - before
+
+
+def run_benchmark(homeworks=10000, seed=1):
+    """Замеряется память одной и той же выборки работ в обоих видах."""
+    body = json.dumps({'homeworks': make_homeworks(
+        homeworks, random.Random(seed))}).encode()
+    tracemalloc.start()
+    try:
+        items, dict_bytes = traced(
+            lambda: decoding.loads(body)['homeworks'])
+        del items
+        records, record_bytes = traced(
+            lambda: to_records(decoding.loads(body)['homeworks']))
+    finally:
+        tracemalloc.stop()
+    items = decoding.loads(body)['homeworks']
+    started = time.perf_counter()
+    to_records(items)
+    convert = time.perf_counter() - started
+    return {
+        'homeworks': len(records),
+        'json_backend': decoding.BACKEND,
+        'dict_bytes_per_homework': round(dict_bytes / homeworks, 1),
+        'record_bytes_per_homework': round(record_bytes / homeworks, 1),
+        'convert_us_per_homework': round(convert / homeworks * 1e6, 3),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--homeworks', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-record-bytes', type=float,
+                        help='порог: больше байт на запись — код возврата 1')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run_benchmark(args.homeworks, args.seed)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if (args.max_record_bytes is not None
+            and result['record_bytes_per_homework'] > args.max_record_bytes):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
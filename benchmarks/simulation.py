@@ -0,0 +1,306 @@
+"""Ускоренное моделирование цикла опроса на виртуальных часах.
+
+Запросы к API уходят не в сеть, а в подменный транспорт: кассету с
+записанными ответами настоящего API или генератор смен статусов. Цикл
+get_api_answer → parse_status → send_message идёт без ожидания, так что
+месяцы работы бота проходят за секунды.
+
+Запуск из корня проекта:
+    python -m benchmarks.simulation synthetic --days 90 --homeworks 5
+    python -m benchmarks.simulation record cassette.jsonl
+    python -m benchmarks.simulation replay cassette.jsonl --days 30
+"""
+import argparse
+import itertools
+import json
+import logging
+import random
+import sys
+import threading
+import time
+
+import homework
+from api_client import PracticumClient, set_client
+from breaker import CircuitBreaker
+from scheduler import AdaptiveSchedule
+from storage import StatusStore
+from suppression import ErrorSuppressor
+
+DAY = 86400
+TOKEN = 'simulation'
+CHAT_ID = 'simulation'
+KEPT_HEADERS = ('ETag', 'Last-Modified')
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+EMPTY_CASSETTE = 'В кассете {path} нет ни одного ответа'
+
+
+class VirtualClock:
+    """Часы, время которых идёт только в sleep().
+
+    time() и monotonic() возвращают одно и то же виртуальное время.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    monotonic = time
+
+    def sleep(self, delay):
+        self.now += max(delay, 0)
+
+
+class Response:
+    """Ответ подменного транспорта с нужной боту частью requests.Response."""
+
+    def __init__(self, status_code=200, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    @classmethod
+    def of(cls, data, status_code=200, headers=None):
+        """Ответ с телом data в JSON."""
+        return cls(status_code, json.dumps(data).encode(), headers)
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class Recorder:
+    """Транспорт, который дописывает ответы transport в кассету path.
+
+    Кассета — JSON Lines: параметры запроса, код статуса, заголовки
+    ETag и Last-Modified и тело ответа. Заголовки запроса, а с ними и
+    токен, в кассету не пишутся.
+    """
+
+    def __init__(self, transport, path):
+        self.transport = transport
+        self.file = open(path, 'a', encoding='UTF-8')
+        self.lock = threading.Lock()
+
+    def get(self, **parameters):
+        response = self.transport.get(**parameters)
+        entry = {
+            'params': parameters.get('params'),
+            'status': response.status_code,
+            'headers': {name: response.headers[name]
+                        for name in KEPT_HEADERS if name in response.headers},
+            'body': response.content.decode('UTF-8'),
+        }
+        with self.lock:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.file.flush()
+        return response
+
+    def close(self):
+        self.file.close()
+
+
+class Cassette:
+    """Транспорт, который по кругу отдаёт ответы из кассеты."""
+
+    def __init__(self, path):
+        with open(path, encoding='UTF-8') as file:
+            self.entries = [json.loads(line) for line in file if line.strip()]
+        if not self.entries:
+            raise ValueError(EMPTY_CASSETTE.format(path=path))
+        self.replayed = 0
+
+    def get(self, **parameters):
+        entry = self.entries[self.replayed % len(self.entries)]
+        self.replayed += 1
+        return Response(entry['status'], entry['body'].encode('UTF-8'),
+                        entry['headers'])
+
+
+class SyntheticApi:
+    """Транспорт-генератор смен статусов работ на виртуальных часах.
+
+    В каждом из slots потоков работ очередная работа попадает на ревью,
+    затем становится approved (с вероятностью approve) или rejected.
+    Отклонённая после доработки снова уходит на ревью, за принятой
+    приходит следующая работа. Ревью длится в среднем review секунд,
+    доработка — rework секунд, оба срока распределены экспоненциально.
+    Как и настоящий API, ответ содержит работы, изменившиеся не раньше
+    from_date, и current_date; доля error_rate ответов — ошибка 500.
+    """
+
+    def __init__(self, clock, slots=3, review=DAY, rework=2 * DAY,
+                 approve=0.7, error_rate=0, rng=None):
+        self.clock = clock
+        self.review = review
+        self.rework = rework
+        self.approve = approve
+        self.error_rate = error_rate
+        self.rng = rng or random.Random()
+        self.numbers = itertools.count()
+        self.works = [self.submit(clock.time()) for _ in range(slots)]
+        self.changes = slots
+        self.requests = 0
+
+    def submit(self, now, name=None):
+        """Работа уходит на ревью; [имя, статус, время смены, след. смена]."""
+        if name is None:
+            name = f'project_{next(self.numbers)}.zip'
+        return [name, 'reviewing', now,
+                now + self.rng.expovariate(1 / self.review)]
+
+    def advance(self, work):
+        """Работа проходит все смены статуса до текущего времени."""
+        now = self.clock.time()
+        while work[3] <= now:
+            name, status, _, changed_at = work
+            if status == 'reviewing':
+                verdict = ('approved' if self.rng.random() < self.approve
+                           else 'rejected')
+                work[:] = [name, verdict, changed_at, changed_at
+                           + self.rng.expovariate(1 / self.rework)]
+            else:
+                work[:] = self.submit(
+                    changed_at, name if status == 'rejected' else None)
+            self.changes += 1
+
+    def get(self, **parameters):
+        self.requests += 1
+        if self.rng.random() < self.error_rate:
+            return Response.of({'code': 'server_error'}, 500)
+        from_date = int(parameters['params']['from_date'])
+        for work in self.works:
+            self.advance(work)
+        changed = sorted(
+            (work for work in self.works if work[2] >= from_date),
+            key=lambda work: work[2], reverse=True)
+        return Response.of({
+            'homeworks': [{
+                'homework_name': name,
+                'status': status,
+                'date_updated': time.strftime(
+                    DATE_FORMAT, time.gmtime(changed_at)),
+            } for name, status, changed_at, _ in changed],
+            'current_date': int(self.clock.time()),
+        })
+
+
+class MessageLog:
+    """Бот-заглушка: сообщения копятся в списке вместо Telegram."""
+
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+def simulate(transport, clock, days=30, cycles=None, bot=None,
+             store_path=':memory:', seed=None):
+    """Цикл опроса homework.poll_loop прогоняется на виртуальных часах.
+
+    Запросы к API идут в transport, сообщения — в bot (по умолчанию
+    MessageLog). Моделирование длится days виртуальных суток или cycles
+    циклов, если они заданы. Возвращается словарь с итогами и
+    хранилище статусов.
+    """
+    bot = MessageLog() if bot is None else bot
+    store = StatusStore(store_path, clock=clock.time)
+    client = PracticumClient(
+        session=transport, breaker=CircuitBreaker(clock=clock.monotonic))
+    schedule = AdaptiveSchedule(default=homework.RETRY_TIME,
+                                rng=random.Random(seed))
+    errors = ErrorSuppressor(clock=clock.monotonic)
+    end = clock.time() + days * DAY
+    counter = itertools.count(1)
+
+    def sleep(delay):
+        clock.sleep(delay)
+        done = next(counter)
+        return done >= cycles if cycles else clock.time() >= end
+
+    previous = set_client(client)
+    tokens = homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID
+    homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID = TOKEN, CHAT_ID
+    started = clock.time()
+    wall = time.perf_counter()
+    try:
+        homework.poll_loop(bot, store, schedule, errors, sleep, clock.time)
+    finally:
+        wall = time.perf_counter() - wall
+        homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID = tokens
+        set_client(previous)
+    done = next(counter) - 1
+    return {
+        'cycles': done,
+        'virtual_days': round((clock.time() - started) / DAY, 2),
+        'messages': len(getattr(bot, 'messages', ())),
+        'wall_seconds': round(wall, 3),
+        'cycles_per_sec': round(done / wall) if wall else 0,
+        'breaker_trips': client.breaker.trips,
+    }, store
+
+
+def record(path):
+    """Бот работает как обычно, ответы API дописываются в кассету."""
+    from logs import setup_logging
+
+    setup_logging()
+    client = PracticumClient()
+    client.session = Recorder(client.session, path)
+    set_client(client)
+    homework.main()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    synthetic = commands.add_parser('synthetic')
+    synthetic.add_argument('--homeworks', type=int, default=3)
+    synthetic.add_argument('--review', type=float, default=DAY)
+    synthetic.add_argument('--rework', type=float, default=2 * DAY)
+    synthetic.add_argument('--error-rate', type=float, default=0)
+    replay = commands.add_parser('replay')
+    replay.add_argument('path')
+    commands.add_parser('record').add_argument('path')
+    for command in (synthetic, replay):
+        command.add_argument('--days', type=float, default=30)
+        command.add_argument('--cycles', type=int)
+        command.add_argument('--seed', type=int)
+        command.add_argument('--min-cycles-per-sec', type=float)
+        command.add_argument('--log-level', default='CRITICAL')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'record':
+        record(args.path)
+        return 0
+    logging.basicConfig(level=args.log_level)
+    clock = VirtualClock(time.time())
+    if args.command == 'synthetic':
+        transport = SyntheticApi(
+            clock, args.homeworks, args.review, args.rework,
+            error_rate=args.error_rate, rng=random.Random(args.seed))
+    else:
+        transport = Cassette(args.path)
+    result, store = simulate(transport, clock, args.days, args.cycles,
+                             seed=args.seed)
+    store.close()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if (args.min_cycles_per_sec is not None
+            and result['cycles_per_sec'] < args.min_cycles_per_sec):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Локальные заглушки API Практикума и Telegram Bot API для бенчмарков."""
+import gzip
+import json
+import random
+import zlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+
+
+def make_homeworks(count, rng, stable=False):
+    """Список работ в формате ответа API Практикума."""
+    return [{
+        'id': number,
+        'homework_name': f'project_{number}.zip',
+        'status': (STATUSES[number % len(STATUSES)] if stable
+                   else rng.choice(STATUSES)),
+        'reviewer_comment': 'x' * 100,
+        'date_updated': '2022-01-01T00:00:00Z',
+        'lesson_name': f'Проект {number}',
+    } for number in range(count)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, data, headers=()):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if (self.server.compress
+                and 'gzip' in self.headers.get('Accept-Encoding', '')):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        for header in headers:
+            self.send_header(*header)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def not_modified(self, etag):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        self.server.count_not_modified()
+
+    def delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.server.count()
+        return self.server.rng.random() < self.server.error_rate
+
+
+class PracticumHandler(StubHandler):
+
+    def do_GET(self):
+        if self.delay():
+            return self.reply(500, {'code': 'server_error'})
+        if not self.headers.get('Authorization', '').startswith('OAuth '):
+            return self.reply(401, {'code': 'not_authenticated'})
+        query = parse_qs(urlparse(self.path).query)
+        from_date = int(float(query.get('from_date', ['0'])[0]))
+        homeworks = make_homeworks(
+            self.server.payload, self.server.rng, self.server.stable)
+        etag = '"{:x}"'.format(zlib.crc32(json.dumps(homeworks).encode()))
+        if self.headers.get('If-None-Match') == etag:
+            return self.not_modified(etag)
+        self.reply(200, {'homeworks': homeworks,
+                         'current_date': from_date + 1},
+                   [('ETag', etag)])
+
+
+class TelegramHandler(StubHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = json.loads(self.rfile.read(length) or b'{}')
+        if self.delay():
+            return self.reply(429, {
+                'ok': False, 'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1}})
+        self.reply(200, {'ok': True, 'result': {
+            'message_id': self.server.requests,
+            'date': int(time.time()),
+            'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'},
+            'text': data.get('text', ''),
+        }})
+
+
+class StubServer(ThreadingHTTPServer):
+    """HTTP-заглушка с задержкой ответа, долей ошибок и размером ответа.
+
+    stable — статусы работ не меняются между запросами, так что условные
+    запросы получают 304; compress — ответы сжимаются gzip.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, handler, latency=0, error_rate=0, payload=1,
+                 seed=None, stable=False, compress=False):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.payload = payload
+        self.stable = stable
+        self.compress = compress
+        self.not_modified = 0
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+
+    def count_not_modified(self):
+        with self.lock:
+            self.not_modified += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
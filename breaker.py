@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from exceptions import CircuitOpen
+
+
+FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', 0.5))
+SLOW_RATE = float(os.getenv('BREAKER_SLOW_RATE', 0.5))
+SLOW_CALL = float(os.getenv('BREAKER_SLOW_CALL', 5))
+MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 20))
+WINDOW = float(os.getenv('BREAKER_WINDOW', 60))
+OPEN_FOR = float(os.getenv('BREAKER_OPEN_FOR', 30))
+PROBES = int(os.getenv('BREAKER_PROBES', 3))
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+OPENED = ('Цепь к API разомкнута на {delay:.0f} с: из {calls} запросов '
+          'ошибок {failures}, медленных {slow}')
+REOPENED = 'Пробный запрос к API не прошёл, цепь снова разомкнута'
+RECOVERED = 'API отвечает, цепь замкнута'
+SHORT_CIRCUIT = 'Запрос к API пропущен: цепь разомкнута ({state})'
+
+
+class CircuitBreaker:
+    """Предохранитель для запросов к общему API.
+
+    В замкнутом состоянии запросы идут как обычно, а их исходы копятся
+    в скользящем окне window секунд. Когда в окне набирается min_calls
+    запросов и доля ошибок достигает failure_rate или доля запросов
+    дольше slow_call секунд достигает slow_rate, цепь размыкается:
+    before() сразу бросает CircuitOpen. Через open_for секунд цепь
+    становится полуоткрытой и пропускает probes пробных запросов; если
+    все они успешны, цепь замыкается, первая же неудача снова её
+    размыкает.
+    """
+
+    def __init__(self, failure_rate=FAILURE_RATE, slow_rate=SLOW_RATE,
+                 slow_call=SLOW_CALL, min_calls=MIN_CALLS, window=WINDOW,
+                 open_for=OPEN_FOR, probes=PROBES, clock=time.monotonic):
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_call = slow_call
+        self.min_calls = min_calls
+        self.window = window
+        self.open_for = open_for
+        self.probes = probes
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.calls = deque()
+        self.failures = self.slow = 0
+        self.opened_at = 0
+        self.issued = self.passed = 0
+        self.rejected = self.trips = 0
+
+    def before(self):
+        """Разрешается запрос; True, если он пробный.
+
+        При разомкнутой цепи бросается CircuitOpen.
+        """
+        with self.lock:
+            if (self.state == OPEN
+                    and self.clock() - self.opened_at >= self.open_for):
+                self.state = HALF_OPEN
+                self.issued = self.passed = 0
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and self.issued < self.probes:
+                self.issued += 1
+                return True
+            self.rejected += 1
+            raise CircuitOpen(SHORT_CIRCUIT.format(state=self.state))
+
+    def record(self, duration, failed, probe=False):
+        """Учитывается исход запроса, разрешённого before()."""
+        slow = duration >= self.slow_call
+        with self.lock:
+            if probe:
+                self.record_probe(failed or slow)
+            elif self.state == CLOSED:
+                self.record_call(failed, slow)
+
+    def record_probe(self, failed):
+        """Пробный запрос замыкает цепь или снова её размыкает."""
+        if self.state != HALF_OPEN:
+            return
+        if failed:
+            logging.warning(REOPENED)
+            self.trip()
+            return
+        self.passed += 1
+        if self.passed >= self.probes:
+            logging.info(RECOVERED)
+            self.state = CLOSED
+            self.calls.clear()
+            self.failures = self.slow = 0
+
+    def record_call(self, failed, slow):
+        """Исход обычного запроса учитывается в скользящем окне."""
+        now = self.clock()
+        self.calls.append((now, failed, slow))
+        self.failures += failed
+        self.slow += slow
+        while self.calls and self.calls[0][0] <= now - self.window:
+            _, old_failed, old_slow = self.calls.popleft()
+            self.failures -= old_failed
+            self.slow -= old_slow
+        calls = len(self.calls)
+        if calls >= self.min_calls and (
+                self.failures >= calls * self.failure_rate
+                or self.slow >= calls * self.slow_rate):
+            logging.error(OPENED.format(
+                delay=self.open_for, calls=calls,
+                failures=self.failures, slow=self.slow))
+            self.trip()
+
+    def trip(self):
+        """Цепь размыкается на open_for секунд."""
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.trips += 1
+        self.calls.clear()
+        self.failures = self.slow = 0
+
+    def stats(self):
+        """Состояние цепи и счётчики для мониторинга."""
+        return {
+            'state': self.state,
+            'state_code': STATES[self.state],
+            'trips': self.trips,
+            'rejected': self.rejected,
+        }
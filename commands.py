@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+import time
+
+import homework
+
+
+COMMANDS = os.getenv('TELEGRAM_COMMANDS', 'false').lower() == 'true'
+POLL_TIMEOUT = int(os.getenv('TELEGRAM_POLL_TIMEOUT', 30))
+HISTORY_LIMIT = int(os.getenv('HISTORY_LIMIT', 10))
+RETRY_DELAY = 5
+NO_STATUSES = 'Статусов работ пока нет'
+NO_HISTORY = 'Статусы работ ещё не менялись'
+UNKNOWN_CHAT = 'Этот чат не подписан на статусы работ'
+HISTORY_LINE = '{changed_at}: {status}'
+DATE_FORMAT = '%d.%m.%Y %H:%M'
+UPDATES_ERROR = 'Сбой при получении команд Telegram: {fault}'
+LISTENER_STARTED = 'Бот принимает команды /status и /history'
+
+
+def render(name, status):
+    """Статус работы в том же виде, что и уведомление о нём."""
+    return homework.STATUS.format(
+        name=name, verdict=homework.HOMEWORK_STATUSES[status])
+
+
+def render_status(store, key):
+    """Ответ на /status: последний статус каждой работы."""
+    statuses = store.homeworks(key)
+    if not statuses:
+        return NO_STATUSES
+    return '\n'.join(render(name, status)
+                     for name, status in sorted(statuses.items()))
+
+
+def render_history(store, key, limit=HISTORY_LIMIT):
+    """Ответ на /history: последние смены статусов, новые сверху."""
+    rows = store.history(key, limit)
+    if not rows:
+        return NO_HISTORY
+    return '\n'.join(
+        HISTORY_LINE.format(
+            changed_at=time.strftime(DATE_FORMAT, time.localtime(changed)),
+            status=render(name, status))
+        for name, status, changed in rows)
+
+
+HANDLERS = {
+    '/status': render_status,
+    '/history': render_history,
+}
+
+
+class CommandListener:
+    """Ответы на команды чатов из сохранённых статусов, без запросов к API.
+
+    Обновления забираются долгим опросом getUpdates через bot, ответы
+    уходят через outbound (очередь отправки) с её лимитами. chats —
+    словарь {chat_id: ключ пользователя в хранилище}. Если reload
+    включён, перед ответом данные пользователя перечитываются с диска:
+    так отвечает процесс, который сам статусы не отправляет.
+    """
+
+    def __init__(self, bot, outbound, store, chats, timeout=POLL_TIMEOUT,
+                 reload=False):
+        self.bot = bot
+        self.outbound = outbound
+        self.store = store
+        self.chats = {str(chat_id): key for chat_id, key in chats.items()}
+        self.timeout = timeout
+        self.reload = reload
+        self.offset = None
+        self.running = False
+        self.thread = None
+
+    def answer(self, chat_id, text):
+        """Текст ответа на сообщение или None, если это не команда."""
+        command = text.split(maxsplit=1)[0].split('@')[0] if text else ''
+        handler = HANDLERS.get(command)
+        if handler is None:
+            return None
+        key = self.chats.get(str(chat_id))
+        if key is None:
+            return UNKNOWN_CHAT
+        if self.reload:
+            self.store.reload([key])
+        return handler(self.store, key)
+
+    def handle(self, updates):
+        """Обрабатываются полученные обновления."""
+        for update in updates:
+            self.offset = update.update_id + 1
+            message = update.message
+            if message is None:
+                continue
+            reply = self.answer(message.chat_id, message.text)
+            if reply is not None:
+                self.outbound.send_message(
+                    chat_id=message.chat_id, text=reply)
+
+    def poll(self):
+        """Один запрос getUpdates и обработка его результата."""
+        self.handle(self.bot.get_updates(
+            offset=self.offset, timeout=self.timeout,
+            allowed_updates=['message']))
+
+    def run(self):
+        """Цикл долгого опроса до вызова stop()."""
+        logging.info(LISTENER_STARTED)
+        while self.running:
+            try:
+                self.poll()
+            except Exception as error:
+                logging.error(UPDATES_ERROR.format(fault=error))
+                time.sleep(RETRY_DELAY)
+
+    def start(self):
+        """Опрос команд запускается в фоновом потоке."""
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Опрос останавливается после текущего запроса getUpdates."""
+        self.running = False
+
+
+def start_listener(bot, outbound, store, chats, reload=False):
+    """Запускается приём команд, если он включён TELEGRAM_COMMANDS."""
+    if not COMMANDS:
+        return None
+    return CommandListener(bot, outbound, store, chats,
+                           reload=reload).start()
@@ -0,0 +1,108 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from exceptions import ErrorTimeout
+from exceptions import Interrupted
+
+
+CYCLE_DEADLINE = float(os.getenv('CYCLE_DEADLINE', 60))
+DEADLINE_EXCEEDED = ('Цикл опроса не уложился в {budget:g} с, '
+                     'прервано: {stage}')
+STOP_EXCEEDED = 'Бот завершает работу, цикл опроса прерван: {stage}'
+
+deadline_var = ContextVar('deadline', default=None)
+stop_at = None
+
+
+class Deadline:
+    """Бюджет времени на одну работу, отсчитанный по clock().
+
+    budget 0 — без своего срока. После stop() бюджет урезается до срока
+    остановки, отсчитанного по time.monotonic().
+    """
+
+    __slots__ = ('budget', 'expires', 'clock')
+
+    def __init__(self, budget, clock=time.monotonic):
+        self.budget = budget
+        self.clock = clock
+        self.expires = clock() + budget if budget else None
+
+    def remaining(self):
+        """Сколько секунд бюджета осталось (или None); может быть < 0."""
+        left = None if self.expires is None else self.expires - self.clock()
+        stopping = stop_remaining()
+        if stopping is not None and (left is None or stopping < left):
+            return stopping
+        return left
+
+    def check(self, stage):
+        """Бросается ErrorTimeout, если бюджет исчерпан.
+
+        Если его исчерпала остановка бота — Interrupted.
+        """
+        stopping = stop_remaining()
+        if stopping is not None and stopping <= 0:
+            raise Interrupted(STOP_EXCEEDED.format(stage=stage))
+        if self.expires is not None and self.expires <= self.clock():
+            raise ErrorTimeout(DEADLINE_EXCEEDED.format(
+                budget=self.budget, stage=stage))
+
+
+@contextmanager
+def budget(seconds=CYCLE_DEADLINE, clock=time.monotonic):
+    """Внутри блока действует срок seconds секунд; 0 — без срока.
+
+    Срок хранится в контекстной переменной, поэтому у каждого потока
+    пула и у каждой задачи asyncio он свой.
+    """
+    token = deadline_var.set(Deadline(seconds, clock))
+    try:
+        yield deadline_var.get()
+    finally:
+        deadline_var.reset(token)
+
+
+def remaining():
+    """Остаток срока текущего блока budget() или None, если срока нет."""
+    deadline = deadline_var.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def stop(seconds):
+    """Сроки идущих и новых блоков budget() урезаются до seconds секунд.
+
+    Вызывается при остановке бота, чтобы циклы опроса не заняли время,
+    отведённое на досылку сообщений.
+    """
+    global stop_at
+    stop_at = time.monotonic() + seconds
+
+
+def stop_remaining():
+    """Сколько секунд осталось до срока остановки или None."""
+    return None if stop_at is None else stop_at - time.monotonic()
+
+
+def check(stage):
+    """Бросается ErrorTimeout, если срок текущего блока истёк."""
+    deadline = deadline_var.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def guarded(chunks, response, stage='ответ API'):
+    """Фрагменты тела ответа с проверкой срока перед каждым.
+
+    Если срок истёк или чтение прервано, ответ закрывается: недочитанное
+    соединение не возвращается в пул, а разрывается.
+    """
+    try:
+        for chunk in chunks:
+            check(stage)
+            yield chunk
+    except BaseException:
+        response.close()
+        raise
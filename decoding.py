@@ -0,0 +1,147 @@
+import codecs
+import json
+import os
+
+
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+UNEXPECTED = 'Ожидался символ {expected!r} в позиции {position}: {found!r}'
+TRUNCATED = 'Ответ API оборвался до конца JSON-документа'
+
+
+def select_backend(name=JSON_BACKEND):
+    """Возвращается (имя, loads) самого быстрого доступного декодера."""
+    candidates = ('orjson', 'ujson', 'json') if name == 'auto' else (name,)
+    for candidate in candidates:
+        try:
+            module = __import__(candidate)
+        except ImportError:
+            continue
+        return candidate, module.loads
+    return 'json', json.loads
+
+
+BACKEND, loads = select_backend()
+
+
+def decode(response):
+    """Разбирается тело ответа выбранным декодером.
+
+    Объекты ответа без байтового тела content разбираются своим json().
+    """
+    content = getattr(response, 'content', None)
+    if not isinstance(content, (bytes, bytearray)):
+        return response.json()
+    return loads(content)
+
+
+class HomeworkStream:
+    """Потоковый разбор ответа API со списком homeworks.
+
+    Работы из массива homeworks выдаются по одной по мере чтения
+    фрагментов тела, поэтому в памяти не держится весь документ. Остальные
+    поля верхнего уровня (current_date, code, error) собираются в fields;
+    они полностью известны после окончания итерации.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.fields = {}
+        self.has_homeworks = False
+
+    def __iter__(self):
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            if key == 'homeworks' and self.peek() == '[':
+                self.has_homeworks = True
+                yield from self.items()
+            else:
+                self.fields[key] = self.value()
+            if self.expect(',}') == '}':
+                return
+
+    def items(self):
+        """Выдаются элементы массива по одному."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.expect(']')
+            return
+        while True:
+            yield self.value()
+            self.compact()
+            if self.expect(',]') == ']':
+                return
+
+    def read(self):
+        """Дочитывается следующий фрагмент; False в конце тела."""
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer += self.text_decoder.decode(chunk)
+                return True
+        return False
+
+    def compact(self):
+        """Из буфера удаляется уже разобранная часть."""
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+
+    def peek(self):
+        """Следующий значимый символ без его чтения."""
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position] in WHITESPACE):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            self.compact()
+            if not self.read():
+                raise ValueError(TRUNCATED)
+
+    def expect(self, expected):
+        """Читается один из символов expected."""
+        found = self.peek()
+        if found not in expected:
+            raise ValueError(UNEXPECTED.format(
+                expected=expected, position=self.position, found=found))
+        self.position += 1
+        return found
+
+    def value(self):
+        """Читается одно значение JSON целиком.
+
+        Значение принимается, только если за ним в буфере уже есть
+        следующий символ: иначе число могло оборваться на границе
+        фрагментов.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(
+                    self.buffer, self.position)
+                if end < len(self.buffer):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                pass
+            if not self.read():
+                raise ValueError(TRUNCATED)
+
+
+def stream(response, chunk_size=CHUNK_SIZE, guard=None):
+    """Поток работ из ответа requests, открытого с stream=True.
+
+    guard(chunks, response) может обернуть чтение фрагментов тела.
+    """
+    chunks = response.iter_content(chunk_size)
+    if guard is not None:
+        chunks = guard(chunks, response)
+    return HomeworkStream(chunks)
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+
+
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', 0))
+DIGEST_MAX_EVENTS = int(os.getenv('DIGEST_MAX_EVENTS', 50))
+MESSAGE_LIMIT = 4096
+SEPARATOR = '\n\n'
+DIGEST_HEADER = 'Изменения статусов работ: {count}'
+
+
+def cut(text, limit=MESSAGE_LIMIT):
+    """Текст режется на куски не длиннее limit по строкам или словам."""
+    while len(text) > limit:
+        point = text.rfind('\n', 0, limit + 1)
+        if point <= 0:
+            point = text.rfind(' ', 0, limit + 1)
+        if point <= 0:
+            point = limit
+        yield text[:point]
+        text = text[point:].lstrip()
+    yield text
+
+
+def split_message(parts, limit=MESSAGE_LIMIT, separator=SEPARATOR):
+    """События собираются в сообщения не длиннее limit.
+
+    Событие не разрывается между сообщениями, если помещается в одно;
+    слишком длинное режется по строкам или словам.
+    """
+    chunks = []
+    current = ''
+    for part in parts:
+        for piece in cut(part, limit):
+            candidate = current + separator + piece if current else piece
+            if len(candidate) <= limit:
+                current = candidate
+            else:
+                chunks.append(current)
+                current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class Delivery:
+    """Итог доставки сводки из count сообщений для callbacks событий.
+
+    Каждый callback вызывается один раз, когда известна судьба всех
+    сообщений сводки: с True, только если доставлены все.
+    """
+
+    def __init__(self, callbacks, count):
+        self.callbacks = callbacks
+        self.left = count
+        self.delivered = True
+        self.lock = threading.Lock()
+
+    def __call__(self, delivered):
+        with self.lock:
+            self.delivered = self.delivered and delivered
+            self.left -= 1
+            if self.left:
+                return
+        for callback in self.callbacks:
+            callback(self.delivered)
+
+
+class DigestQueue:
+    """Сводка смен статусов: одно сообщение на чат за окно window секунд.
+
+    Статусы, переданные в add(), копятся по чатам и уходят в outbound
+    одним сообщением, когда с первого из них проходит window секунд или
+    их набирается max_events. Остальные сообщения (send_message)
+    отправляются сразу, но после уже накопленной сводки этого чата,
+    чтобы не нарушать порядок. callback, переданный в add(), вызывается
+    с итогом доставки сводки, в которую попал статус.
+    """
+
+    def __init__(self, outbound, window=DIGEST_WINDOW,
+                 max_events=DIGEST_MAX_EVENTS, clock=time.monotonic):
+        self.outbound = outbound
+        self.window = window
+        self.max_events = max_events
+        self.clock = clock
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def add(self, chat_id, text, callback=None):
+        """Статус работы добавляется в сводку чата."""
+        with self.lock:
+            _, events, callbacks = self.pending.setdefault(
+                chat_id, (self.clock(), [], []))
+            events.append(text)
+            if callback is not None:
+                callbacks.append(callback)
+            full = len(events) >= self.max_events
+        if full:
+            self.flush(chat_id)
+        else:
+            self.changed.set()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        """Сообщение отправляется сразу после сводки своего чата."""
+        self.flush(chat_id)
+        return self.outbound.send_message(chat_id=chat_id, text=text, **kwargs)
+
+    def flush(self, chat_id):
+        """Сводка чата отправляется, даже если окно ещё не прошло."""
+        with self.lock:
+            _, events, callbacks = self.pending.pop(
+                chat_id, (None, None, None))
+        if not events:
+            return
+        parts = events
+        if len(events) > 1:
+            parts = [DIGEST_HEADER.format(count=len(events))] + events
+        chunks = split_message(parts)
+        callback = Delivery(callbacks, len(chunks)) if callbacks else None
+        for text in chunks:
+            self.outbound.send_message(
+                chat_id=chat_id, text=text, callback=callback)
+
+    def flush_due(self):
+        """Отправляются сводки с истёкшим окном.
+
+        Возвращается время до конца ближайшего окна или None.
+        """
+        now = self.clock()
+        due, waiting = [], []
+        with self.lock:
+            for chat_id, (started, _, _) in self.pending.items():
+                left = started + self.window - now
+                if left <= 0:
+                    due.append(chat_id)
+                else:
+                    waiting.append(left)
+        for chat_id in due:
+            self.flush(chat_id)
+        return min(waiting, default=None)
+
+    def work(self):
+        """Фоновый поток отправки сводок по окончании окна."""
+        while True:
+            self.changed.wait(self.flush_due())
+            self.changed.clear()
+            if not self.running:
+                return
+
+    def close(self):
+        """Отправляются все накопленные сводки, поток останавливается."""
+        self.running = False
+        self.changed.set()
+        self.thread.join()
+        with self.lock:
+            chats = list(self.pending)
+        for chat_id in chats:
+            self.flush(chat_id)
+
+
+def wrap(outbound, window=DIGEST_WINDOW):
+    """outbound оборачивается в DigestQueue, если задано окно сводки."""
+    if window <= 0:
+        return outbound
+    return DigestQueue(outbound, window)
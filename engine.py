@@ -0,0 +1,363 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import deadline
+import homework
+import outbox
+from api_client import get_client
+from commands import start_listener
+from digest import wrap
+from health import Heartbeat
+from health import start_watchdog
+from lifecycle import Lifecycle
+from logs import tenant_var
+from metrics import REGISTRY
+from metrics import start_server
+from profiling import PROFILER
+from scheduler import AdaptiveSchedule
+from send_queue import LazyBot
+from send_queue import SendQueue
+from storage import StatusStore
+from storage import tenant_key
+from suppression import ErrorSuppressor
+
+
+CONCURRENCY = int(os.getenv('POLL_CONCURRENCY', 50))
+ENGINE_STARTED = ('Движок опроса запущен: пользователей {count}, '
+                  'одновременных запросов не более {concurrency}')
+TENANTS_ERROR = 'Некорректная запись пользователя в {path}: {entry}'
+
+
+class Tenant:
+    """Пара токена Практикума и чата Telegram со своим курсором опроса."""
+
+    __slots__ = ('token', 'key', 'chat_id', 'timestamp', 'next_poll',
+                 'status', 'changed_at')
+
+    def __init__(self, token, chat_id, timestamp=None, next_poll=0):
+        self.token = token
+        self.key = tenant_key(token)
+        self.chat_id = chat_id
+        self.timestamp = (int(time.time()) if timestamp is None
+                          else timestamp)
+        self.next_poll = next_poll
+        self.status = None
+        self.changed_at = time.time()
+
+    @property
+    def headers(self):
+        """Заголовки запроса к API от имени пользователя."""
+        return homework.auth_headers(self.token)
+
+
+def load_entries(path):
+    """Читается и проверяется JSON-список записей {token, chat_id}."""
+    with open(path, encoding='UTF-8') as file:
+        entries = json.load(file)
+    for entry in entries:
+        if not entry.get('token') or not entry.get('chat_id'):
+            raise ValueError(TENANTS_ERROR.format(path=path, entry=entry))
+    return entries
+
+
+def load_tenants(path):
+    """Читается JSON-список пользователей вида {token, chat_id}."""
+    return [Tenant(entry['token'], entry['chat_id'])
+            for entry in load_entries(path)]
+
+
+class PollingEngine:
+    """Опрос API для множества пользователей в одном процессе.
+
+    Пользователи хранятся в куче по времени следующего опроса, поэтому
+    на каждого приходится один объект Tenant, а не отдельная задача.
+    Блокирующий цикл run_cycle выполняется в пуле потоков, число
+    одновременных запросов ограничено семафором. Если передан heartbeat,
+    в нём отмечаются план и успех каждого опроса.
+    """
+
+    def __init__(self, bot, tenants, concurrency=CONCURRENCY,
+                 retry_time=homework.RETRY_TIME, policy=None, store=None,
+                 heartbeat=None):
+        self.bot = bot
+        self.store = store
+        self.heartbeat = heartbeat
+        self.errors = ErrorSuppressor()
+        self.concurrency = concurrency
+        self.retry_time = retry_time
+        self.policy = policy or AdaptiveSchedule(
+            default=retry_time)
+        self.queue = []
+        self.tenants = {}
+        self.order = itertools.count()
+        self.tasks = set()
+        self.polling = {}
+        self.idle = threading.Condition()
+        self.running = False
+        self.stopped = False
+        self.loop = None
+        self.wakeup = None
+        self.add(tenants)
+
+    def __len__(self):
+        return len(self.tenants)
+
+    def add(self, tenants):
+        """Пользователи добавляются в опрос с сохранённых курсоров.
+
+        Статус для расписания опроса тоже берётся из хранилища.
+        """
+        for tenant in tenants:
+            if self.store is not None:
+                tenant.timestamp = self.store.cursor(
+                    tenant.key, tenant.timestamp)
+                if tenant.status is None:
+                    tenant.status, tenant.changed_at = self.policy.seed(
+                        self.store, tenant.key, time.time())
+            self.tenants[tenant.key] = tenant
+            self.schedule(tenant, tenant.next_poll)
+
+    def remove(self, keys):
+        """Пользователи исключаются из опроса.
+
+        Записи в куче не ищутся: они пропускаются при извлечении, а опрос,
+        который уже идёт, завершается без повторной постановки в очередь.
+        """
+        for key in keys:
+            self.tenants.pop(key, None)
+            if self.heartbeat is not None:
+                self.heartbeat.forget(key)
+
+    def release(self, keys, timeout=None):
+        """Пользователи исключаются, и ожидается конец их текущих опросов.
+
+        Вызывается из любого потока, кроме цикла событий движка. После
+        возврата опросы keys больше не пишут в хранилище, поэтому их
+        данные можно сбросить на диск и передать другому процессу.
+        Возвращается False, если опросы не закончились за timeout секунд.
+        Если цикл событий уже закрыт, опросов больше нет.
+        """
+        keys = set(keys)
+        removed = threading.Event()
+
+        def remove():
+            self.remove(keys)
+            removed.set()
+
+        try:
+            self.call(remove)
+        except RuntimeError:
+            return True
+        if not removed.wait(timeout):
+            return False
+        with self.idle:
+            return self.idle.wait_for(
+                lambda: keys.isdisjoint(self.polling), timeout)
+
+    def replace(self, tenants):
+        """Набор пользователей заменяется новым.
+
+        Оставшиеся пользователи продолжают опрос со своим расписанием,
+        сменившие чат перезапускаются, выбывшие исключаются.
+        """
+        fresh = {tenant.key: tenant for tenant in tenants}
+        self.remove([
+            key for key, tenant in self.tenants.items()
+            if key not in fresh or fresh[key].chat_id != tenant.chat_id])
+        self.add([tenant for key, tenant in fresh.items()
+                  if key not in self.tenants])
+
+    def active(self, tenant):
+        """Пользователь всё ещё опрашивается этим движком."""
+        return self.tenants.get(tenant.key) is tenant
+
+    def call(self, function, *args):
+        """function выполняется в цикле событий; можно из любого потока."""
+        if self.loop is None:
+            function(*args)
+        else:
+            self.loop.call_soon_threadsafe(function, *args)
+
+    def schedule(self, tenant, when):
+        """Пользователь ставится в очередь на опрос в момент when."""
+        tenant.next_poll = when
+        heapq.heappush(self.queue, (when, next(self.order), tenant))
+        if self.heartbeat is not None:
+            self.heartbeat.planned(tenant.key, when)
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def poll(self, tenant):
+        """Выполняется цикл опроса одного пользователя (в потоке пула)."""
+        token = tenant_var.set(tenant.key)
+        if self.heartbeat is not None:
+            self.heartbeat.started(tenant.key)
+        try:
+            tenant.timestamp, homeworks = homework.run_cycle(
+                self.bot, tenant.chat_id, tenant.headers, tenant.timestamp,
+                self.store, tenant.key, self.errors)
+        finally:
+            tenant_var.reset(token)
+        if self.heartbeat is not None:
+            self.heartbeat.finished(tenant.key, homeworks is not None)
+        tenant.status, tenant.changed_at = self.policy.observe(
+            tenant.status, tenant.changed_at, homeworks, time.time())
+        return tenant
+
+    def next_poll_time(self, tenant):
+        """Вычисляется время следующего опроса пользователя."""
+        now = time.time()
+        return now + self.policy.next_delay(
+            tenant.status, tenant.changed_at, now)
+
+    async def run(self):
+        """Запускается опрос до вызова stop()."""
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.running = True
+        semaphore = asyncio.Semaphore(self.concurrency)
+        logging.info(ENGINE_STARTED.format(
+            count=len(self), concurrency=self.concurrency))
+        executor = ThreadPoolExecutor(self.concurrency)
+        try:
+            while self.running:
+                await self.dispatch_due(semaphore, executor)
+                await self.wait_next()
+            if self.tasks:
+                stopping = deadline.stop_remaining()
+                await asyncio.wait(self.tasks, timeout=(
+                    None if stopping is None else max(stopping, 0)))
+        finally:
+            executor.shutdown(wait=not self.tasks, cancel_futures=True)
+        if self.store is not None:
+            self.store.flush()
+
+    async def dispatch_due(self, semaphore, executor):
+        """Запускаются опросы всех пользователей, чьё время подошло."""
+        while self.running and self.queue and self.queue[0][0] <= time.time():
+            tenant = heapq.heappop(self.queue)[2]
+            if not self.active(tenant):
+                continue
+            await semaphore.acquire()
+            if not self.active(tenant):
+                semaphore.release()
+                continue
+            with self.idle:
+                self.polling[tenant.key] = self.polling.get(tenant.key, 0) + 1
+            task = asyncio.ensure_future(
+                self.poll_tenant(tenant, semaphore, executor))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def poll_tenant(self, tenant, semaphore, executor):
+        """Опрос пользователя в пуле потоков и постановка в очередь."""
+        try:
+            await self.loop.run_in_executor(executor, self.poll, tenant)
+        finally:
+            semaphore.release()
+            with self.idle:
+                self.polling[tenant.key] -= 1
+                if not self.polling[tenant.key]:
+                    del self.polling[tenant.key]
+                self.idle.notify_all()
+            if self.active(tenant):
+                self.schedule(tenant, self.next_poll_time(tenant))
+
+    async def wait_next(self):
+        """Ожидается ближайший опрос или постановка нового в очередь."""
+        self.wakeup.clear()
+        delay = self.retry_time
+        if self.queue:
+            delay = min(max(self.queue[0][0] - time.time(), 0), delay)
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def stop(self):
+        """Останавливается опрос; безопасно вызывать из любого потока."""
+        self.stopped = True
+
+        def halt():
+            self.running = False
+            if self.wakeup is not None:
+                self.wakeup.set()
+        self.call(halt)
+
+
+def register_gauges(outbound):
+    """Регистрируются метрики очереди отправки и клиента API."""
+    REGISTRY.gauge('homework_send_queue_depth',
+                   'Сообщений в очереди отправки', outbound.depth)
+    REGISTRY.gauge('homework_send_wait_max_seconds',
+                   'Наибольшее ожидание сообщения в очереди',
+                   lambda: outbound.stats()['wait_max'])
+    REGISTRY.gauge('homework_api_connections_reused',
+                   'Запросов к API через уже открытое соединение',
+                   lambda: get_client().stats()['reused'])
+    REGISTRY.gauge('homework_api_breaker_state',
+                   'Предохранитель API: 0 замкнут, 1 разомкнут, 2 пробы',
+                   lambda: breaker_stats()['state_code'])
+    REGISTRY.gauge('homework_api_breaker_rejected',
+                   'Запросов к API, пропущенных разомкнутым предохранителем',
+                   lambda: breaker_stats()['rejected'])
+
+
+def breaker_stats():
+    """Состояние предохранителя общего клиента API."""
+    breaker = get_client().breaker
+    if breaker is None:
+        return {'state_code': 0, 'rejected': 0}
+    return breaker.stats()
+
+
+def run_engine(path):
+    """Запускается опрос всех пользователей из файла path.
+
+    SIGTERM и SIGINT останавливают опрос, SIGHUP перечитывает файл
+    пользователей и интервалы опроса.
+    """
+    if homework.TELEGRAM_TOKEN is None:
+        raise ValueError(homework.FAULT_TOKENS)
+    store = StatusStore()
+    telegram = LazyBot(homework.TELEGRAM_TOKEN)
+    outbound = SendQueue(telegram)
+    register_gauges(outbound)
+    start_server()
+    tenants = load_tenants(path)
+    listener = start_listener(telegram, outbound, store, chats(tenants))
+    bot = outbox.wrap(wrap(outbound))
+    heartbeat = Heartbeat()
+    engine = PollingEngine(bot, tenants, store=store, heartbeat=heartbeat)
+    watchdog = start_watchdog(heartbeat, outbound, REGISTRY)
+    lifecycle = Lifecycle().install()
+    homework.interrupt_cycles(lifecycle)
+    lifecycle.on_stop(engine.stop)
+    lifecycle.on_stop(watchdog.stop)
+    lifecycle.on_reload(engine.policy.reload)
+    lifecycle.on_reload(PROFILER.reload)
+    PROFILER.install()
+
+    def reload_tenants():
+        tenants = load_tenants(path)
+        engine.call(engine.replace, tenants)
+        if listener is not None:
+            listener.chats = chats(tenants)
+
+    lifecycle.on_reload(reload_tenants)
+    try:
+        asyncio.run(engine.run())
+    finally:
+        homework.shutdown(lifecycle, bot, outbound, store)
+
+
+def chats(tenants):
+    """Чаты пользователей для приёма команд: {chat_id: ключ}."""
+    return {str(tenant.chat_id): tenant.key for tenant in tenants}
@@ -5,3 +5,18 @@ class ErrorApi(Exception):
 class ResponseJsonError(Exception):
     pass
 
+
+class NotModified(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class ErrorTimeout(Exception):
+    pass
+
+
+class Interrupted(ErrorTimeout):
+    pass
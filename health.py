@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+
+WATCHDOG_INTERVAL = float(os.getenv('WATCHDOG_INTERVAL', 10))
+WATCHDOG_LAG = float(os.getenv('WATCHDOG_LAG', 120))
+HEALTH_FILE = os.getenv('HEALTH_FILE')
+OK = 'ok'
+STALLED = 'stalled'
+LAG_EXCEEDED = ('Опрос отстаёт от расписания на {lag:.0f} с (порог '
+                '{threshold:.0f} с), очередь отправки ждёт {age:.0f} с; '
+                'стеки потоков:\n{stacks}')
+LAG_RECOVERED = 'Опрос снова идёт по расписанию, отставание {lag:.0f} с'
+THREAD_HEADER = 'Поток {name} ({ident}):\n'
+
+
+def dump_stacks():
+    """Текущие стеки всех потоков процесса одной строкой."""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    return '\n'.join(
+        THREAD_HEADER.format(name=names.get(ident, '?'), ident=ident)
+        + ''.join(traceback.format_stack(frame))
+        for ident, frame in sys._current_frames().items())
+
+
+class Heartbeat:
+    """Расписание и успехи опросов пользователей.
+
+    planned() запоминает, когда должен пройти следующий опрос; запись
+    остаётся до следующего planned(), поэтому зависший опрос
+    увеличивает отставание lag(). finished() отмечает время последнего
+    успешного опроса.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.plans = {}
+        self.successes = {}
+        self.start_lag = 0
+
+    def planned(self, key, when):
+        """Следующий опрос пользователя запланирован на when."""
+        with self.lock:
+            self.plans[key] = max(when, self.clock())
+
+    def started(self, key):
+        """Опрос начался; запоминается, насколько позже плана."""
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is not None:
+                self.start_lag = max(self.clock() - plan, 0)
+
+    def finished(self, key, succeeded):
+        """Опрос закончился; при успехе запоминается его время."""
+        if succeeded:
+            with self.lock:
+                self.successes[key] = self.clock()
+
+    def forget(self, key):
+        """Пользователь больше не опрашивается."""
+        with self.lock:
+            self.plans.pop(key, None)
+            self.successes.pop(key, None)
+
+    def lag(self):
+        """Насколько самый просроченный опрос отстаёт от плана, секунды."""
+        with self.lock:
+            oldest = min(self.plans.values(), default=None)
+        if oldest is None:
+            return 0
+        return max(self.clock() - oldest, 0)
+
+    def report(self):
+        """Отставание и давность последнего успешного опроса по ключам."""
+        now = self.clock()
+        with self.lock:
+            successes = dict(self.successes)
+            start_lag = self.start_lag
+        return {
+            'lag': round(self.lag(), 3),
+            'start_lag': round(start_lag, 3),
+            'tenants': len(self.plans),
+            'last_success': {key: round(now - when, 3)
+                             for key, when in successes.items()},
+        }
+
+
+class Watchdog:
+    """Фоновая проверка отставания опроса и очереди отправки.
+
+    Раз в interval секунд собирается отчёт о здоровье и, если задан
+    path, атомарно записывается в файл — это пульс процесса для внешней
+    проверки. Когда отставание опроса или ожидание в очереди отправки
+    превышает threshold, в журнал один раз за эпизод пишутся стеки всех
+    потоков.
+    """
+
+    def __init__(self, heartbeat, outbound=None, threshold=WATCHDOG_LAG,
+                 interval=WATCHDOG_INTERVAL, path=HEALTH_FILE):
+        self.heartbeat = heartbeat
+        self.outbound = outbound
+        self.threshold = threshold
+        self.interval = interval
+        self.path = path
+        self.stalled = False
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.work, daemon=True)
+
+    def report(self):
+        """Отчёт о здоровье: статус ok или stalled и показатели."""
+        report = self.heartbeat.report()
+        report['outbound_age'] = round(
+            self.outbound.oldest() if self.outbound is not None else 0, 3)
+        stalled = max(report['lag'], report['outbound_age']) > self.threshold
+        report['status'] = STALLED if stalled else OK
+        report['time'] = time.time()
+        return report
+
+    def check(self):
+        """Отчёт пишется в файл, при отставании в журнал — стеки потоков."""
+        report = self.report()
+        if self.path:
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w', encoding='UTF-8') as file:
+                json.dump(report, file)
+            os.replace(temporary, self.path)
+        if report['status'] == STALLED and not self.stalled:
+            logging.error(LAG_EXCEEDED.format(
+                lag=report['lag'], threshold=self.threshold,
+                age=report['outbound_age'], stacks=dump_stacks()))
+        elif report['status'] == OK and self.stalled:
+            logging.warning(LAG_RECOVERED.format(lag=report['lag']))
+        self.stalled = report['status'] == STALLED
+        return report
+
+    def work(self):
+        while not self.stopping.wait(self.interval):
+            try:
+                self.check()
+            except Exception as error:
+                logging.error(error)
+
+    def register(self, registry):
+        """Метрики отставания и страница /health сервера метрик."""
+        registry.health = self.report
+        registry.gauge('homework_poll_lag_seconds',
+                       'Отставание опроса от расписания',
+                       self.heartbeat.lag)
+        if self.outbound is not None:
+            registry.gauge('homework_send_oldest_seconds',
+                           'Сколько ждёт самое старое сообщение в очереди',
+                           self.outbound.oldest)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+
+
+def start_watchdog(heartbeat, outbound, registry, path=HEALTH_FILE):
+    """Запускается Watchdog и подключается к метрикам."""
+    watchdog = Watchdog(heartbeat, outbound, path=path)
+    watchdog.register(registry)
+    return watchdog.start()
@@ -1,13 +1,39 @@
 import logging
 import os
+import sys
 import time
 
 from dotenv import load_dotenv
-from telegram import Bot
 import requests
 
+import deadline
+import decoding
+import digest
+import outbox
+from digest import DigestQueue
+from api_client import get_client
+from exceptions import CircuitOpen
 from exceptions import ErrorApi
+from exceptions import ErrorTimeout
+from exceptions import Interrupted
+from exceptions import NotModified
 from exceptions import ResponseJsonError
+from health import Heartbeat
+from health import start_watchdog
+from lifecycle import Lifecycle
+from metrics import REGISTRY
+from metrics import start_server
+from outbox import Outbox
+from profiling import PROFILER
+from records import Homework
+from records import api_timestamp
+from records import to_records
+from scheduler import AdaptiveSchedule
+from send_queue import LazyBot
+from send_queue import SendQueue
+from storage import StatusStore
+from storage import tenant_key
+from suppression import ErrorSuppressor
 
 
 STATUS = 'Изменился статус проверки работы "{name}". {verdict}'
@@ -17,15 +43,19 @@ TOKENS = ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID')
 BOT_WORKING = 'Бот работает'
 FAULT_TOKENS = "Ошибка токенов"
 MESSAGE = 'Сбой в работе программы: {faults}'
-ERROR_NETWORK = 'Соединение прервано c {url}.{headers}.{params}'
+ERROR_NETWORK = 'Соединение прервано c {url}.{params}'
+ERROR_TIMEOUT = 'Истекло время ожидания ответа {url}.{params}'
 RESPONSE_ERROR = ('Код ошибки:{error_value}. Код статуса:{error_key}.'
-                  '{url}.{headers}.{params}')
+                  '{url}.{params}')
 ERROR_API = ('Ошибка при запросе к API Yandex. Код-возврата:{state}'
-             '{url}.{headers}.{params}')
+             '{url}.{params}')
 EMPTY_LIST = 'Список пуст'
 INCORRECT_DICT = 'Некорректный ответ на запрос словаря'
 INCORRECT_LIST = 'Некорректный ответ на запрос списка'
-ERROR_STATUS = ('Неожиданное принятое значение {value}')
+NOT_MODIFIED = 'Ответ API не изменился: {url}'
+SEND_ERROR = 'Сбой при отправке сообщения в чат {chat_id}: {fault}'
+RELOAD_TOKENS = 'В новой конфигурации нет токена или чата, оставлены прежние'
+BOT_STOPPED = 'Бот остановлен, не отправлено сообщений: {undelivered}'
 
 load_dotenv()
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
@@ -34,7 +64,6 @@ TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
 RETRY_TIME = 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
 HOMEWORK_STATUSES = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -43,29 +72,76 @@ HOMEWORK_STATUSES = {
 }
 
 
+def auth_headers(token):
+    """Заголовки запроса к API от имени владельца токена."""
+    return {'Authorization': f'OAuth {token}'}
+
+
 def get_api_answer(current_timestamp):
     """Делается запрос к эндпоинту API-сервиса."""
+    return fetch_homeworks(current_timestamp, auth_headers(PRACTICUM_TOKEN))
+
+
+def request_homeworks(current_timestamp, headers, stream=False):
+    """Делается запрос к API; возвращаются ответ 200 и параметры запроса."""
     parameters = dict(
         url=ENDPOINT,
-        headers=HEADERS,
+        headers=headers,
         params={'from_date': current_timestamp})
     try:
-        homework_statuses = requests.get(**parameters)
+        homework_statuses = get_client().get(stream=stream, **parameters)
+    except requests.Timeout:
+        raise ErrorTimeout(ERROR_TIMEOUT.format(**parameters))
     except requests.RequestException:
         raise ConnectionError(ERROR_NETWORK.format(**parameters))
-    response_json = homework_statuses.json()
     status = homework_statuses.status_code
-    if status != 200:
-        raise ErrorApi(ERROR_API.format(state=status, **parameters))
+    if status == 200:
+        return homework_statuses, parameters
+    if stream:
+        homework_statuses.close()
+    if status == 304:
+        raise NotModified(NOT_MODIFIED.format(**parameters))
+    raise ErrorApi(ERROR_API.format(state=status, **parameters))
+
+
+@REGISTRY.timed('api')
+def fetch_homeworks(current_timestamp, headers):
+    """Делается запрос к API от имени владельца переданного токена."""
+    homework_statuses, parameters = request_homeworks(
+        current_timestamp, headers)
+    deadline.check('ответ API')
+    with REGISTRY.stage('decode'):
+        response_json = decoding.decode(homework_statuses)
+    check_errors(response_json, parameters)
+    return response_json
+
+
+def check_errors(response_json, parameters):
+    """Проверяется, что API не вернул ключи code или error."""
     for error in ['code', 'error']:
         if error in response_json:
             raise ResponseJsonError(RESPONSE_ERROR.format(
                 error_value=response_json[error],
                 error_key=error,
                 **parameters))
-    return response_json
 
 
+def stream_homeworks(current_timestamp, headers):
+    """Делается запрос к API; ответ разбирается потоково.
+
+    Возвращается decoding.HomeworkStream, работы из которого читаются
+    через check_stream по одной. Если срок цикла истекает посреди
+    чтения, соединение разрывается и бросается ErrorTimeout.
+    """
+    homework_statuses, parameters = request_homeworks(
+        current_timestamp, headers, stream=True)
+    homework_stream = decoding.stream(
+        homework_statuses, guard=deadline.guarded)
+    homework_stream.parameters = parameters
+    return homework_stream
+
+
+@REGISTRY.timed('check')
 def check_response(response):
     """Проверяется ответ API на корректность."""
     if not response:
@@ -77,14 +153,28 @@ def check_response(response):
     return response['homeworks']
 
 
+def check_stream(homework_stream):
+    """Проверяются работы потокового ответа API по мере разбора."""
+    for homework in homework_stream:
+        if not isinstance(homework, dict):
+            raise TypeError(INCORRECT_DICT)
+        yield homework
+    check_errors(homework_stream.fields, homework_stream.parameters)
+    if not homework_stream.has_homeworks:
+        raise TypeError(INCORRECT_LIST)
+
+
+@REGISTRY.timed('parse')
 def parse_status(homework):
-    """Извлекается из конкретной домашней работы статус этой работы."""
-    status = homework.get('status')
-    if status not in HOMEWORK_STATUSES:
-        raise KeyError(ERROR_STATUS.format(value=status))
+    """Извлекается из конкретной домашней работы статус этой работы.
+
+    Принимается запись Homework или словарь из ответа API.
+    """
+    if not isinstance(homework, Homework):
+        homework = Homework.from_payload(homework)
     message = STATUS.format(
-        name=homework['homework_name'],
-        verdict=HOMEWORK_STATUSES[status]
+        name=homework.name,
+        verdict=HOMEWORK_STATUSES[homework.status.value]
     )
     logging.info(message)
     return message
@@ -92,7 +182,13 @@ def parse_status(homework):
 
 def send_message(bot, message):
     """Отправляется сообщение в Telegram чат."""
-    return bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
+    return send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+@REGISTRY.timed('send')
+def send_chat_message(bot, chat_id, message, **kwargs):
+    """Отправляется сообщение в указанный Telegram чат."""
+    return bot.send_message(chat_id=chat_id, text=message, **kwargs)
 
 
 def check_tokens():
@@ -107,38 +203,235 @@ def check_tokens():
     return True
 
 
+def changed_homeworks(homeworks, store=None, key=None):
+    """Отбираются работы, статус которых изменился с последней отправки.
+
+    Для каждой работы делается одна проверка по словарю в памяти, так что
+    отрисовываются и отправляются только действительно изменённые.
+    Работы возвращаются от старых изменений к новым.
+    """
+    if store is None:
+        changed = list(homeworks)
+    else:
+        changed = [
+            homework for homework in homeworks
+            if store.status(key, homework.name) != homework.status.value
+        ]
+    changed.reverse()
+    changed.sort(key=lambda homework: homework.date_updated or '')
+    return changed
+
+
+def notify(bot, chat_id, homework, store=None, key=None):
+    """Отправляется статус работы и запоминается как отправленный.
+
+    Если bot — Outbox, статус записывается в журнал с идентификатором
+    события до того, как запоминается отправленным, и уже из журнала
+    попадает в сводку, если она включена; если DigestQueue без журнала —
+    уходит в сводку чата. В историю смена статуса пишется со временем
+    date_updated из API, как и при загрузке истории backfill.
+    """
+    message = parse_status(homework)
+    if isinstance(bot, Outbox):
+        send_chat_message(bot, chat_id, message, event=(
+            key, homework.name, homework.status.value,
+            homework.date_updated))
+    elif isinstance(bot, DigestQueue):
+        bot.add(chat_id, message)
+    else:
+        send_chat_message(bot, chat_id, message)
+    if store is not None:
+        store.set_status(key, homework.name, homework.status.value,
+                         api_timestamp(homework.date_updated))
+
+
+def send_safely(bot, chat_id, message):
+    """Отправляется сообщение; сбой отправки только записывается в лог."""
+    try:
+        send_chat_message(bot, chat_id, message)
+    except Exception as error:
+        logging.error(SEND_ERROR.format(chat_id=chat_id, fault=error))
+
+
+def report_error(bot, chat_id, error, errors=None):
+    """Ошибка цикла записывается в лог и, если не подавлена, в чат."""
+    message = MESSAGE.format(faults=error)
+    logging.error(message)
+    if errors is not None:
+        message = errors.failure(chat_id, error, message)
+    if message:
+        send_safely(bot, chat_id, message)
+
+
+@PROFILER.cycle
+def run_cycle(bot, chat_id, headers, timestamp, store=None, key=None,
+              errors=None):
+    """Выполняется один цикл опроса API.
+
+    Возвращается новая метка времени и список записей Homework из ответа
+    (None, если цикл завершился ошибкой, пустой, если API ответил
+    304 Not Modified). Пропуск запроса разомкнутым предохранителем
+    в чат не сообщается. Если передано хранилище,
+    в нём под ключом key сохраняются курсор и отправленные статусы.
+    errors — ErrorSuppressor для подавления повторных сообщений об ошибках.
+
+    На весь цикл отводится deadline.CYCLE_DEADLINE секунд. Когда срок
+    истекает, оставшиеся запросы и уведомления отменяются, курсор не
+    сдвигается, и неотправленные статусы уходят в следующем цикле.
+    """
+    try:
+        with deadline.budget(deadline.CYCLE_DEADLINE):
+            response = fetch_homeworks(timestamp, headers)
+            homeworks = to_records(check_response(response))
+            for homework in changed_homeworks(homeworks, store, key):
+                deadline.check('отправка статусов')
+                notify(bot, chat_id, homework, store, key)
+        timestamp = response.get('current_date', timestamp)
+        if store is not None:
+            store.set_cursor(key, timestamp)
+    except NotModified:
+        homeworks = []
+    except (CircuitOpen, Interrupted) as error:
+        logging.warning(error)
+        return timestamp, None
+    except Exception as error:
+        report_error(bot, chat_id, error, errors)
+        return timestamp, None
+    recovered = errors.recovery(chat_id) if errors is not None else None
+    if recovered:
+        send_safely(bot, chat_id, recovered)
+    return timestamp, homeworks
+
+
+def reload_config():
+    """Токен Практикума и чат перечитываются из окружения и .env.
+
+    Если какого-то значения нет, остаются прежние.
+    """
+    global PRACTICUM_TOKEN, TELEGRAM_CHAT_ID
+    load_dotenv(override=True)
+    practicum_token = os.getenv('PRACTICUM_TOKEN')
+    chat_id = os.getenv('TELEGRAM_CHAT_ID')
+    if practicum_token is None or chat_id is None:
+        logging.error(RELOAD_TOKENS)
+        return
+    PRACTICUM_TOKEN, TELEGRAM_CHAT_ID = practicum_token, chat_id
+
+
+def own_chats():
+    """Чат TELEGRAM_CHAT_ID и ключ PRACTICUM_TOKEN для приёма команд."""
+    return {TELEGRAM_CHAT_ID: tenant_key(PRACTICUM_TOKEN)}
+
+
+def interrupt_cycles(lifecycle):
+    """При остановке идущим циклам отводится половина её срока."""
+    lifecycle.on_stop(lambda: deadline.stop(lifecycle.remaining() / 2))
+
+
+def shutdown(lifecycle, bot, outbound, store):
+    """Курсоры сбрасываются на диск, очередь отправки дописывается.
+
+    На всё отводится lifecycle.remaining() секунд. bot — outbound или
+    обёрнутые вокруг него DigestQueue и Outbox; журнал Outbox
+    закрывается последним, после подтверждения отправленных сообщений.
+    """
+    store.flush()
+    journal = bot if isinstance(bot, Outbox) else None
+    if journal is not None:
+        bot = journal.outbound
+    if isinstance(bot, DigestQueue):
+        bot.close()
+    undelivered = outbound.close(lifecycle.remaining())
+    if journal is not None:
+        journal.close()
+    store.close()
+    logging.info(BOT_STOPPED.format(undelivered=undelivered))
+
+
+def poll_loop(bot, store, schedule, errors, sleep, clock=time.time,
+              heartbeat=None):
+    """Цикл опроса API от имени PRACTICUM_TOKEN до остановки.
+
+    sleep(delay) ждёт следующего опроса и возвращает True, когда пора
+    остановиться; clock() — текущее время в секундах. Вместе с
+    api_client.set_client это позволяет прогонять цикл на виртуальных
+    часах без ожидания. В heartbeat отмечаются план и успех опросов.
+    """
+    key = None
+    while True:
+        if key != tenant_key(PRACTICUM_TOKEN):
+            if heartbeat is not None:
+                heartbeat.forget(key)
+                heartbeat.planned(tenant_key(PRACTICUM_TOKEN), clock())
+            key = tenant_key(PRACTICUM_TOKEN)
+            timestamp = store.cursor(key, int(clock()))
+            status, changed_at = schedule.seed(store, key, clock())
+        if heartbeat is not None:
+            heartbeat.started(key)
+        timestamp, homeworks = run_cycle(
+            bot, TELEGRAM_CHAT_ID, auth_headers(PRACTICUM_TOKEN), timestamp,
+            store, key, errors)
+        store.flush()
+        now = clock()
+        status, changed_at = schedule.observe(
+            status, changed_at, homeworks, now)
+        delay = schedule.next_delay(status, changed_at, now)
+        if heartbeat is not None:
+            heartbeat.finished(key, homeworks is not None)
+            heartbeat.planned(key, now + delay)
+        if sleep(delay):
+            return
+
+
 def main():
     """Основная логика работы бота."""
     logging.info(BOT_WORKING)
     if not check_tokens():
         raise ValueError(FAULT_TOKENS)
-    timestamp = int(time.time())  # 1639661979 - 86400
-    bot = Bot(token=TELEGRAM_TOKEN)
+    store = StatusStore()
+    telegram = LazyBot(TELEGRAM_TOKEN)
+    outbound = SendQueue(telegram, workers=1)
+    bot = outbox.wrap(digest.wrap(outbound))
+    if start_server() is not None:
+        from engine import register_gauges
+        register_gauges(outbound)
+    from commands import start_listener
+    listener = start_listener(telegram, outbound, store, own_chats())
 
-    while True:
-        try:
-            response = get_api_answer(timestamp)
-            homeworks = (check_response(response))
-            if len(homeworks) > 0:
-                send_message(bot, (parse_status(homeworks[0])))
-            timestamp = response.get('current_date', timestamp)
-        except Exception as error:
-            message = MESSAGE.format(faults=error)
-            try:
-                logging.error(message)
-                send_message(bot, message)
-            except Exception as error:
-                logging.error(ERROR_NETWORK.format(fault=error))
-        time.sleep(RETRY_TIME)
+    def reload_chats():
+        if listener is not None:
+            listener.chats = own_chats()
+
+    schedule = AdaptiveSchedule(default=RETRY_TIME)
+    heartbeat = Heartbeat()
+    watchdog = start_watchdog(heartbeat, outbound, REGISTRY)
+    lifecycle = Lifecycle().install()
+    interrupt_cycles(lifecycle)
+    lifecycle.on_stop(watchdog.stop)
+    lifecycle.on_reload(reload_config)
+    lifecycle.on_reload(reload_chats)
+    lifecycle.on_reload(schedule.reload)
+    lifecycle.on_reload(PROFILER.reload)
+    PROFILER.install()
+    poll_loop(bot, store, schedule, ErrorSuppressor(), lifecycle.sleep,
+              heartbeat=heartbeat)
+    shutdown(lifecycle, bot, outbound, store)
 
 
 if __name__ == '__main__':
-    record = os.path.join(PATH, 'record.log')
-    logging.basicConfig(
-        handlers=[logging.FileHandler(record, encoding='UTF-8',),
-                  logging.StreamHandler(), ],
-        level=logging.DEBUG,
-        format=('%(asctime)s; %(levelname)s; %(funcName)s; '
-                '№:%(lineno)s; %(message)s')
-    )
-    main()
+    if '--startup-profile' in sys.argv:
+        from startup import report
+        sys.exit(report())
+    from logs import setup_logging
+    setup_logging()
+    if sys.argv[1:2] == ['backfill']:
+        from backfill import main as backfill
+        sys.exit(backfill(sys.argv[2:]))
+    if os.getenv('TENANTS_FILE') and int(os.getenv('WORKERS', 1)) > 1:
+        from supervisor import run_supervisor
+        run_supervisor(os.getenv('TENANTS_FILE'))
+    elif os.getenv('TENANTS_FILE'):
+        from engine import run_engine
+        run_engine(os.getenv('TENANTS_FILE'))
+    else:
+        main()
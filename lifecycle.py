@@ -0,0 +1,90 @@
+import logging
+import os
+import signal
+import threading
+import time
+
+
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 20))
+STOP_SIGNALS = ('SIGTERM', 'SIGINT')
+RELOAD_SIGNAL = 'SIGHUP'
+STOPPING = 'Получен {signal}, бот завершает работу (не дольше {timeout:.0f} с)'
+RELOADING = 'Получен {signal}, перечитывается конфигурация'
+RELOAD_FAILED = 'Сбой при перечитывании конфигурации: {fault}'
+
+
+class Lifecycle:
+    """Ожидание между циклами, которое прерывают сигналы.
+
+    SIGTERM и SIGINT будят sleep() и вызывают обработчики on_stop;
+    после этого на завершение отводится timeout секунд, остаток
+    возвращает remaining(). SIGHUP будит sleep(), а обработчики
+    on_reload выполняются в отдельном потоке, а не в обработчике
+    сигнала.
+    """
+
+    def __init__(self, timeout=SHUTDOWN_TIMEOUT, clock=time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()
+        self.deadline = None
+        self.stop_callbacks = []
+        self.reload_callbacks = []
+
+    def install(self):
+        """Назначаются обработчики сигналов; только из главного потока."""
+        for name in STOP_SIGNALS:
+            signal.signal(getattr(signal, name), self.handle_stop)
+        if hasattr(signal, RELOAD_SIGNAL):
+            signal.signal(getattr(signal, RELOAD_SIGNAL), self.handle_reload)
+        return self
+
+    def on_stop(self, callback):
+        """callback вызывается при остановке."""
+        self.stop_callbacks.append(callback)
+
+    def on_reload(self, callback):
+        """callback вызывается при перечитывании конфигурации."""
+        self.reload_callbacks.append(callback)
+
+    def handle_stop(self, signum, frame):
+        logging.warning(STOPPING.format(
+            signal=signal.Signals(signum).name, timeout=self.timeout))
+        self.stop()
+
+    def handle_reload(self, signum, frame):
+        logging.info(RELOADING.format(signal=signal.Signals(signum).name))
+        threading.Thread(target=self.reload, daemon=True).start()
+
+    def stop(self):
+        """Начинается остановка; повторный вызов ничего не меняет."""
+        if self.stopping.is_set():
+            return
+        self.deadline = self.clock() + self.timeout
+        self.stopping.set()
+        self.wakeup.set()
+        for callback in self.stop_callbacks:
+            callback()
+
+    def reload(self):
+        """Вызываются обработчики перечитывания конфигурации."""
+        for callback in self.reload_callbacks:
+            try:
+                callback()
+            except Exception as error:
+                logging.error(RELOAD_FAILED.format(fault=error))
+        self.wakeup.set()
+
+    def sleep(self, delay):
+        """Ожидание до delay секунд; True, если началась остановка."""
+        if not self.stopping.is_set():
+            self.wakeup.wait(delay)
+            self.wakeup.clear()
+        return self.stopping.is_set()
+
+    def remaining(self):
+        """Сколько секунд осталось на завершение."""
+        if self.deadline is None:
+            return self.timeout
+        return max(self.deadline - self.clock(), 0)
@@ -0,0 +1,165 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+from contextvars import ContextVar
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from logging.handlers import RotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler
+
+
+LOG_PATH = os.getenv('LOG_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'record.log'))
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_ROTATE = os.getenv('LOG_ROTATE', 'size')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_WHEN = os.getenv('LOG_WHEN', 'midnight')
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', 5))
+LOG_DEBUG_SAMPLE = float(os.getenv('LOG_DEBUG_SAMPLE', 1))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+TEXT_FORMAT = ('%(asctime)s; %(levelname)s; %(funcName)s; '
+               '№:%(lineno)s; %(message)s')
+ROTATE_ERROR = 'Неизвестный способ ротации журнала: {rotate}'
+
+tenant_var = ContextVar('tenant', default=None)
+stage_var = ContextVar('stage', default=None)
+
+
+class ContextFilter(logging.Filter):
+    """Записи дополняются пользователем и стадией цикла.
+
+    DEBUG-записи пропускаются с вероятностью sample: при тысячах
+    пользователей они составляют основной поток журнала.
+    """
+
+    def __init__(self, sample=LOG_DEBUG_SAMPLE, rng=random.random):
+        super().__init__()
+        self.sample = sample
+        self.rng = rng
+
+    def filter(self, record):
+        if (record.levelno <= logging.DEBUG and self.sample < 1
+                and self.rng() >= self.sample):
+            return False
+        record.tenant = tenant_var.get()
+        record.stage = stage_var.get()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Запись кладётся в очередь; при переполнении она отбрасывается.
+
+    Поток опроса никогда не ждёт диска: если писатель не успевает,
+    теряются записи журнала, а не время цикла.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """Сообщение собирается из аргументов, остальное — в писателе.
+
+        Стандартный prepare форматирует запись целиком и копирует её
+        прямо в потоке опроса; здесь очередь не покидает процесс, поэтому
+        достаточно зафиксировать текст сообщения.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись журнала одной строкой JSON."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'function': record.funcName,
+            'line': record.lineno,
+            'message': record.getMessage(),
+        }
+        for field in ('tenant', 'stage'):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class Listener(QueueListener):
+    """QueueListener, который можно останавливать повторно."""
+
+    running = False
+
+    def start(self):
+        super().start()
+        self.running = True
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            super().stop()
+
+
+def file_handler(path, rotate=LOG_ROTATE):
+    """Файловый обработчик с ротацией по размеру или по времени."""
+    if rotate == 'size':
+        return RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+            encoding='UTF-8')
+    if rotate == 'time':
+        return TimedRotatingFileHandler(
+            path, when=LOG_WHEN, backupCount=LOG_BACKUPS, encoding='UTF-8')
+    raise ValueError(ROTATE_ERROR.format(rotate=rotate))
+
+
+def worker_path(number, path=LOG_PATH):
+    """Отдельный файл журнала рабочего процесса number."""
+    root, extension = os.path.splitext(path)
+    return f'{root}.{number}{extension}'
+
+
+def setup_logging(path=LOG_PATH, level=LOG_LEVEL, log_format=LOG_FORMAT,
+                  rotate=LOG_ROTATE, sample=LOG_DEBUG_SAMPLE,
+                  queue_size=LOG_QUEUE_SIZE, stream=True):
+    """Журнал пишется фоновым потоком; возвращается QueueListener.
+
+    Корневой логгер получает только DroppingQueueHandler. Форматирование
+    и запись в файл и в консоль выполняет QueueListener, он
+    останавливается при выходе из процесса и дописывает очередь.
+    """
+    formatter = (JsonFormatter() if log_format == 'json'
+                 else logging.Formatter(TEXT_FORMAT))
+    handlers = [file_handler(path, rotate)]
+    if stream:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.Queue(queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter(sample))
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+        old.close()
+    root.addHandler(handler)
+    root.setLevel(level)
+    listener = Listener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,218 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from exceptions import CircuitOpen
+from exceptions import ErrorApi
+from exceptions import ErrorTimeout
+from exceptions import NotModified
+from exceptions import ResponseJsonError
+from logs import stage_var
+
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = os.getenv('METRICS_PORT')
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+OUTCOMES = (
+    (NotModified, 'not_modified'),
+    (CircuitOpen, 'circuit_open'),
+    (ErrorApi, 'error_api'),
+    (ResponseJsonError, 'response_json_error'),
+    (ErrorTimeout, 'timeout'),
+    (ConnectionError, 'connection_error'),
+)
+STAGE_DURATION = 'homework_stage_duration_seconds'
+STAGE_HELP = 'Длительность стадии цикла опроса по исходу'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+JSON_TYPE = 'application/json; charset=utf-8'
+
+
+def outcome(error):
+    """Метка исхода стадии по типу исключения."""
+    if error is None:
+        return 'ok'
+    for error_type, label in OUTCOMES:
+        if isinstance(error, error_type):
+            return label
+    return 'error'
+
+
+def format_labels(labels):
+    """Метки в формате Prometheus: {name="value",...}."""
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels)
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин и метками."""
+
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Учитывается одно наблюдение."""
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [
+                    [0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        """Число наблюдений с заданными метками."""
+        series = self.series.get(tuple(sorted(labels.items())))
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        """Строки гистограммы в текстовом формате Prometheus."""
+        lines = [f'# HELP {self.name} {self.help_text}',
+                 f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = [(key, list(counts), total)
+                      for key, (counts, total) in sorted(self.series.items())]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, format_labels(key + (('le', bound),)),
+                    cumulative))
+            lines.append(f'{self.name}_sum{format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{format_labels(key)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Значение, которое вычисляется функцией при каждом опросе метрик."""
+
+    def __init__(self, name, help_text, function):
+        self.name = name
+        self.help_text = help_text
+        self.function = function
+
+    def render(self):
+        """Строки метрики в текстовом формате Prometheus."""
+        return [f'# HELP {self.name} {self.help_text}',
+                f'# TYPE {self.name} gauge',
+                f'{self.name} {self.function()}']
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.stages = self.add(Histogram(STAGE_DURATION, STAGE_HELP))
+        self.health = None
+
+    def add(self, metric):
+        """Метрика регистрируется под своим именем, повторная заменяет."""
+        self.metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name, help_text, function):
+        """Регистрируется метрика-функция."""
+        return self.add(Gauge(name, help_text, function))
+
+    @contextmanager
+    def stage(self, name):
+        """Замеряется длительность стадии цикла и её исход.
+
+        На время стадии её имя попадает в поле stage записей журнала.
+        """
+        started = time.perf_counter()
+        error = None
+        token = stage_var.set(name)
+        try:
+            yield
+        except BaseException as exception:
+            error = exception
+            raise
+        finally:
+            stage_var.reset(token)
+            self.stages.observe(time.perf_counter() - started,
+                                stage=name, outcome=outcome(error))
+
+    def timed(self, name):
+        """Декоратор: вызов функции учитывается как стадия name."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def metrics_handler():
+    """Класс обработчика GET /metrics и /health.
+
+    http.server грузится только здесь. /health отдаёт отчёт
+    registry.health() в JSON: код 200 при статусе ok, иначе 503.
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            registry = self.server.registry
+            if path == '/metrics':
+                self.reply(200, CONTENT_TYPE, registry.render())
+            elif path == '/health':
+                report = (registry.health() if registry.health is not None
+                          else {'status': 'ok'})
+                status = 200 if report.get('status') == 'ok' else 503
+                self.reply(status, JSON_TYPE, json.dumps(report))
+            else:
+                self.send_error(404)
+
+        def reply(self, status, content_type, text):
+            body = text.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MetricsHandler
+
+
+def start_server(port=METRICS_PORT, host=METRICS_HOST, registry=REGISTRY):
+    """Запускается HTTP-сервер метрик в фоновом потоке; None без порта."""
+    if port is None:
+        return None
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, int(port)), metrics_handler())
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,268 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+
+
+OUTBOX = os.getenv('OUTBOX', 'false').lower() == 'true'
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'outbox.log'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+OUTBOX_RETRY_DELAY = float(os.getenv('OUTBOX_RETRY_DELAY', 30))
+OUTBOX_KEEP_ACKED = int(os.getenv('OUTBOX_KEEP_ACKED', 10000))
+PUT = 'put'
+ACK = 'ack'
+REPLAYED = ('Из журнала отправки восстановлено неотправленных '
+            'сообщений: {count}')
+BROKEN_RECORD = 'Повреждённая запись журнала отправки {path}: {line!r}'
+DROPPED = ('Сообщение {message_id} в чат {chat_id} не доставлено '
+           'после {attempts} попыток и удалено из журнала')
+
+
+def message_id(chat_id, event):
+    """Постоянный идентификатор сообщения о событии event для чата."""
+    data = json.dumps([str(chat_id), *event], ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()[:32]
+
+
+def encode(operation, message, chat_id=None, text=None, digest=False):
+    """Строка журнала: операция, id и для put — чат, текст и сводка."""
+    record = {'op': operation, 'id': message}
+    if operation == PUT:
+        record.update(chat_id=chat_id, text=text)
+        if digest:
+            record['digest'] = True
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode()
+
+
+class Outbox:
+    """Журнал исходящих сообщений на диске перед отправкой в Telegram.
+
+    send_message дописывает сообщение в журнал и возвращается только
+    после fsync, затем передаёт его в outbound (SendQueue или
+    DigestQueue). Запись групповая только между потоками: пока один
+    поток ждёт fsync, сообщения остальных копятся и уходят на диск
+    следующим одним fsync; одиночный цикл опроса платит fsync за каждое
+    сообщение. После доставки в журнал
+    дописывается подтверждение; оно сбрасывается на диск вместе со
+    следующей записью, поэтому после сбоя ОС, но не процесса, последние
+    доставленные сообщения могут уйти ещё раз. Неудачная отправка
+    повторяется через retry_delay секунд с удвоением, после
+    max_attempts попыток сообщение удаляется из журнала.
+
+    При открытии журнал перечитывается, неподтверждённые сообщения
+    отправляются снова, а сам журнал переписывается без подтверждённых.
+    Сообщение с event получает постоянный идентификатор, и повторное
+    сообщение о том же событии, например после перезапуска до сохранения
+    курсора, отбрасывается. Если outbound — DigestQueue, такие сообщения
+    уже записанными в журнал попадают в сводку через add(), а
+    подтверждаются, когда доставлена вся сводка.
+    """
+
+    def __init__(self, outbound, path=OUTBOX_PATH,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS,
+                 retry_delay=OUTBOX_RETRY_DELAY,
+                 keep_acked=OUTBOX_KEEP_ACKED):
+        self.outbound = outbound
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.keep_acked = keep_acked
+        self.lock = threading.Lock()
+        self.synced_cond = threading.Condition(self.lock)
+        self.pending = {}
+        self.acked = {}
+        self.attempts = {}
+        self.buffer = []
+        self.appended = self.written = self.synced = 0
+        self.syncing = False
+        self.syncs = self.records = 0
+        self.file = None
+        self.closed = False
+        self.replay()
+        self.compact()
+        if self.pending:
+            logging.warning(REPLAYED.format(count=len(self.pending)))
+        for message in list(self.pending):
+            self.deliver(message)
+
+    def replay(self):
+        """Журнал читается: неподтверждённые сообщения и подтверждённые id."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    operation, message = record['op'], record['id']
+                except (ValueError, KeyError, TypeError):
+                    logging.warning(BROKEN_RECORD.format(
+                        path=self.path, line=line[:100]))
+                    continue
+                if operation == PUT and message not in self.acked:
+                    self.pending[message] = (
+                        record['chat_id'], record['text'],
+                        record.get('digest', False))
+                elif operation == ACK:
+                    self.pending.pop(message, None)
+                    self.acked[message] = None
+
+    def compact(self):
+        """Журнал переписывается: неподтверждённые и последние id.
+
+        Вызывается под self.lock или до начала работы.
+        """
+        acked = list(self.acked)[-self.keep_acked:]
+        self.acked = dict.fromkeys(acked)
+        lines = [encode(PUT, message, *entry)
+                 for message, entry in self.pending.items()]
+        lines.extend(encode(ACK, message) for message in acked)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(b''.join(lines))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        if self.file is not None:
+            self.file.close()
+        self.file = open(self.path, 'ab')
+        self.records = len(lines)
+
+    def send_message(self, chat_id=None, text=None, event=None, **kwargs):
+        """Сообщение надёжно записывается в журнал и ставится в очередь.
+
+        Повтор сообщения о том же event отбрасывается; сообщение с event
+        при DigestQueue в outbound уходит в сводку.
+        """
+        message = (uuid.uuid4().hex if event is None
+                   else message_id(chat_id, event))
+        entry = (chat_id, text, event is not None)
+        with self.lock:
+            if message in self.pending or message in self.acked:
+                return
+            self.pending[message] = entry
+        self.append(encode(PUT, message, *entry), sync=True)
+        self.deliver(message)
+
+    def append(self, line, sync):
+        """Строка дописывается в журнал; при sync — ждётся её fsync."""
+        with self.synced_cond:
+            if self.closed:
+                return
+            self.buffer.append(line)
+            self.appended += 1
+            ticket = self.appended
+            if not sync:
+                if not self.syncing:
+                    self.write()
+                return
+            while self.synced < ticket:
+                if self.syncing:
+                    self.synced_cond.wait()
+                    continue
+                self.sync()
+
+    def write(self):
+        """Буфер записывается в файл без fsync; под self.lock."""
+        if self.buffer:
+            self.file.write(b''.join(self.buffer))
+            self.file.flush()
+            self.records += len(self.buffer)
+            self.buffer.clear()
+        self.written = self.appended
+
+    def sync(self):
+        """Буфер записывается, fsync выполняется без блокировки.
+
+        Под self.lock; пока идёт fsync, новые строки копятся в буфере.
+        """
+        self.syncing = True
+        self.write()
+        target = self.written
+        self.lock.release()
+        try:
+            os.fsync(self.file.fileno())
+        finally:
+            self.lock.acquire()
+            self.syncing = False
+            self.synced_cond.notify_all()
+        self.synced = max(self.synced, target)
+        self.syncs += 1
+        if self.buffer:
+            self.write()
+
+    def deliver(self, message):
+        """Сообщение передаётся в очередь отправки или в сводку."""
+        with self.lock:
+            if message not in self.pending:
+                return
+            chat_id, text, digest = self.pending[message]
+        callback = functools.partial(self.done, message)
+        if digest and hasattr(self.outbound, 'add'):
+            self.outbound.add(chat_id, text, callback=callback)
+        else:
+            self.outbound.send_message(
+                chat_id=chat_id, text=text, callback=callback)
+
+    def done(self, message, delivered):
+        """Итог отправки: подтверждение или повтор с задержкой."""
+        if delivered:
+            self.ack(message)
+            return
+        with self.lock:
+            attempts = self.attempts[message] = (
+                self.attempts.get(message, 0) + 1)
+            chat_id = self.pending.get(message, (None,))[0]
+        if attempts >= self.max_attempts:
+            logging.error(DROPPED.format(
+                message_id=message, chat_id=chat_id, attempts=attempts))
+            self.ack(message)
+            return
+        timer = threading.Timer(self.retry_delay * 2 ** (attempts - 1),
+                                self.deliver, (message,))
+        timer.daemon = True
+        timer.start()
+
+    def ack(self, message):
+        """Сообщение подтверждается; повторный вызов ничего не меняет."""
+        with self.lock:
+            if self.pending.pop(message, None) is None:
+                return
+            self.attempts.pop(message, None)
+            self.acked[message] = None
+            if len(self.acked) > 2 * self.keep_acked:
+                self.acked = dict.fromkeys(
+                    list(self.acked)[-self.keep_acked:])
+        self.append(encode(ACK, message), sync=False)
+        with self.lock:
+            if (not self.closed and not self.syncing and not self.buffer
+                    and self.records > 2 * (len(self.pending)
+                                            + self.keep_acked)):
+                self.compact()
+
+    def stats(self):
+        """Неподтверждённые сообщения и число fsync для мониторинга."""
+        with self.lock:
+            return {'pending': len(self.pending), 'syncs': self.syncs}
+
+    def close(self):
+        """Подтверждения сбрасываются на диск, журнал закрывается."""
+        with self.synced_cond:
+            while self.syncing:
+                self.synced_cond.wait()
+            if self.closed:
+                return
+            self.closed = True
+            self.write()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+
+def wrap(outbound, enabled=OUTBOX, path=OUTBOX_PATH):
+    """Перед outbound ставится журнал Outbox, если он включён."""
+    if not enabled:
+        return outbound
+    return Outbox(outbound, path)
@@ -0,0 +1,186 @@
+import functools
+import io
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+
+PROFILE_CYCLES = int(os.getenv('PROFILE_CYCLES', 0))
+PROFILE_SIGNAL_CYCLES = int(os.getenv('PROFILE_SIGNAL_CYCLES', 10))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', 15))
+PROFILE_SIGNAL = 'SIGUSR1'
+FOCUS = ('run_cycle', 'fetch_homeworks', 'get_api_answer', 'check_response',
+         'parse_status', 'notify', 'send_message', 'send_chat_message')
+PROFILE_ARMED = 'Профилирование включено на {cycles} циклов опроса'
+PROFILE_HEADER = ('Профиль {cycles} циклов опроса ({path}):\n'
+                  'Функции цикла:\n{focus}\n'
+                  'Топ-{top} по общему времени:\n{functions}\n'
+                  'Топ-{top} по приросту памяти:\n{memory}')
+PROFILE_FAILED = 'Не удалось записать профиль циклов опроса: {fault}'
+FOCUS_LINE = ('  {name}: вызовов {calls}, всего {total:.1f} мс, '
+              'на вызов {each:.3f} мс')
+
+
+def focus_lines(stats, names=FOCUS):
+    """Время функций цикла опроса из pstats.Stats."""
+    lines = []
+    for (path, _, name), (_, calls, _, total, _) in stats.stats.items():
+        if name in names and path.endswith('homework.py'):
+            lines.append((names.index(name), FOCUS_LINE.format(
+                name=name, calls=calls, total=total * 1000,
+                each=total * 1000 / calls if calls else 0)))
+    return '\n'.join(line for _, line in sorted(lines))
+
+
+class Profiler:
+    """Профилирование заданного числа циклов опроса по запросу.
+
+    request() включает cProfile для следующих cycles вызовов функции,
+    обёрнутой в cycle(), и tracemalloc на время этих циклов. Циклы в
+    разных потоках профилируются каждый своим cProfile и складываются.
+    С Python 3.12 в процессе может быть включён только один cProfile, и
+    он видит все потоки; тогда цикл, начатый при уже включённом
+    профиле, отдельно не профилируется, но в сессии учитывается.
+    Когда все циклы пройдены, статистика пишется в файлы PROFILE_DIR с
+    меткой времени (.pstats для pstats и snakeviz, .txt со сводкой), а
+    сводка — в журнал. Пока профилирование не запрошено, обёртка
+    проверяет одно поле и вызывает функцию как есть.
+    """
+
+    def __init__(self, cycles=PROFILE_CYCLES, directory=PROFILE_DIR,
+                 top=PROFILE_TOP, signal_cycles=PROFILE_SIGNAL_CYCLES):
+        self.directory = directory
+        self.top = top
+        self.signal_cycles = signal_cycles
+        self.lock = threading.Lock()
+        self.requested = 0
+        self.running = 0
+        self.profiled = 0
+        self.stats = None
+        self.snapshot = None
+        self.started_tracing = False
+        if cycles:
+            self.request(cycles)
+
+    def request(self, cycles=None):
+        """Профилируются следующие cycles циклов; годится для сигнала."""
+        self.requested = cycles or self.signal_cycles
+
+    def handle_signal(self, signum, frame):
+        self.request()
+
+    def install(self, name=PROFILE_SIGNAL):
+        """Сигнал name включает профилирование; только из главного потока."""
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), self.handle_signal)
+        return self
+
+    def reload(self):
+        """Профилирование включается, если в окружении задан PROFILE_CYCLES."""
+        cycles = int(os.getenv('PROFILE_CYCLES', 0))
+        if cycles:
+            self.request(cycles)
+
+    def cycle(self, function):
+        """Декоратор цикла опроса, который профилируется по запросу."""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.requested:
+                return function(*args, **kwargs)
+            with self.profile():
+                return function(*args, **kwargs)
+        return wrapper
+
+    @contextmanager
+    def profile(self):
+        """Один цикл под cProfile; последний цикл сессии пишет отчёт."""
+        import cProfile
+        import tracemalloc
+
+        with self.lock:
+            armed = self.requested > 0
+            if armed:
+                self.requested -= 1
+                self.running += 1
+                if self.snapshot is None:
+                    logging.info(PROFILE_ARMED.format(
+                        cycles=self.requested + 1))
+                    self.started_tracing = not tracemalloc.is_tracing()
+                    if self.started_tracing:
+                        tracemalloc.start()
+                    self.snapshot = tracemalloc.take_snapshot()
+        if not armed:
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            try:
+                profile.enable()
+            except ValueError:
+                profile = None
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self.lock:
+                if profile is not None:
+                    self.merge(profile)
+                self.profiled += 1
+                self.running -= 1
+                done = not self.requested and not self.running
+                if done:
+                    session = self.stats, self.snapshot, self.profiled
+                    self.stats = self.snapshot = None
+                    self.profiled = 0
+            if done:
+                try:
+                    self.finish(*session)
+                except Exception as error:
+                    logging.error(PROFILE_FAILED.format(fault=error))
+
+    def merge(self, profile):
+        """Статистика цикла добавляется к статистике сессии."""
+        import pstats
+
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+
+    def finish(self, stats, before, cycles):
+        """Отчёт сессии пишется в файлы и в журнал; возвращается путь."""
+        import pstats
+        import tracemalloc
+
+        if stats is None:
+            stats = pstats.Stats()
+
+        memory = tracemalloc.take_snapshot().compare_to(before, 'lineno')
+        if self.started_tracing:
+            tracemalloc.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        path = os.path.join(self.directory, 'profile-{}.{:03d}-{}'.format(
+            time.strftime('%Y%m%d-%H%M%S', time.localtime(now)),
+            int(now % 1 * 1000), os.getpid()))
+        stats.dump_stats(path + '.pstats')
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats('cumulative').print_stats(self.top)
+        report = PROFILE_HEADER.format(
+            cycles=cycles, path=path, top=self.top,
+            focus=focus_lines(stats),
+            functions=output.getvalue().strip(),
+            memory='\n'.join(str(line) for line in memory[:self.top]))
+        with open(path + '.txt', 'w', encoding='UTF-8') as file:
+            file.write(report)
+        logging.info(report)
+        return path
+
+
+PROFILER = Profiler()
@@ -0,0 +1,68 @@
+import calendar
+import enum
+import time
+
+
+API_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+UNKNOWN_STATUS = 'Неожиданное принятое значение {value}'
+
+
+class Status(enum.Enum):
+    """Статус проверки работы; значения — ключи HOMEWORK_STATUSES."""
+
+    APPROVED = 'approved'
+    REVIEWING = 'reviewing'
+    REJECTED = 'rejected'
+
+
+STATUSES = {status.value: status for status in Status}
+
+
+class Homework:
+    """Работа из ответа API: только поля, которые использует бот.
+
+    Статус хранится членом Status, то есть ссылкой на общий объект, а не
+    отдельной строкой в каждой записи.
+    """
+
+    __slots__ = ('name', 'status', 'date_updated')
+
+    def __init__(self, name, status, date_updated=None):
+        self.name = name
+        self.status = status
+        self.date_updated = date_updated
+
+    def __repr__(self):
+        return (f'Homework({self.name!r}, {self.status}, '
+                f'{self.date_updated!r})')
+
+    def __eq__(self, other):
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return ((self.name, self.status, self.date_updated)
+                == (other.name, other.status, other.date_updated))
+
+    @classmethod
+    def from_payload(cls, item):
+        """Запись из словаря ответа API.
+
+        KeyError — если нет homework_name или статус не из Status.
+        """
+        status = STATUSES.get(item.get('status'))
+        if status is None:
+            raise KeyError(UNKNOWN_STATUS.format(value=item.get('status')))
+        return cls(item['homework_name'], status, item.get('date_updated'))
+
+
+def api_timestamp(value):
+    """Время date_updated из ответа API в секундах эпохи или None."""
+    try:
+        return calendar.timegm(time.strptime(value, API_DATE_FORMAT))
+    except (TypeError, ValueError):
+        return None
+
+
+def to_records(items):
+    """Работы ответа API переводятся в записи за один проход."""
+    from_payload = Homework.from_payload
+    return [from_payload(item) for item in items]
@@ -0,0 +1,103 @@
+import os
+import random
+
+
+RETRY_TIME = 600
+IDLE_STEP = 86400
+
+
+def read_settings():
+    """Интервалы опроса, их предел и разброс из переменных окружения."""
+    return {
+        'intervals': {
+            'reviewing': int(os.getenv('POLL_INTERVAL_REVIEWING', 120)),
+            'rejected': int(os.getenv('POLL_INTERVAL_REJECTED', RETRY_TIME)),
+            'approved': int(os.getenv('POLL_INTERVAL_APPROVED', 1800)),
+        },
+        'max_interval': int(os.getenv('POLL_INTERVAL_MAX', 3600)),
+        'jitter': float(os.getenv('POLL_JITTER', 0.1)),
+    }
+
+
+SETTINGS = read_settings()
+INTERVALS = SETTINGS['intervals']
+MAX_INTERVAL = SETTINGS['max_interval']
+JITTER = SETTINGS['jitter']
+
+
+def current_status(homeworks):
+    """Статус, по которому выбирается интервал опроса.
+
+    Если хоть одна работа на ревью — reviewing, иначе статус работы с
+    самым поздним date_updated.
+    """
+    statuses = [homework.status.value for homework in homeworks]
+    if 'reviewing' in statuses:
+        return 'reviewing'
+    return max(homeworks, key=lambda homework: (
+        homework.date_updated or '')).status.value
+
+
+class AdaptiveSchedule:
+    """Интервал следующего опроса по последнему статусу работы.
+
+    Пока работа на ревью, API опрашивается чаще. Для остальных статусов
+    интервал удваивается за каждые idle_step секунд без изменений, но не
+    превышает max_interval. К интервалу добавляется случайный разброс
+    jitter, чтобы опросы множества пользователей не совпадали по времени.
+    """
+
+    def __init__(self, intervals=None, default=RETRY_TIME,
+                 max_interval=MAX_INTERVAL, idle_step=IDLE_STEP,
+                 jitter=JITTER, rng=None):
+        self.intervals = INTERVALS if intervals is None else intervals
+        self.default = default
+        self.max_interval = max_interval
+        self.idle_step = idle_step
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+
+    def reload(self):
+        """Интервалы, предел и разброс перечитываются из окружения."""
+        settings = read_settings()
+        self.intervals = settings['intervals']
+        self.max_interval = settings['max_interval']
+        self.jitter = settings['jitter']
+
+    def seed(self, store, key, now):
+        """Статус и время его смены для пользователя key из хранилища.
+
+        Нужны после перезапуска: работа, которая была на ревью, сразу
+        опрашивается часто, а не с начала отсчёта.
+        """
+        statuses = store.homeworks(key).values()
+        history = store.history(key, 1)
+        if 'reviewing' in statuses:
+            status = 'reviewing'
+        elif history:
+            status = history[0][1]
+        else:
+            return None, now
+        return status, history[0][2] if history else now
+
+    def observe(self, status, changed_at, homeworks, now):
+        """Возвращаются статус и время его смены после цикла опроса."""
+        if not homeworks:
+            return status, changed_at
+        latest = current_status(homeworks)
+        if latest != status:
+            return latest, now
+        return status, changed_at
+
+    def interval(self, status, changed_at, now):
+        """Интервал до следующего опроса без случайного разброса."""
+        base = self.intervals.get(status, self.default)
+        if status == 'reviewing':
+            return base
+        idle = max(now - changed_at, 0) / self.idle_step
+        return min(base * 2 ** min(idle, 16), max(self.max_interval, base))
+
+    def next_delay(self, status, changed_at, now):
+        """Интервал до следующего опроса со случайным разбросом."""
+        spread = self.rng.uniform(-self.jitter, self.jitter)
+        return self.interval(status, changed_at, now) * (1 + spread)
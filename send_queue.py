@@ -0,0 +1,324 @@
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+
+from exceptions import ErrorTimeout
+from metrics import REGISTRY
+
+
+GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+SEND_WORKERS = int(os.getenv('TELEGRAM_SEND_WORKERS', 4))
+CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', 10))
+MAX_RETRIES = 3
+SEND_FAILED = 'Сообщение в чат {chat_id} не доставлено: {fault}'
+RETRY_AFTER = 'Telegram ограничил отправку, повтор через {delay} с'
+RETRIES_EXHAUSTED = 'исчерпаны повторы после ответа 429'
+TELEGRAM_TIMEOUT = 'Истекло время ожидания ответа Telegram: {fault}'
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Ведро токенов: не более rate событий в секунду, всплеск до capacity."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'clock', 'lock')
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Забирается токен; возвращается, сколько секунд его ждать."""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def delay(self):
+        """Через сколько секунд будет токен; сам токен не забирается."""
+        with self.lock:
+            tokens = min(self.capacity, self.tokens + (
+                self.clock() - self.updated) * self.rate)
+        return max(1 - tokens, 0) / self.rate
+
+
+class LazyBot:
+    """Бот Telegram, который создаётся при первой отправке сообщения.
+
+    Пакет telegram импортируется долго, поэтому его загрузка переносится
+    из запуска процесса в поток отправителя. Если request не передан,
+    соединения бота ограничены connect_timeout и read_timeout, а пул
+    рассчитан на всех отправителей и чтение команд. Истечение времени
+    ожидания Telegram бросается как ErrorTimeout.
+    """
+
+    def __init__(self, token, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, **kwargs):
+        self.token = token
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.kwargs = kwargs
+        self.bot = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """Возвращается настоящий бот, при первом вызове он создаётся."""
+        if self.bot is None:
+            with self.lock:
+                if self.bot is None:
+                    from telegram import Bot
+                    from telegram.utils.request import Request
+                    kwargs = dict(self.kwargs)
+                    kwargs.setdefault('request', Request(
+                        con_pool_size=SEND_WORKERS + 2,
+                        connect_timeout=self.connect_timeout,
+                        read_timeout=self.read_timeout))
+                    self.bot = Bot(token=self.token, **kwargs)
+        return self.bot
+
+    def send_message(self, **kwargs):
+        """Сообщение отправляется через настоящий бот."""
+        from telegram.error import TimedOut
+
+        bot = self.connect()
+        try:
+            return bot.send_message(**kwargs)
+        except TimedOut as error:
+            raise ErrorTimeout(TELEGRAM_TIMEOUT.format(fault=error))
+
+    def get_updates(self, **kwargs):
+        """Входящие обновления запрашиваются через настоящий бот."""
+        return self.connect().get_updates(**kwargs)
+
+
+class Shard:
+    """Доля чатов одного отправителя.
+
+    messages — входная очередь, held — ожидающие сообщения по чатам,
+    ready — куча (время готовности, номер, чат) чатов с сообщениями,
+    buckets — лимиты чатов.
+    """
+
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.held = {}
+        self.ready = []
+        self.order = itertools.count()
+        self.buckets = {}
+        self.stopping = False
+
+    def schedule(self, chat_id, bucket):
+        """Чат ставится в кучу на момент, когда лимит позволит отправку."""
+        heapq.heappush(self.ready, (
+            time.monotonic() + bucket.delay(), next(self.order), chat_id))
+
+
+class SendQueue:
+    """Очередь исходящих сообщений Telegram с пулом отправителей.
+
+    Объект подменяет бота: send_message только ставит сообщение в
+    очередь, поэтому опрос API не ждёт Telegram. Сообщения одного чата
+    всегда попадают к одному отправителю и уходят по порядку. Общий
+    лимит и лимит на чат соблюдаются через TokenBucket. Отправитель
+    держит сообщения своих чатов в куче по времени готовности чата:
+    пока один чат ждёт своего лимита, уходят сообщения других. Ответ 429
+    с retry_after приостанавливает все отправители. Если передан
+    callback, после попытки отправки он вызывается с True или False.
+    """
+
+    def __init__(self, bot, workers=SEND_WORKERS, global_rate=GLOBAL_RATE,
+                 chat_rate=CHAT_RATE, max_retries=MAX_RETRIES):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(global_rate)
+        self.shards = [Shard() for _ in range(workers)]
+        self.queues = [shard.messages for shard in self.shards]
+        self.paused_until = 0
+        self.lock = threading.Lock()
+        self.sent = self.failed = 0
+        self.wait_total = self.wait_max = 0
+        self.threads = [
+            threading.Thread(target=self.work, args=(shard,), daemon=True)
+            for shard in self.shards
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def send_message(self, chat_id=None, text=None, callback=None,
+                     **kwargs):
+        """Сообщение ставится в очередь на отправку."""
+        shard = zlib.crc32(str(chat_id).encode()) % len(self.queues)
+        self.queues[shard].put(
+            (time.monotonic(), chat_id, text, kwargs, callback))
+
+    def depth(self):
+        """Число сообщений, ожидающих отправки."""
+        with self.lock:
+            held = sum(len(pending) for shard in self.shards
+                       for pending in shard.held.values())
+        return held + sum(messages.qsize() for messages in self.queues)
+
+    def oldest(self):
+        """Сколько секунд ждёт самое старое сообщение в очереди."""
+        now = time.monotonic()
+        oldest = 0
+        for messages in self.queues:
+            with messages.mutex:
+                item = messages.queue[0] if messages.queue else None
+            if item is not None:
+                oldest = max(oldest, now - item[0])
+        with self.lock:
+            for shard in self.shards:
+                for pending in shard.held.values():
+                    oldest = max(oldest, now - pending[0][0])
+        return oldest
+
+    def stats(self):
+        """Глубина очереди, счётчики и время ожидания сообщений."""
+        delivered = self.sent + self.failed
+        return {
+            'depth': self.depth(),
+            'sent': self.sent,
+            'failed': self.failed,
+            'wait_avg': self.wait_total / delivered if delivered else 0,
+            'wait_max': self.wait_max,
+        }
+
+    def work(self, shard):
+        """Цикл отправителя: сообщения своей доли чатов.
+
+        Отправляется первое сообщение самого готового чата, остальные
+        чаты при этом не ждут чужого лимита.
+        """
+        while True:
+            while True:
+                try:
+                    self.hold(shard, shard.messages.get_nowait())
+                except queue.Empty:
+                    break
+            now = time.monotonic()
+            if shard.ready and shard.ready[0][0] <= now:
+                self.send_next(shard)
+                continue
+            if not shard.ready and shard.stopping:
+                return
+            try:
+                item = shard.messages.get(timeout=(
+                    shard.ready[0][0] - now if shard.ready else None))
+            except queue.Empty:
+                continue
+            self.hold(shard, item)
+
+    def hold(self, shard, item):
+        """Сообщение ставится за сообщениями своего чата."""
+        if item is None:
+            shard.stopping = True
+            shard.messages.task_done()
+            return
+        chat_id = item[1]
+        with self.lock:
+            pending = shard.held.setdefault(chat_id, deque())
+            pending.append(item)
+            first = len(pending) == 1
+        if first:
+            bucket = shard.buckets.get(chat_id)
+            if bucket is None:
+                if len(shard.buckets) >= MAX_CHAT_BUCKETS:
+                    for idle in [chat for chat in shard.buckets
+                                 if chat not in shard.held]:
+                        del shard.buckets[idle]
+                bucket = shard.buckets[chat_id] = TokenBucket(
+                    self.chat_rate, 1)
+            shard.schedule(chat_id, bucket)
+
+    def send_next(self, shard):
+        """Отправляется первое сообщение самого готового чата."""
+        _, _, chat_id = heapq.heappop(shard.ready)
+        bucket = shard.buckets[chat_id]
+        bucket.reserve()
+        time.sleep(self.global_bucket.reserve())
+        with self.lock:
+            pending = shard.held[chat_id]
+            enqueued, _, text, kwargs, callback = pending.popleft()
+            if not pending:
+                del shard.held[chat_id]
+        if pending:
+            shard.schedule(chat_id, bucket)
+        delivered = self.deliver(chat_id, text, kwargs)
+        self.record(time.monotonic() - enqueued, delivered)
+        if callback is not None:
+            callback(delivered)
+        shard.messages.task_done()
+
+    def deliver(self, chat_id, text, kwargs):
+        """Отправка с повтором после ответа 429; True при успехе."""
+        for _ in range(self.max_retries + 1):
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            try:
+                with REGISTRY.stage('deliver'):
+                    self.bot.send_message(
+                        chat_id=chat_id, text=text, **kwargs)
+                return True
+            except Exception as error:
+                delay = getattr(error, 'retry_after', None)
+                if delay is None:
+                    logging.error(SEND_FAILED.format(
+                        chat_id=chat_id, fault=error))
+                    return False
+                logging.warning(RETRY_AFTER.format(delay=delay))
+                with self.lock:
+                    self.paused_until = max(
+                        self.paused_until, time.monotonic() + delay)
+        logging.error(SEND_FAILED.format(
+            chat_id=chat_id, fault=RETRIES_EXHAUSTED))
+        return False
+
+    def record(self, wait, delivered):
+        """Учитывается время ожидания отправленного сообщения."""
+        with self.lock:
+            if delivered:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def join(self):
+        """Ожидается отправка всех сообщений, поставленных в очередь."""
+        for messages in self.queues:
+            messages.join()
+
+    def close(self, timeout=None):
+        """Отправляются оставшиеся сообщения и останавливаются потоки.
+
+        timeout ограничивает всё ожидание, а не каждый поток; возвращается
+        число сообщений, которые не успели уйти.
+        """
+        for messages in self.queues:
+            messages.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self.threads:
+            thread.join(None if deadline is None
+                        else max(deadline - time.monotonic(), 0))
+        alive = sum(thread.is_alive() for thread in self.threads)
+        return max(self.depth() - alive, 0)
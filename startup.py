@@ -0,0 +1,107 @@
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+
+STARTUP_BUDGET = float(os.getenv('STARTUP_BUDGET', 1.0))
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'homework.py')
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+FIRST_POLL = 'first-poll'
+PROBE = '''
+import os, runpy, sys, time
+import api_client
+
+
+def first_poll(self, **parameters):
+    sys.stderr.write('{marker} %r\\n' % time.monotonic())
+    sys.stderr.flush()
+    os._exit(0)
+
+
+api_client.PracticumClient.get = first_poll
+sys.argv = [{script!r}]
+runpy.run_path({script!r}, run_name='__main__')
+'''
+PROBE_ENV = {
+    'PRACTICUM_TOKEN': 'startup-profile',
+    'TELEGRAM_TOKEN': '123456:ABC-DEF1234ghIkl-zyx57W2v1u123ew11',
+    'TELEGRAM_CHAT_ID': '0',
+    'STORE_PATH': ':memory:',
+}
+REPORT_MODULE = '{cumulative:9.1f} мс {module}'
+REPORT_TOTAL = 'Импорт модулей: {imports:.1f} мс'
+REPORT_FIRST_POLL = ('Время до первого опроса: {first_poll:.1f} мс '
+                     '(бюджет {budget:.0f} мс)')
+OVER_BUDGET = 'Превышен бюджет времени запуска'
+PROBE_FAILED = 'Процесс завершился до первого опроса:\n{stderr}'
+
+
+def parse_importtime(stderr):
+    """Разбирается вывод -X importtime: (модуль, свой, общий, глубина).
+
+    Время в миллисекундах, глубина — уровень вложенности импорта.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            modules.append((module, int(own) / 1000,
+                            int(cumulative) / 1000, len(indent) // 2))
+    return modules
+
+
+def profile(script=SCRIPT, log_path=None):
+    """Запускается бот до первого запроса к API и замеряется запуск.
+
+    Журнал пробного процесса пишется в log_path, по умолчанию — во
+    временный каталог, а не рядом с ботом.
+
+    Возвращается словарь: modules — импорты верхнего уровня по убыванию
+    времени, imports — суммарное время импорта, loaded — имена всех
+    загруженных модулей, first_poll — время от запуска процесса до первого
+    запроса к API, в миллисекундах.
+    """
+    if log_path is None:
+        with tempfile.TemporaryDirectory() as directory:
+            return profile(script, os.path.join(directory, 'record.log'))
+    env = dict(os.environ, **PROBE_ENV, LOG_PATH=str(log_path))
+    for name in ('TENANTS_FILE', 'METRICS_PORT'):
+        env.pop(name, None)
+    started = time.monotonic()
+    child = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         PROBE.format(marker=FIRST_POLL, script=script)],
+        env=env, cwd=os.path.dirname(script), capture_output=True, text=True)
+    marks = [line.split()[1] for line in child.stderr.splitlines()
+             if line.startswith(FIRST_POLL)]
+    if not marks:
+        raise RuntimeError(PROBE_FAILED.format(stderr=child.stderr))
+    imported = parse_importtime(child.stderr)
+    modules = [module for module in imported if module[3] == 0]
+    modules.sort(key=lambda module: module[2], reverse=True)
+    return {
+        'modules': modules,
+        'imports': sum(module[2] for module in modules),
+        'loaded': {module[0] for module in imported},
+        'first_poll': (float(marks[0]) - started) * 1000,
+    }
+
+
+def report(budget=STARTUP_BUDGET, top=15, stream=sys.stdout):
+    """Печатается отчёт о запуске; возвращается код выхода."""
+    result = profile()
+    for module, _, cumulative, _ in result['modules'][:top]:
+        print(REPORT_MODULE.format(cumulative=cumulative, module=module),
+              file=stream)
+    print(REPORT_TOTAL.format(**result), file=stream)
+    print(REPORT_FIRST_POLL.format(budget=budget * 1000, **result),
+          file=stream)
+    if result['first_poll'] > budget * 1000:
+        print(OVER_BUDGET, file=stream)
+        return 1
+    return 0
@@ -0,0 +1,186 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+
+
+STORE_PATH = os.getenv('STORE_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'homework.sqlite3'))
+BATCH_SIZE = int(os.getenv('STORE_BATCH_SIZE', 100))
+FLUSH_INTERVAL = float(os.getenv('STORE_FLUSH_INTERVAL', 5))
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cursors ('
+    'tenant TEXT PRIMARY KEY, timestamp INTEGER NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS statuses ('
+    'tenant TEXT NOT NULL, homework_name TEXT NOT NULL, '
+    'status TEXT NOT NULL, PRIMARY KEY (tenant, homework_name))',
+    'CREATE TABLE IF NOT EXISTS history ('
+    'tenant TEXT NOT NULL, homework_name TEXT NOT NULL, '
+    'status TEXT NOT NULL, changed_at REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS history_tenant '
+    'ON history (tenant, changed_at)',
+)
+SAVE_CURSOR = ('INSERT INTO cursors (tenant, timestamp) VALUES (?, ?) '
+               'ON CONFLICT (tenant) DO UPDATE '
+               'SET timestamp = excluded.timestamp')
+SAVE_STATUS = ('INSERT INTO statuses (tenant, homework_name, status) '
+               'VALUES (?, ?, ?) ON CONFLICT (tenant, homework_name) '
+               'DO UPDATE SET status = excluded.status')
+SAVE_HISTORY = ('INSERT INTO history (tenant, homework_name, status, '
+                'changed_at) VALUES (?, ?, ?, ?)')
+LOAD_HISTORY = ('SELECT homework_name, status, changed_at FROM history '
+                'WHERE tenant = ? ORDER BY changed_at DESC LIMIT ?')
+
+
+def tenant_key(token):
+    """Ключ пользователя в хранилище; сам токен на диск не пишется."""
+    return hashlib.sha256(str(token).encode()).hexdigest()[:16]
+
+
+class StatusStore:
+    """Хранилище курсоров current_date и последних отправленных статусов.
+
+    Данные читаются в память при открытии, изменения копятся в буфере и
+    записываются одной транзакцией, когда набирается batch_size записей,
+    проходит flush_interval секунд или вызывается flush(). clock() даёт
+    время смены статуса для истории.
+    """
+
+    def __init__(self, path=STORE_PATH, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, clock=time.time):
+        self.batch_size = batch_size
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.cursors = dict(self.connection.execute(
+            'SELECT tenant, timestamp FROM cursors'))
+        self.statuses = defaultdict(dict)
+        for tenant, name, status in self.connection.execute(
+                'SELECT tenant, homework_name, status FROM statuses'):
+            self.statuses[tenant][name] = sys.intern(status)
+        self.pending_cursors = {}
+        self.pending_statuses = {}
+        self.pending_history = []
+        self.flushed_at = time.monotonic()
+
+    def cursor(self, key, default=None):
+        """Возвращается сохранённый курсор current_date пользователя."""
+        return self.cursors.get(key, default)
+
+    def status(self, key, homework_name):
+        """Возвращается последний отправленный статус работы."""
+        return self.statuses.get(key, {}).get(homework_name)
+
+    def set_cursor(self, key, current_date):
+        """Запоминается курсор пользователя."""
+        with self.lock:
+            self.cursors[key] = current_date
+            self.pending_cursors[key] = current_date
+            self.flush_if_due()
+
+    def homeworks(self, key):
+        """Последние отправленные статусы всех работ пользователя."""
+        with self.lock:
+            return dict(self.statuses.get(key, {}))
+
+    def history(self, key, limit):
+        """Последние limit смен статусов: (работа, статус, время)."""
+        with self.lock:
+            rows = self.connection.execute(
+                LOAD_HISTORY, (key, limit)).fetchall()
+            rows.extend(row[1:] for row in self.pending_history
+                        if row[0] == key)
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows[:limit]
+
+    def set_status(self, key, homework_name, status, changed_at=None):
+        """Запоминается отправленный статус работы и его смена."""
+        with self.lock:
+            self.statuses[key][homework_name] = status
+            self.pending_statuses[key, homework_name] = status
+            self.pending_history.append((
+                key, homework_name, status,
+                self.clock() if changed_at is None else changed_at))
+            self.flush_if_due()
+
+    def add_history(self, key, rows):
+        """Дописываются смены статусов (работа, статус, время) из прошлого.
+
+        Строки, которые уже есть в истории, пропускаются; отправленные
+        статусы и курсор не меняются. Возвращается число новых строк.
+        """
+        with self.lock:
+            self.flush()
+            known = set(self.connection.execute(
+                'SELECT homework_name, status, changed_at FROM history '
+                'WHERE tenant = ?', (key,)))
+            new = [(key, *row) for row in dict.fromkeys(rows)
+                   if row not in known]
+            with self.connection:
+                self.connection.execute('BEGIN')
+                self.connection.executemany(SAVE_HISTORY, new)
+        return len(new)
+
+    def reload(self, keys):
+        """Данные пользователей keys перечитываются с диска.
+
+        Нужно, когда пользователей до этого опрашивал другой процесс.
+        """
+        with self.lock:
+            for key in keys:
+                row = self.connection.execute(
+                    'SELECT timestamp FROM cursors WHERE tenant = ?',
+                    (key,)).fetchone()
+                if row is None:
+                    self.cursors.pop(key, None)
+                else:
+                    self.cursors[key] = row[0]
+                self.statuses[key] = {
+                    name: sys.intern(status)
+                    for name, status in self.connection.execute(
+                        'SELECT homework_name, status FROM statuses '
+                        'WHERE tenant = ?', (key,))}
+
+    def pending(self):
+        """Число изменений, ещё не записанных на диск."""
+        return len(self.pending_cursors) + len(self.pending_statuses)
+
+    def flush_if_due(self):
+        """Буфер записывается, если он заполнен или давно не сбрасывался."""
+        if (self.pending() >= self.batch_size
+                or time.monotonic() - self.flushed_at >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Все накопленные изменения записываются одной транзакцией."""
+        with self.lock:
+            self.flushed_at = time.monotonic()
+            if not self.pending():
+                return
+            with self.connection:
+                self.connection.execute('BEGIN')
+                self.connection.executemany(
+                    SAVE_CURSOR, self.pending_cursors.items())
+                self.connection.executemany(SAVE_STATUS, (
+                    (key, name, status) for (key, name), status
+                    in self.pending_statuses.items()))
+                self.connection.executemany(
+                    SAVE_HISTORY, self.pending_history)
+            self.pending_cursors.clear()
+            self.pending_statuses.clear()
+            self.pending_history.clear()
+
+    def close(self):
+        """Записывается буфер и закрывается соединение."""
+        self.flush()
+        self.connection.close()
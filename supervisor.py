@@ -0,0 +1,387 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+import homework
+import outbox
+from commands import start_listener
+from digest import wrap
+from engine import PollingEngine
+from engine import Tenant
+from engine import load_entries
+from engine import register_gauges
+from health import HEALTH_FILE
+from health import Heartbeat
+from health import start_watchdog
+from lifecycle import Lifecycle
+from logs import setup_logging
+from logs import worker_path
+from metrics import METRICS_PORT
+from metrics import REGISTRY
+from metrics import start_server
+from profiling import PROFILER
+from send_queue import LazyBot
+from send_queue import SendQueue
+from storage import StatusStore
+from storage import tenant_key
+
+
+WORKERS = int(os.getenv('WORKERS', 1))
+REPLICAS = int(os.getenv('HASH_REPLICAS', 100))
+RESTART_DELAY = float(os.getenv('WORKER_RESTART_DELAY', 5))
+HANDOVER_TIMEOUT = float(os.getenv('WORKER_HANDOVER_TIMEOUT', 10))
+CHECK_INTERVAL = 1
+ADD = 'add'
+REMOVE = 'remove'
+REMOVED = 'removed'
+STOP = 'stop'
+WORKER_STARTED = 'Запущен процесс {number}: пользователей {count}'
+WORKER_DIED = ('Процесс {number} завершился с кодом {code}, '
+               'его пользователей ({count}) опрашивают остальные')
+HANDOVER_LATE = ('Не дождались передачи пользователей от процессов '
+                 '{numbers}, они перейдут после освобождения')
+RELEASE_LATE = ('Процесс {number} ещё не закончил опросы '
+                'отдаваемых пользователей')
+
+
+def position(value):
+    """Точка значения на кольце хэшей."""
+    digest = hashlib.md5(str(value).encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+class HashRing:
+    """Консистентное хэширование ключей по узлам.
+
+    Каждый узел занимает replicas точек на кольце; ключ принадлежит узлу
+    первой точки по часовой стрелке. При удалении узла к другим переходят
+    только его ключи, при возвращении — только они же.
+    """
+
+    def __init__(self, nodes=(), replicas=REPLICAS):
+        self.replicas = replicas
+        self.nodes = set()
+        self.points = []
+        self.owners = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node):
+        """На кольцо добавляется узел."""
+        self.nodes.add(node)
+        self.rebuild()
+
+    def remove(self, node):
+        """С кольца убирается узел."""
+        self.nodes.discard(node)
+        self.rebuild()
+
+    def rebuild(self):
+        """Пересчитываются точки кольца."""
+        ring = sorted(
+            (position(f'{node}:{replica}'), node)
+            for node in self.nodes for replica in range(self.replicas))
+        self.points = [point for point, _ in ring]
+        self.owners = [node for _, node in ring]
+
+    def node(self, key):
+        """Узел, которому принадлежит ключ."""
+        if not self.points:
+            raise LookupError(key)
+        index = bisect.bisect(self.points, position(key))
+        return self.owners[index % len(self.owners)]
+
+
+def make_tenants(entries):
+    """Пользователи движка из записей {token, chat_id}."""
+    return [Tenant(entry['token'], entry['chat_id']) for entry in entries]
+
+
+def listen(number, engine, store, control, events):
+    """Команды супервизора выполняются в рабочем процессе."""
+    while True:
+        command, payload = control.get()
+        if command == ADD:
+            store.reload([tenant_key(entry['token']) for entry in payload])
+            engine.call(engine.add, make_tenants(payload))
+        elif command == REMOVE:
+            while not engine.release(payload, HANDOVER_TIMEOUT):
+                logging.warning(RELEASE_LATE.format(number=number))
+            if engine.stopped:
+                return
+            store.flush()
+            events.put((REMOVED, number, payload))
+        else:
+            engine.stop()
+            return
+
+
+def run_worker(number, entries, control, events):
+    """Рабочий процесс: движок опроса над своей частью пользователей."""
+    setup_logging(worker_path(number))
+    lifecycle = Lifecycle().install()
+    homework.interrupt_cycles(lifecycle)
+    store = StatusStore()
+    outbound = SendQueue(LazyBot(homework.TELEGRAM_TOKEN))
+    register_gauges(outbound)
+    if METRICS_PORT is not None:
+        start_server(port=int(METRICS_PORT) + number)
+    bot = outbox.wrap(
+        wrap(outbound), path=worker_path(number, outbox.OUTBOX_PATH))
+    heartbeat = Heartbeat()
+    engine = PollingEngine(bot, make_tenants(entries), store=store,
+                           heartbeat=heartbeat)
+    watchdog = start_watchdog(heartbeat, outbound, REGISTRY, path=(
+        HEALTH_FILE and worker_path(number, HEALTH_FILE)))
+    lifecycle.on_stop(engine.stop)
+    lifecycle.on_stop(watchdog.stop)
+    lifecycle.on_reload(engine.policy.reload)
+    lifecycle.on_reload(PROFILER.reload)
+    PROFILER.install()
+    threading.Thread(target=listen, daemon=True,
+                     args=(number, engine, store, control, events)).start()
+    try:
+        asyncio.run(engine.run())
+    finally:
+        homework.shutdown(lifecycle, bot, outbound, store)
+
+
+class Supervisor:
+    """Запуск N рабочих процессов и распределение пользователей по ним.
+
+    Пользователи делятся по процессам кольцом консистентного хэширования
+    от ключа пользователя. Если процесс умирает, его пользователи
+    передаются остальным, а через restart_delay процесс запускается снова
+    и забирает свою часть обратно. Пользователи, которых прежний владелец
+    не отдал за handover_timeout, ждут в handover и передаются новому
+    только после его REMOVED. По умолчанию процессы запускаются
+    через spawn: у супервизора есть свои потоки, и fork мог бы унести в
+    дочерний процесс захваченные ими блокировки.
+    """
+
+    def __init__(self, entries, workers=WORKERS, target=run_worker,
+                 restart_delay=RESTART_DELAY, context=None,
+                 handover_timeout=HANDOVER_TIMEOUT):
+        self.context = context or multiprocessing.get_context('spawn')
+        self.entries = {tenant_key(entry['token']): entry
+                        for entry in entries}
+        self.target = target
+        self.restart_delay = restart_delay
+        self.handover_timeout = handover_timeout
+        self.ring = HashRing(range(workers))
+        self.owners = {}
+        self.processes = {}
+        self.controls = {}
+        self.restarts = {}
+        self.handover = {}
+        self.events = self.context.Queue()
+        self.lock = threading.Lock()
+
+    def shard(self, number):
+        """Ключи пользователей, которые кольцо отдаёт процессу number."""
+        return [key for key in self.entries
+                if self.ring.node(key) == number]
+
+    def start(self):
+        """Запускаются все рабочие процессы."""
+        for number in sorted(self.ring.nodes):
+            self.spawn(number, self.shard(number))
+
+    def spawn(self, number, keys):
+        """Запускается процесс number с пользователями keys."""
+        control = self.context.Queue()
+        process = self.context.Process(
+            target=self.target, name=f'homework-worker-{number}',
+            args=(number, [self.entries[key] for key in keys],
+                  control, self.events),
+            daemon=True)
+        process.start()
+        self.processes[number] = process
+        self.controls[number] = control
+        self.owners.update(dict.fromkeys(keys, number))
+        logging.info(WORKER_STARTED.format(number=number, count=len(keys)))
+
+    def check(self, now=None):
+        """Обнаруживаются умершие процессы и перезапускаются по сроку."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.collect()
+            for number, process in list(self.processes.items()):
+                if not process.is_alive():
+                    self.fail(number, process, now)
+            for number, when in list(self.restarts.items()):
+                if when <= now:
+                    self.restart(number)
+
+    def update(self, entries):
+        """Набор пользователей заменяется новым без перезапуска процессов."""
+        fresh = {tenant_key(entry['token']): entry for entry in entries}
+        removed = defaultdict(list)
+        added = defaultdict(list)
+        with self.lock:
+            for key, entry in self.entries.items():
+                owner = self.owners.get(key)
+                if fresh.get(key) != entry and owner is not None:
+                    del self.owners[key]
+                    if key not in self.handover:
+                        removed[owner].append(key)
+            for key, entry in fresh.items():
+                if self.entries.get(key) != entry and self.ring:
+                    self.owners[key] = self.ring.node(key)
+                    if key not in self.handover:
+                        added[self.owners[key]].append(entry)
+            self.entries = fresh
+            for owner, keys in removed.items():
+                self.controls[owner].put((REMOVE, keys))
+            for owner, owned in added.items():
+                self.controls[owner].put((ADD, owned))
+
+    def fail(self, number, process, now):
+        """Пользователи умершего процесса передаются остальным."""
+        del self.processes[number]
+        self.controls.pop(number).close()
+        self.ring.remove(number)
+        keys = [key for key, owner in self.owners.items() if owner == number]
+        logging.error(WORKER_DIED.format(
+            number=number, code=process.exitcode, count=len(keys)))
+        moved = defaultdict(list)
+        for key in keys:
+            if self.ring:
+                self.owners[key] = self.ring.node(key)
+                if key not in self.handover:
+                    moved[self.owners[key]].append(self.entries[key])
+            else:
+                del self.owners[key]
+        for owner, entries in moved.items():
+            self.controls[owner].put((ADD, entries))
+        self.released(number, [key for key, owner in self.handover.items()
+                               if owner == number])
+        self.restarts[number] = now + self.restart_delay
+
+    def restart(self, number):
+        """Процесс запускается снова и забирает свою часть обратно."""
+        del self.restarts[number]
+        self.ring.add(number)
+        keys = self.shard(number)
+        moved = defaultdict(list)
+        for key in keys:
+            owner = self.owners.get(key)
+            if owner is not None and owner != number:
+                moved[owner].append(key)
+        for owner, owned in moved.items():
+            self.controls[owner].put((REMOVE, owned))
+        self.owners.update(dict.fromkeys(keys, number))
+        self.wait_removed(moved)
+        self.spawn(number, [key for key in keys if key not in self.handover])
+
+    def wait_removed(self, moved):
+        """Ожидается, пока процессы отдадут пользователей moved.
+
+        moved — словарь {номер процесса: ключи пользователей}.
+
+        Отдающий процесс дожидается конца их текущих опросов и только
+        потом сбрасывает курсоры и статусы на диск, поэтому новый
+        владелец начинает с актуальных данных. Не отданные за
+        handover_timeout ключи остаются в handover до REMOVED.
+        """
+        for number, keys in moved.items():
+            self.handover.update(dict.fromkeys(keys, number))
+        deadline = time.monotonic() + self.handover_timeout
+        while any(owner in moved for owner in self.handover.values()):
+            try:
+                event, number, keys = self.events.get(
+                    timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                logging.warning(HANDOVER_LATE.format(numbers=sorted(
+                    set(moved) & set(self.handover.values()))))
+                return
+            if event == REMOVED:
+                self.released(number, keys)
+
+    def collect(self):
+        """Разбираются события процессов, пришедшие без ожидания."""
+        while True:
+            try:
+                event, number, keys = self.events.get_nowait()
+            except queue.Empty:
+                return
+            if event == REMOVED:
+                self.released(number, keys)
+
+    def released(self, number, keys):
+        """Ключи из handover, отданные процессом number, идут владельцам."""
+        added = defaultdict(list)
+        for key in keys:
+            if self.handover.get(key) != number:
+                continue
+            del self.handover[key]
+            owner = self.owners.get(key)
+            if owner is not None and owner in self.controls:
+                added[owner].append(self.entries[key])
+        for owner, entries in added.items():
+            self.controls[owner].put((ADD, entries))
+
+    def stop(self, timeout=HANDOVER_TIMEOUT):
+        """Процессы останавливаются за timeout секунд, зависшие — силой."""
+        for control in self.controls.values():
+            control.put((STOP, None))
+        deadline = time.monotonic() + timeout
+        for process in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def run(self, lifecycle):
+        """Процессы запускаются и наблюдаются до остановки lifecycle."""
+        self.start()
+        try:
+            while not lifecycle.sleep(CHECK_INTERVAL):
+                self.check()
+        finally:
+            self.stop(lifecycle.remaining())
+
+
+def run_supervisor(path, workers=WORKERS):
+    """Запускается опрос пользователей из файла path в workers процессах.
+
+    SIGHUP перечитывает файл пользователей и раздаёт изменения процессам.
+    """
+    if homework.TELEGRAM_TOKEN is None:
+        raise ValueError(homework.FAULT_TOKENS)
+    entries = load_entries(path)
+    store = StatusStore()
+    telegram = LazyBot(homework.TELEGRAM_TOKEN)
+    outbound = SendQueue(telegram, workers=1)
+    listener = start_listener(
+        telegram, outbound, store, entry_chats(entries), reload=True)
+    supervisor = Supervisor(entries, workers)
+    lifecycle = Lifecycle().install()
+
+    def reload_entries():
+        entries = load_entries(path)
+        supervisor.update(entries)
+        if listener is not None:
+            listener.chats = entry_chats(entries)
+
+    lifecycle.on_reload(reload_entries)
+    try:
+        supervisor.run(lifecycle)
+    finally:
+        homework.shutdown(lifecycle, outbound, outbound, store)
+
+
+def entry_chats(entries):
+    """Чаты пользователей для приёма команд: {chat_id: ключ}."""
+    return {str(entry['chat_id']): tenant_key(entry['token'])
+            for entry in entries}
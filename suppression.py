@@ -0,0 +1,104 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+SUPPRESS_WINDOW = float(os.getenv('ERROR_SUPPRESS_WINDOW', 3600))
+MAX_FINGERPRINTS = int(os.getenv('ERROR_MAX_FINGERPRINTS', 32))
+STILL_FAILING = 'Сбой продолжается (повторов: {count}): {message}'
+RECOVERED = 'Работа восстановлена. Ошибок за время сбоя: {count}'
+VOLATILE = re.compile(r'0x[0-9a-f]+|\d+(\.\d+)?', re.IGNORECASE)
+
+
+def fingerprint(error):
+    """Отпечаток ошибки: тип и текст без чисел и адресов."""
+    return type(error).__name__, VOLATILE.sub('#', str(error))
+
+
+class ErrorRecord:
+    """Сколько раз ошибка повторилась и когда о ней сообщали."""
+
+    __slots__ = ('sent_at', 'suppressed', 'total')
+
+    def __init__(self, sent_at):
+        self.sent_at = sent_at
+        self.suppressed = 0
+        self.total = 1
+
+
+class Outage:
+    """Текущий сбой чата: отпечатки его ошибок и вытесненные повторы."""
+
+    __slots__ = ('records', 'evicted')
+
+    def __init__(self):
+        self.records = OrderedDict()
+        self.evicted = 0
+
+
+class ErrorSuppressor:
+    """Подавление повторных сообщений об одной и той же ошибке.
+
+    Первая ошибка с новым отпечатком отправляется как есть, повторы в
+    течение window секунд только подсчитываются, после окна отправляется
+    одна сводка с числом повторов. Когда цикл опроса проходит успешно,
+    один раз отправляется сообщение о восстановлении.
+
+    Сбой хранится отдельно для каждого чата до его восстановления,
+    поэтому ошибки одних пользователей не вытесняют сбои других. В
+    чате хранится не более max_size отпечатков; давно не встречавшиеся
+    вытесняются, но их повторы остаются в счёте сбоя.
+    """
+
+    def __init__(self, window=SUPPRESS_WINDOW, max_size=MAX_FINGERPRINTS,
+                 clock=time.monotonic):
+        self.window = window
+        self.max_size = max_size
+        self.clock = clock
+        self.outages = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(outage.records) for outage in self.outages.values())
+
+    def failure(self, chat_id, error, message):
+        """Возвращается текст для отправки в чат или None, если подавлен."""
+        key = fingerprint(error)
+        now = self.clock()
+        with self.lock:
+            outage = self.outages.get(chat_id)
+            if outage is None:
+                outage = self.outages[chat_id] = Outage()
+            record = outage.records.get(key)
+            if record is None:
+                self.remember(outage, key, ErrorRecord(now))
+                return message
+            outage.records.move_to_end(key)
+            record.total += 1
+            if now - record.sent_at < self.window:
+                record.suppressed += 1
+                return None
+            count, record.suppressed, record.sent_at = (
+                record.suppressed + 1, 0, now)
+            return STILL_FAILING.format(count=count, message=message)
+
+    def recovery(self, chat_id):
+        """Возвращается сообщение о восстановлении, если были ошибки."""
+        if chat_id not in self.outages:
+            return None
+        with self.lock:
+            outage = self.outages.pop(chat_id, None)
+        if outage is None:
+            return None
+        total = outage.evicted + sum(
+            record.total for record in outage.records.values())
+        return RECOVERED.format(count=total)
+
+    def remember(self, outage, key, record):
+        """Отпечаток сохраняется с вытеснением самого старого в чате."""
+        outage.records[key] = record
+        while len(outage.records) > self.max_size:
+            _, old = outage.records.popitem(last=False)
+            outage.evicted += old.total
@@ -1,9 +1,26 @@
 import sys
 from os.path import abspath, dirname
 
+import pytest
+import requests
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 
 pytest_plugins = [
     'tests.fixtures.fixture_data'
 ]
+
+
+@pytest.fixture(autouse=True)
+def session_get_through_requests_get(request, monkeypatch):
+    """В tests/test_bot.py запросы пула идут через requests.get.
+
+    Эти тесты подменяют requests.get, а клиент API ходит через
+    requests.Session. Остальные тесты подменяют клиент или его транспорт.
+    """
+    if request.path.name != 'test_bot.py':
+        return
+    monkeypatch.setattr(
+        requests.Session, 'get',
+        lambda session, *args, **kwargs: requests.get(*args, **kwargs))
@@ -0,0 +1,102 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+class StatusesHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'homeworks': [], 'current_date': 1}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StatusesHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+class TestPracticumClient:
+
+    def test_connection_reused(self, monkeypatch, local_api):
+        from api_client import PracticumClient
+
+        client = PracticumClient(pool_maxsize=2)
+        for _ in range(10):
+            response = client.get(url=local_api, headers={},
+                                  params={'from_date': 0})
+            assert response.json()['current_date'] == 1
+        stats = client.stats()
+        client.close()
+        assert stats['requests'] == 10
+        assert stats['connections'] == 1
+        assert stats['reused'] == 9
+
+    def test_shared_client(self):
+        from api_client import get_client
+
+        assert get_client() is get_client()
+
+
+class TestConditionalRequests:
+
+    def test_not_modified_and_compression(self, monkeypatch):
+        from api_client import PracticumClient
+        from benchmarks.stubs import PracticumHandler, StubServer
+
+        client = PracticumClient()
+        with StubServer(PracticumHandler, payload=20, stable=True,
+                        compress=True) as server:
+            parameters = dict(url=server.url + '/',
+                              headers={'Authorization': 'OAuth a'},
+                              params={'from_date': 0})
+            first = client.get(**dict(parameters))
+            second = client.get(**dict(parameters))
+            other = client.get(**dict(
+                parameters, headers={'Authorization': 'OAuth b'}))
+        client.close()
+        assert first.status_code == 200
+        assert first.headers['Content-Encoding'] == 'gzip'
+        assert len(first.json()['homeworks']) == 20
+        assert second.status_code == 304
+        assert other.status_code == 200
+        assert server.not_modified == 1
+        stats = client.stats()
+        assert stats['not_modified'] == 1
+        assert stats['bytes_wire'] < stats['bytes_decoded']
+        assert stats['bytes_saved'] > len(first.content)
+
+    def test_not_modified_skips_cycle(self, monkeypatch):
+        import homework
+
+        class NotModifiedResponse:
+            status_code = 304
+
+        def fail(*args, **kwargs):
+            raise AssertionError('check_response must be skipped')
+
+        class Bot:
+            sent = []
+
+            def send_message(self, **kwargs):
+                self.sent.append(kwargs)
+
+        monkeypatch.setattr(homework.get_client(), 'get',
+                            lambda **kwargs: NotModifiedResponse())
+        monkeypatch.setattr(homework, 'check_response', fail)
+        assert homework.run_cycle(Bot(), 1, {}, 10) == (10, [])
+        assert Bot.sent == []
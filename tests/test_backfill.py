@@ -0,0 +1,142 @@
+import csv
+import json
+import threading
+import time
+
+import pytest
+
+import api_client
+import backfill as backfill_module
+import homework
+from backfill import api_timestamp, backfill, export, main, store_history
+from benchmarks.simulation import Response
+from storage import StatusStore
+from storage import tenant_key
+from utils import MockTelegram
+
+DAY = 86400
+
+
+def iso(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
+
+
+HOMEWORKS = [
+    {'homework_name': 'hw1', 'status': 'approved', 'date_updated': iso(DAY)},
+    {'homework_name': 'hw2', 'status': 'rejected',
+     'date_updated': iso(5 * DAY)},
+    {'homework_name': 'hw3', 'status': 'reviewing',
+     'date_updated': iso(9 * DAY)},
+]
+
+
+class HistoryApi:
+    """API, который отдаёт работы не старше from_date, как настоящий."""
+
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.requested = []
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def get(self, **parameters):
+        from_date = parameters['params']['from_date']
+        with self.lock:
+            self.requested.append(from_date)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        if from_date in self.failing:
+            return Response.of({'code': 'server_error'}, 500)
+        return Response.of({'homeworks': [
+            homework for homework in HOMEWORKS
+            if api_timestamp(homework['date_updated']) >= from_date],
+            'current_date': 10 * DAY})
+
+
+@pytest.fixture
+def api(request):
+    transport = HistoryApi(getattr(request, 'param', ()))
+    previous = api_client.set_client(api_client.PracticumClient(
+        session=transport, breaker=None, conditional=False))
+    yield transport
+    api_client.set_client(previous)
+
+
+class TestBackfill:
+
+    def test_one_request_per_tenant(self, api):
+        tokens = ['a', 'b', 'c', 'd']
+        entries, failed = backfill(tokens, DAY, 9 * DAY, concurrency=2)
+        assert failed == 0
+        assert api.requested == [DAY] * 4
+        assert api.peak <= 2
+        assert [entry['homework_name'] for entry in entries
+                if entry['tenant'] == tenant_key('a')] == ['hw1', 'hw2']
+        assert {entry['tenant'] for entry in entries} == {
+            tenant_key(token) for token in tokens}
+
+    @pytest.mark.parametrize('api', [(4 * DAY,)], indirect=True)
+    def test_failed_tenant(self, api):
+        entries, failed = backfill(['token'], 4 * DAY, 10 * DAY)
+        assert failed == 1
+        assert entries == []
+
+    def test_invalid_homeworks_skipped(self, api, monkeypatch, tmp_path):
+        monkeypatch.setattr(__import__(__name__), 'HOMEWORKS', HOMEWORKS + [
+            {'homework_name': 'hw4', 'status': 'lost',
+             'date_updated': iso(2 * DAY)},
+            {'homework_name': 'hw5', 'status': None,
+             'date_updated': iso(3 * DAY)},
+            {'status': 'approved', 'date_updated': iso(4 * DAY)},
+        ])
+        entries, failed = backfill(['token'], 0, 10 * DAY)
+        assert failed == 0
+        assert [entry['homework_name'] for entry in entries] == [
+            'hw1', 'hw2', 'hw3']
+        store = StatusStore(tmp_path / 'store.sqlite3')
+        assert store_history(store, entries) == 3
+        store.close()
+
+    def test_store_history(self, api, tmp_path):
+        entries, _ = backfill(['token'], 0, 10 * DAY)
+        store = StatusStore(tmp_path / 'store.sqlite3')
+        assert store_history(store, entries) == 3
+        assert store_history(store, entries) == 0
+        key = tenant_key('token')
+        assert store.history(key, 10)[0] == ('hw3', 'reviewing', 9 * DAY)
+        assert store.homeworks(key) == {}
+        store.close()
+
+    def test_export(self, api, tmp_path):
+        entries, _ = backfill(['token'], 0, 10 * DAY)
+        export(entries, tmp_path / 'history.csv')
+        with open(tmp_path / 'history.csv', encoding='UTF-8') as file:
+            rows = list(csv.DictReader(file))
+        assert [row['status'] for row in rows] == [
+            'approved', 'rejected', 'reviewing']
+        export(entries, tmp_path / 'history.jsonl', 'jsonl')
+        with open(tmp_path / 'history.jsonl', encoding='UTF-8') as file:
+            assert [json.loads(line) for line in file] == entries
+
+    def test_main(self, api, tmp_path, monkeypatch):
+        monkeypatch.setattr(backfill_module, 'PracticumClient',
+                            lambda **kwargs: api_client.get_client())
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'token')
+        output = tmp_path / 'history.csv'
+        assert main(['--since', '1970-01-01', '--until', '1970-01-11',
+                     '--no-store',
+                     '--output', str(output)]) == 0
+        assert output.read_text(encoding='UTF-8').count('\n') == 4
+
+    def test_history_not_duplicated_after_notify(self, api, tmp_path):
+        store = StatusStore(tmp_path / 'store.sqlite3')
+        key = tenant_key('token')
+        homework.notify(MockTelegram(), 1, homework.Homework.from_payload(
+            HOMEWORKS[2]), store, key)
+        entries, _ = backfill(['token'], 0, 10 * DAY)
+        assert store_history(store, entries) == 2
+        assert len(store.history(key, 10)) == 3
+        store.close()
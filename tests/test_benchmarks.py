@@ -0,0 +1,27 @@
+from benchmarks.bench_cycle import main, run_benchmark
+
+
+class TestBenchmark:
+
+    def test_smoke(self):
+        result = run_benchmark(tenants=5, duration=0.5, interval=0.1,
+                               payload=3, seed=1)
+        assert result['polls'] >= 5
+        assert result['api_requests'] == result['polls']
+        assert result['send']['sent'] == result['telegram_requests']
+        assert result['p99_ms'] >= result['p50_ms'] > 0
+        assert result['rss_kb'] > 0
+
+    def test_threshold_exit_code(self, capsys):
+        assert main(['--tenants', '2', '--duration', '0.3',
+                     '--interval', '0.1', '--min-polls-per-sec',
+                     '100000']) == 1
+        assert '"polls_per_sec"' in capsys.readouterr().out
+
+    def test_memory(self):
+        from benchmarks.bench_memory import run_benchmark as run_memory
+
+        result = run_memory(homeworks=1000)
+        assert result['homeworks'] == 1000
+        assert 0 < result['record_bytes_per_homework'] < (
+            result['dict_bytes_per_homework'])
@@ -0,0 +1,87 @@
+import pytest
+import requests
+
+from exceptions import CircuitOpen
+from utils import Clock, MockTelegram
+
+def make_breaker(clock, **kwargs):
+    from breaker import CircuitBreaker
+
+    parameters = dict(failure_rate=0.5, slow_rate=0.5, slow_call=1,
+                      min_calls=4, window=10, open_for=5, probes=2,
+                      clock=clock)
+    parameters.update(kwargs)
+    return CircuitBreaker(**parameters)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_on_error_rate_and_recovers(self):
+        from breaker import CLOSED, HALF_OPEN, OPEN
+
+        clock = Clock()
+        breaker = make_breaker(clock)
+        for failed in (False, True, False):
+            breaker.record(0.1, failed, breaker.before())
+        assert breaker.state == CLOSED
+        breaker.record(0.1, True, breaker.before())
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpen):
+            breaker.before()
+
+        clock.now = 5
+        first, second = breaker.before(), breaker.before()
+        assert first and second and breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpen):
+            breaker.before()
+        breaker.record(0.1, False, first)
+        breaker.record(0.1, False, second)
+        assert breaker.state == CLOSED
+        assert breaker.stats() == {'state': CLOSED, 'state_code': 0,
+                                   'trips': 1, 'rejected': 2}
+
+    def test_slow_calls_and_failed_probe(self):
+        from breaker import OPEN
+
+        clock = Clock()
+        breaker = make_breaker(clock)
+        for _ in range(4):
+            breaker.record(2, False, breaker.before())
+        assert breaker.state == OPEN
+        clock.now = 5
+        breaker.record(0.1, True, breaker.before())
+        assert breaker.state == OPEN
+        assert breaker.stats()['trips'] == 2
+
+    def test_old_calls_leave_window(self):
+        from breaker import CLOSED
+
+        clock = Clock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record(0.1, True, breaker.before())
+        clock.now = 11
+        breaker.record(0.1, True, breaker.before())
+        assert breaker.state == CLOSED
+
+
+class TestClientBreaker:
+
+    def test_short_circuits_without_request(self, monkeypatch):
+        import homework
+        from api_client import PracticumClient
+        from benchmarks.stubs import PracticumHandler, StubServer
+
+        client = PracticumClient(breaker=make_breaker(Clock()))
+        with StubServer(PracticumHandler, error_rate=1) as server:
+            for _ in range(4):
+                assert client.get(url=server.url + '/').status_code == 500
+            with pytest.raises(CircuitOpen):
+                client.get(url=server.url + '/')
+        client.close()
+        assert server.requests == 4
+
+        bot = MockTelegram()
+        monkeypatch.setattr(homework, 'get_client', lambda: client)
+        assert homework.run_cycle(bot, 1, {}, 10) == (10, None)
+        assert bot.sent == []
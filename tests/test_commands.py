@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from storage import StatusStore, tenant_key
+from utils import MockTelegram
+
+
+class MockUpdates:
+
+    def __init__(self, updates):
+        self.updates = updates
+        self.requests = []
+
+    def get_updates(self, **kwargs):
+        self.requests.append(kwargs)
+        updates, self.updates = self.updates, []
+        return updates
+
+
+def update(update_id, chat_id, text):
+    return SimpleNamespace(update_id=update_id, message=SimpleNamespace(
+        chat_id=chat_id, text=text))
+
+
+class TestCommands:
+
+    def test_status_and_history_from_store(self, monkeypatch, tmp_path):
+        import commands
+        import homework
+
+        monkeypatch.setattr(homework, 'fetch_homeworks', lambda *args: (
+            _ for _ in ()).throw(AssertionError('API must not be called')))
+        key = tenant_key('token')
+        store = StatusStore(tmp_path / 'store.sqlite3')
+        store.set_status(key, 'hw1', 'reviewing', changed_at=100)
+        store.flush()
+        store.set_status(key, 'hw1', 'approved', changed_at=200)
+        store.set_status(key, 'hw2', 'rejected', changed_at=300)
+        telegram = MockUpdates([
+            update(1, 10, '/status'),
+            update(2, 10, '/history@homework_bot'),
+            update(3, 20, '/status'),
+            update(4, 10, 'привет'),
+            SimpleNamespace(update_id=5, message=None),
+        ])
+        outbound = MockTelegram()
+        listener = commands.CommandListener(
+            telegram, outbound, store, {10: key}, timeout=0)
+        listener.poll()
+        listener.poll()
+        assert telegram.requests[1]['offset'] == 6
+        status, history, unknown = outbound.sent
+        assert status == (10, '\n'.join([
+            commands.render('hw1', 'approved'),
+            commands.render('hw2', 'rejected')]))
+        assert history[1].splitlines()[0].endswith(
+            commands.render('hw2', 'rejected'))
+        assert history[1].splitlines()[2].endswith(
+            commands.render('hw1', 'reviewing'))
+        assert unknown == (20, commands.UNKNOWN_CHAT)
+        store.close()
+
+    def test_reload_reads_other_process(self, tmp_path):
+        import commands
+
+        key = tenant_key('token')
+        path = tmp_path / 'store.sqlite3'
+        reader = StatusStore(path)
+        listener = commands.CommandListener(
+            None, None, reader, {10: key}, reload=True)
+        assert listener.answer(10, '/status') == commands.NO_STATUSES
+        writer = StatusStore(path)
+        writer.set_status(key, 'hw', 'approved')
+        writer.close()
+        assert listener.answer(10, '/status') == commands.render(
+            'hw', 'approved')
+        reader.close()
@@ -0,0 +1,174 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import deadline
+from api_client import PracticumClient
+from exceptions import ErrorTimeout
+from exceptions import Interrupted
+from metrics import outcome
+from utils import Clock
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(1)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+class Transport:
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, **parameters):
+        self.calls.append(parameters)
+        return Response()
+
+
+class Response:
+    status_code = 200
+    headers = {}
+    content = b'{"homeworks": [], "current_date": 5}'
+
+    def __init__(self, chunks=()):
+        self.chunks = chunks
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class TestDeadline:
+
+    def test_budget(self):
+        clock = Clock()
+        assert deadline.remaining() is None
+        deadline.check('вне срока')
+        with deadline.budget(10, clock):
+            assert deadline.remaining() == 10
+            clock.now = 10
+            with pytest.raises(ErrorTimeout, match='отправка'):
+                deadline.check('отправка')
+        assert deadline.remaining() is None
+        with deadline.budget(0, clock):
+            assert deadline.remaining() is None
+
+    def test_client_timeouts_follow_budget(self):
+        clock = Clock()
+        transport = Transport()
+        client = PracticumClient(session=transport, breaker=None,
+                                 connect_timeout=3, read_timeout=20)
+        client.get(url='a', headers={}, params={})
+        assert transport.calls[-1]['timeout'] == (3, 20)
+        with deadline.budget(10, clock):
+            clock.now = 8
+            client.get(url='a', headers={}, params={})
+            assert transport.calls[-1]['timeout'] == (2, 2)
+            clock.now = 10
+            with pytest.raises(ErrorTimeout):
+                client.get(url='a', headers={}, params={})
+        assert len(transport.calls) == 2
+
+    def test_guarded_closes_response(self):
+        clock = Clock()
+        response = Response()
+        with deadline.budget(10, clock):
+            chunks = deadline.guarded(iter([b'a', b'b']), response)
+            assert next(chunks) == b'a'
+            clock.now = 10
+            with pytest.raises(ErrorTimeout):
+                next(chunks)
+        assert response.closed
+
+    def test_read_timeout(self, monkeypatch, slow_api):
+        import homework
+
+        monkeypatch.setattr(homework, 'ENDPOINT', slow_api)
+        client = PracticumClient(breaker=None, read_timeout=0.1)
+        monkeypatch.setattr(homework, 'get_client', lambda: client)
+        started = time.monotonic()
+        with pytest.raises(ErrorTimeout) as error:
+            homework.fetch_homeworks(0, {})
+        client.close()
+        assert time.monotonic() - started < 0.9
+        assert outcome(error.value) == 'timeout'
+
+    def test_run_cycle_cancels_leftover_notifications(self, monkeypatch):
+        import homework
+        from storage import StatusStore
+
+        monkeypatch.setattr(deadline, 'CYCLE_DEADLINE', 0.05)
+        monkeypatch.setattr(homework, 'fetch_homeworks', lambda *args: {
+            'current_date': 50,
+            'homeworks': [
+                {'homework_name': 'first', 'status': 'approved'},
+                {'homework_name': 'second', 'status': 'approved'},
+            ]})
+        sent = []
+        errors = []
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                sent.append(text)
+                if 'first' in text or 'second' in text:
+                    time.sleep(0.06)
+                else:
+                    errors.append(text)
+
+        store = StatusStore(':memory:')
+        timestamp, homeworks = homework.run_cycle(
+            Bot(), 1, {}, 0, store, 'key')
+        assert (timestamp, homeworks) == (0, None)
+        assert store.cursor('key') is None
+        assert len(sent) == 2 and len(errors) == 1
+        assert [store.status('key', name) for name in ('first', 'second')
+                ].count(None) == 1
+        assert 'отправка статусов' in errors[0]
+        store.close()
+
+    def test_stop_interrupts_running_cycle(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(deadline, 'stop_at', None)
+        monkeypatch.setattr(homework, 'fetch_homeworks', lambda *args: {
+            'current_date': 50,
+            'homeworks': [{'homework_name': f'hw{number}',
+                           'status': 'approved'} for number in range(5)]})
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id, text):
+                sent.append(text)
+                deadline.stop(0)
+
+        assert homework.run_cycle(Bot(), 1, {}, 0) == (0, None)
+        assert len(sent) == 1
+        with deadline.budget(0):
+            assert deadline.remaining() <= 0
+            with pytest.raises(Interrupted):
+                deadline.check('после остановки')
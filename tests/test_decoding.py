@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+import decoding
+from decoding import HomeworkStream
+
+DOCUMENT = {
+    'current_date': 1234567890,
+    'homeworks': [
+        {'id': number, 'homework_name': f'hw_{number}.zip',
+         'status': 'approved', 'reviewer_comment': 'Всё нравится ' * 5}
+        for number in range(50)
+    ],
+    'trailing': [1, {'a': None}],
+}
+
+
+def chunked(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+class Response:
+
+    def __init__(self, document):
+        self.content = json.dumps(document).encode()
+        self.status_code = 200
+
+    def iter_content(self, chunk_size):
+        return iter(chunked(self.content, 7))
+
+
+class TestDecoding:
+
+    def test_backend(self):
+        name, loads = decoding.select_backend('json')
+        assert name == 'json' and loads is json.loads
+        assert decoding.select_backend('missing_backend')[0] == 'json'
+        assert decoding.decode(Response(DOCUMENT)) == DOCUMENT
+
+    @pytest.mark.parametrize('size', [1, 3, 7, 4096])
+    def test_stream_matches_document(self, size):
+        data = json.dumps(DOCUMENT, ensure_ascii=False, indent=1).encode()
+        stream = HomeworkStream(chunked(data, size))
+        assert list(stream) == DOCUMENT['homeworks']
+        assert stream.has_homeworks
+        assert stream.fields == {'current_date': 1234567890,
+                                 'trailing': [1, {'a': None}]}
+
+    def test_stream_empty_and_missing(self):
+        stream = HomeworkStream([b'{"homeworks": [], "current_date": 5}'])
+        assert list(stream) == []
+        assert stream.has_homeworks and stream.fields['current_date'] == 5
+        stream = HomeworkStream([b'{"code": "not_authenticated"}'])
+        assert list(stream) == [] and not stream.has_homeworks
+
+    def test_stream_truncated(self):
+        stream = HomeworkStream(chunked(b'{"homeworks": [{"id": 1}, {"id"', 4))
+        with pytest.raises(ValueError):
+            list(stream)
+
+    def test_check_stream(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(homework.get_client(), 'get',
+                            lambda **kwargs: Response(DOCUMENT))
+        homeworks = homework.check_stream(homework.stream_homeworks(0, {}))
+        assert [hw['id'] for hw in homeworks] == list(range(50))
+        monkeypatch.setattr(homework.get_client(), 'get',
+                            lambda **kwargs: Response({'error': 'x'}))
+        with pytest.raises(homework.ResponseJsonError):
+            list(homework.check_stream(homework.stream_homeworks(0, {})))
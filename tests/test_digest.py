@@ -0,0 +1,77 @@
+from utils import Clock, MockTelegram
+
+
+class TestSplit:
+
+    def test_events_not_broken(self):
+        from digest import split_message
+
+        parts = ['a' * 30, 'b' * 30, 'c' * 30]
+        assert split_message(parts, limit=64) == [
+            'a' * 30 + '\n\n' + 'b' * 30, 'c' * 30]
+
+    def test_long_event_cut_on_words(self):
+        from digest import MESSAGE_LIMIT, split_message
+
+        event = ' '.join(['слово'] * 2000)
+        chunks = split_message([event])
+        assert all(len(chunk) <= MESSAGE_LIMIT for chunk in chunks)
+        assert ' '.join(chunks) == event
+        assert split_message(['x' * 10], limit=4) == ['xxxx', 'xxxx', 'xx']
+
+
+class TestDigestQueue:
+
+    def test_window_and_size_cap(self):
+        from digest import DIGEST_HEADER, DigestQueue
+
+        outbound = MockTelegram()
+        clock = Clock()
+        digest = DigestQueue(outbound, window=60, max_events=3, clock=clock)
+        digest.add(1, 'первый')
+        digest.add(1, 'второй')
+        digest.add(2, 'другой чат')
+        assert outbound.sent == []
+        clock.now = 30
+        assert digest.flush_due() == 30
+        clock.now = 61
+        assert digest.flush_due() is None
+        assert sorted(outbound.sent) == [
+            (1, '\n\n'.join([DIGEST_HEADER.format(count=2),
+                             'первый', 'второй'])),
+            (2, 'другой чат'),
+        ]
+        digest.close()
+
+        outbound.sent.clear()
+        digest = DigestQueue(outbound, window=60, max_events=3, clock=clock)
+        for number in range(3):
+            digest.add(1, str(number))
+        assert len(outbound.sent) == 1
+        digest.add(1, 'ошибка')
+        digest.send_message(chat_id=1, text='сбой')
+        assert outbound.sent[1:] == [(1, 'ошибка'), (1, 'сбой')]
+        digest.close()
+
+    def test_run_cycle_uses_digest(self, monkeypatch):
+        import homework
+        from digest import DigestQueue
+
+        response = {
+            'homeworks': [
+                {'homework_name': 'a', 'status': 'approved'},
+                {'homework_name': 'b', 'status': 'rejected'},
+            ],
+            'current_date': 2,
+        }
+        monkeypatch.setattr(homework, 'fetch_homeworks',
+                            lambda timestamp, headers: response)
+        outbound = MockTelegram()
+        digest = DigestQueue(outbound, window=3600)
+        homework.run_cycle(digest, 7, {}, 1)
+        assert outbound.sent == []
+        digest.close()
+        assert len(outbound.sent) == 1
+        chat_id, text = outbound.sent[0]
+        assert chat_id == 7
+        assert text.count('Изменился статус проверки работы') == 2
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import threading
+from types import SimpleNamespace
+
+import requests
+
+
+class MockResponse:
+
+    def __init__(self, token, homeworks, current_date):
+        self.status_code = 200
+        self.token = token
+        self.data = {'homeworks': homeworks, 'current_date': current_date}
+
+    def json(self):
+        return self.data
+
+
+class MockBot:
+
+    def __init__(self, expected, on_done):
+        self.sent = []
+        self.expected = expected
+        self.on_done = on_done
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        with self.lock:
+            self.sent.append((chat_id, text))
+            if len(self.sent) == self.expected:
+                self.on_done()
+
+
+class TestEngine:
+
+    def test_load_tenants(self, tmp_path):
+        import engine
+
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'b', 'chat_id': 2},
+        ]))
+        tenants = engine.load_tenants(path)
+        assert [tenant.chat_id for tenant in tenants] == [1, 2]
+        assert tenants[0].headers == {'Authorization': 'OAuth a'}
+
+    def test_polls_every_tenant_once_per_retry(self, monkeypatch):
+        import engine
+
+        calls = []
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            token = headers['Authorization'].split()[1]
+            calls.append(token)
+            homeworks = [{'homework_name': f'hw_{token}',
+                          'status': 'approved'}]
+            return MockResponse(token, homeworks, params['from_date'] + 1)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        tenants = [engine.Tenant(str(number), number, timestamp=100)
+                   for number in range(200)]
+        polling = None
+        bot = MockBot(len(tenants), lambda: polling.stop())
+        polling = engine.PollingEngine(
+            bot, tenants, concurrency=8, retry_time=60)
+        asyncio.run(asyncio.wait_for(polling.run(), 5))
+
+        assert sorted(calls) == sorted(str(number) for number in range(200))
+        assert sorted(chat for chat, _ in bot.sent) == list(range(200))
+        assert all(tenant.timestamp == 101 for tenant in tenants)
+        assert len(polling) == len(tenants)
+
+    def test_release_waits_for_running_poll(self, monkeypatch):
+        import engine
+        from storage import StatusStore
+
+        started, finish = threading.Event(), threading.Event()
+
+        def slow_get(url, headers=None, params=None, **kwargs):
+            started.set()
+            finish.wait(5)
+            return MockResponse('a', [{'homework_name': 'hw',
+                                       'status': 'approved'}], 7)
+
+        monkeypatch.setattr(requests, 'get', slow_get)
+        store = StatusStore(':memory:')
+        tenant = engine.Tenant('a', 1, timestamp=0)
+        polling = engine.PollingEngine(
+            MockBot(0, lambda: None), [tenant], store=store)
+        thread = threading.Thread(target=asyncio.run, args=(polling.run(),))
+        thread.start()
+        assert started.wait(5)
+        released = []
+        releasing = threading.Thread(
+            target=lambda: released.append(polling.release([tenant.key])))
+        releasing.start()
+        releasing.join(0.2)
+        assert released == []
+        finish.set()
+        releasing.join(5)
+        assert released == [True]
+        assert store.cursor(tenant.key) == 7
+        assert len(polling) == 0
+        polling.stop()
+        thread.join(5)
+        assert polling.release([tenant.key], timeout=1)
+        store.close()
+
+    def test_stop_does_not_wait_for_stuck_poll(self, monkeypatch):
+        import deadline
+        import engine
+
+        started, finish = threading.Event(), threading.Event()
+
+        def stuck_get(url, headers=None, params=None, **kwargs):
+            started.set()
+            finish.wait(5)
+            return MockResponse('a', [], 7)
+
+        monkeypatch.setattr(requests, 'get', stuck_get)
+        monkeypatch.setattr(deadline, 'stop_at', None)
+        polling = engine.PollingEngine(
+            MockBot(0, lambda: None), [engine.Tenant('a', 1, timestamp=0)])
+        thread = threading.Thread(target=asyncio.run, args=(polling.run(),))
+        thread.start()
+        assert started.wait(5)
+        deadline.stop(0.1)
+        polling.stop()
+        thread.join(2)
+        assert not thread.is_alive()
+        finish.set()
+
+    def test_schedule_seeded_from_store(self):
+        import engine
+        from storage import StatusStore
+
+        store = StatusStore(':memory:')
+        tenant = engine.Tenant('a', 1)
+        store.set_status(tenant.key, 'hw', 'reviewing', changed_at=10)
+        engine.PollingEngine(MockBot(0, lambda: None), [tenant], store=store)
+        assert (tenant.status, tenant.changed_at) == ('reviewing', 10)
+        store.close()
+
+    def test_errors_do_not_leak_token(self, monkeypatch, caplog):
+        import homework
+        from api_client import PracticumClient
+        from utils import MockTelegram
+
+        class Session:
+
+            def __init__(self, outcome):
+                self.outcome = outcome
+
+            def get(self, **parameters):
+                if isinstance(self.outcome, Exception):
+                    raise self.outcome
+                return self.outcome
+
+        failures = [
+            requests.ConnectionError('нет сети'),
+            SimpleNamespace(status_code=500, headers={}, content=b'{}'),
+            SimpleNamespace(status_code=200, headers={},
+                            content=b'{"code": "not_authenticated"}'),
+        ]
+        bot = MockTelegram()
+        headers = homework.auth_headers('SECRET-student-token')
+        with caplog.at_level(logging.DEBUG):
+            for failure in failures:
+                client = PracticumClient(session=Session(failure),
+                                         breaker=None)
+                monkeypatch.setattr(homework, 'get_client', lambda: client)
+                assert homework.run_cycle(
+                    bot, 'mentor-chat', headers, 0) == (0, None)
+        assert len(bot.sent) == len(failures)
+        assert not any('SECRET' in text for text in bot.texts())
+        assert 'SECRET' not in caplog.text
@@ -0,0 +1,102 @@
+import json
+import logging
+import threading
+import urllib.error
+import urllib.request
+
+from engine import PollingEngine, Tenant
+from health import Heartbeat, Watchdog
+from metrics import Registry, start_server
+from send_queue import SendQueue
+from utils import Clock
+
+
+class Blocked:
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def send_message(self, **kwargs):
+        self.release.wait(5)
+
+
+class TestHealth:
+
+    def test_heartbeat(self):
+        clock = Clock(50)
+        heartbeat = Heartbeat(clock)
+        heartbeat.planned('a', 100)
+        assert heartbeat.lag() == 0
+        clock.now = 130
+        assert heartbeat.lag() == 30
+        heartbeat.started('a')
+        heartbeat.finished('a', True)
+        clock.now = 140
+        report = heartbeat.report()
+        assert report['start_lag'] == 30
+        assert report['last_success'] == {'a': 10}
+        heartbeat.forget('a')
+        assert heartbeat.lag() == 0
+
+    def test_engine_plans_polls(self):
+        heartbeat = Heartbeat()
+        tenant = Tenant('token', 1)
+        engine = PollingEngine(None, [tenant], heartbeat=heartbeat)
+        assert tenant.key in heartbeat.plans
+        engine.remove([tenant.key])
+        assert heartbeat.plans == {}
+
+    def test_watchdog_dumps_stacks_once(self, tmp_path, caplog):
+        clock = Clock(0)
+        heartbeat = Heartbeat(clock)
+        heartbeat.planned('a', 0)
+        path = str(tmp_path / 'health.json')
+        watchdog = Watchdog(heartbeat, threshold=10, path=path)
+        stuck = threading.Event()
+        thread = threading.Thread(target=stuck.wait, name='stuck-poll')
+        thread.start()
+        clock.now = 60
+        with caplog.at_level(logging.WARNING):
+            assert watchdog.check()['status'] == 'stalled'
+            watchdog.check()
+            heartbeat.planned('a', 100)
+            assert watchdog.check()['status'] == 'ok'
+        stuck.set()
+        thread.join()
+        errors = [record for record in caplog.records
+                  if record.levelno == logging.ERROR]
+        assert len(errors) == 1
+        assert 'stuck-poll' in errors[0].getMessage()
+        assert 'in wait' in errors[0].getMessage()
+        with open(path, encoding='UTF-8') as file:
+            assert json.load(file)['status'] == 'ok'
+
+    def test_outbound_age_and_endpoint(self):
+        telegram = Blocked()
+        outbound = SendQueue(telegram, workers=1, global_rate=1000,
+                             chat_rate=1000)
+        outbound.send_message(chat_id=1, text='первое')
+        outbound.send_message(chat_id=1, text='второе')
+        registry = Registry()
+        watchdog = Watchdog(Heartbeat(), outbound, threshold=0)
+        watchdog.register(registry)
+        server = start_server(port=0, registry=registry)
+        url = f'http://127.0.0.1:{server.server_port}'
+        try:
+            try:
+                urllib.request.urlopen(url + '/health')
+                raise AssertionError('ожидался код 503')
+            except urllib.error.HTTPError as error:
+                assert error.code == 503
+                report = json.load(error)
+            assert report['outbound_age'] > 0
+            metrics = urllib.request.urlopen(url + '/metrics').read()
+            assert b'homework_send_oldest_seconds' in metrics
+            assert b'homework_poll_lag_seconds 0' in metrics
+            watchdog.threshold = 60
+            with urllib.request.urlopen(url + '/health') as response:
+                assert json.load(response)['status'] == 'ok'
+        finally:
+            server.shutdown()
+            telegram.release.set()
+            outbound.close()
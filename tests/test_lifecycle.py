@@ -0,0 +1,116 @@
+import os
+import signal
+import threading
+import time
+import types
+
+import pytest
+
+import commands
+from storage import StatusStore
+
+
+@pytest.fixture
+def signal_handlers():
+    names = ('SIGTERM', 'SIGINT', 'SIGHUP')
+    saved = {name: signal.getsignal(getattr(signal, name)) for name in names}
+    yield
+    for name, handler in saved.items():
+        signal.signal(getattr(signal, name), handler)
+
+
+def send_later(signum, delay):
+    timer = threading.Timer(delay, os.kill, (os.getpid(), signum))
+    timer.start()
+    return timer
+
+
+class TestLifecycle:
+
+    def test_sleep_interrupted_by_stop(self):
+        from lifecycle import Lifecycle
+
+        lifecycle = Lifecycle(timeout=5)
+        stopped = []
+        lifecycle.on_stop(lambda: stopped.append(True))
+        threading.Timer(0.05, lifecycle.stop).start()
+        started = time.monotonic()
+        assert lifecycle.sleep(60) is True
+        assert time.monotonic() - started < 5
+        assert stopped == [True]
+        assert 0 < lifecycle.remaining() <= 5
+        lifecycle.stop()
+        assert stopped == [True]
+
+    def test_reload_signal(self, signal_handlers):
+        from lifecycle import Lifecycle
+
+        lifecycle = Lifecycle().install()
+        reloaded = threading.Event()
+
+        def fail():
+            raise ValueError('плохой файл')
+
+        lifecycle.on_reload(fail)
+        lifecycle.on_reload(reloaded.set)
+        send_later(signal.SIGHUP, 0.05)
+        assert lifecycle.sleep(60) is False
+        assert reloaded.wait(5)
+
+
+class MockBotFactory:
+    sent = []
+
+    def __init__(self, token, **kwargs):
+        pass
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append(text)
+
+
+class TestGracefulShutdown:
+
+    def test_main_stops_on_sigterm(self, monkeypatch, tmp_path,
+                                   signal_handlers):
+        import deadline
+        import homework
+
+        calls = []
+
+        def fetch_homeworks(timestamp, headers):
+            calls.append(headers['Authorization'])
+            return {'homeworks': [{'homework_name': f'hw{len(calls)}',
+                                   'status': 'approved'}],
+                    'current_date': 100 + len(calls)}
+
+        path = tmp_path / 'store.sqlite3'
+        monkeypatch.setattr(homework, 'fetch_homeworks', fetch_homeworks)
+        monkeypatch.setattr(homework, 'LazyBot', MockBotFactory)
+        monkeypatch.setattr(homework, 'StatusStore',
+                            lambda: StatusStore(path, flush_interval=3600))
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'old')
+        monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', 'telegram')
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '1')
+        monkeypatch.setenv('PRACTICUM_TOKEN', 'new')
+        monkeypatch.setenv('TELEGRAM_CHAT_ID', '1')
+        MockBotFactory.sent = []
+        listener = types.SimpleNamespace(chats=None)
+
+        def start_listener(bot, outbound, store, chats):
+            listener.chats = chats
+            return listener
+
+        monkeypatch.setattr(commands, 'start_listener', start_listener)
+        monkeypatch.setattr(deadline, 'stop_at', None)
+
+        send_later(signal.SIGHUP, 0.2)
+        send_later(signal.SIGTERM, 0.5)
+        started = time.monotonic()
+        homework.main()
+        assert time.monotonic() - started < 5
+        assert calls == ['OAuth old', 'OAuth new']
+        assert len(MockBotFactory.sent) == 2
+        assert listener.chats == {'1': homework.tenant_key('new')}
+        store = StatusStore(path)
+        assert store.cursor(homework.tenant_key('new')) == 102
+        store.close()
@@ -0,0 +1,64 @@
+import json
+import logging
+import queue
+
+import pytest
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+class TestLogging:
+
+    def test_json_lines_with_tenant_and_stage(self, root_logger, tmp_path):
+        from logs import setup_logging, tenant_var
+        from metrics import Registry
+
+        path = tmp_path / 'record.log'
+        listener = setup_logging(path, log_format='json', stream=False)
+        token = tenant_var.set('abc')
+        with Registry().stage('parse'):
+            logging.info('статус %s', 'approved')
+        tenant_var.reset(token)
+        try:
+            raise ValueError('сбой')
+        except ValueError:
+            logging.exception('ошибка')
+        listener.stop()
+        first, second = [json.loads(line)
+                         for line in path.read_text().splitlines()]
+        assert first['message'] == 'статус approved'
+        assert first['tenant'] == 'abc' and first['stage'] == 'parse'
+        assert first['level'] == 'INFO'
+        assert 'tenant' not in second
+        assert second['message'] == 'ошибка'
+        assert 'ValueError: сбой' in second['exception']
+
+    def test_debug_sampling(self):
+        from logs import ContextFilter
+
+        values = iter([0.05, 0.5, 0.05, 0.5])
+        sampler = ContextFilter(sample=0.1, rng=lambda: next(values))
+        records = [logging.LogRecord('x', level, __file__, 1, 'm', (), None)
+                   for level in (logging.DEBUG,) * 4 + (logging.INFO,)]
+        assert [sampler.filter(record) for record in records] == [
+            True, False, True, False, True]
+
+    def test_full_queue_drops_records(self):
+        from logs import DroppingQueueHandler
+
+        handler = DroppingQueueHandler(queue.Queue(1))
+        for _ in range(3):
+            handler.handle(logging.LogRecord(
+                'x', logging.INFO, __file__, 1, 'm', (), None))
+        assert handler.queue.qsize() == 1
+        assert handler.dropped == 2
@@ -0,0 +1,68 @@
+import pytest
+import requests
+
+from exceptions import ErrorApi
+from metrics import Registry, start_server
+
+
+class TestMetrics:
+
+    def test_stage_outcomes(self):
+        registry = Registry()
+        with registry.stage('api'):
+            pass
+        with pytest.raises(ErrorApi):
+            with registry.stage('api'):
+                raise ErrorApi('500')
+        with pytest.raises(ConnectionError):
+            with registry.stage('api'):
+                raise ConnectionError('down')
+        assert registry.stages.count(stage='api', outcome='ok') == 1
+        assert registry.stages.count(stage='api', outcome='error_api') == 1
+        assert registry.stages.count(
+            stage='api', outcome='connection_error') == 1
+
+    def test_render_histogram(self):
+        registry = Registry()
+        registry.stages.observe(0.003, stage='parse', outcome='ok')
+        registry.stages.observe(20, stage='parse', outcome='ok')
+        registry.gauge('queue_depth', 'depth', lambda: 7)
+        text = registry.render()
+        labels = 'outcome="ok",stage="parse"'
+        assert f'_bucket{{{labels},le="0.001"}} 0' in text
+        assert f'_bucket{{{labels},le="0.005"}} 1' in text
+        assert f'_bucket{{{labels},le="+Inf"}} 2' in text
+        assert f'_count{{{labels}}} 2' in text
+        assert 'queue_depth 7' in text
+
+    def test_homework_stages_instrumented(self, monkeypatch):
+        import homework
+
+        class Response:
+            status_code = 500
+
+            def json(self):
+                return {}
+
+        monkeypatch.setattr(requests, 'get', lambda **kwargs: Response())
+        before = homework.REGISTRY.stages.count(
+            stage='api', outcome='error_api')
+        with pytest.raises(ErrorApi):
+            homework.get_api_answer(0)
+        assert homework.REGISTRY.stages.count(
+            stage='api', outcome='error_api') == before + 1
+
+    def test_server(self):
+        registry = Registry()
+        registry.gauge('up', 'up', lambda: 1)
+        server = start_server(0, registry=registry)
+        try:
+            url = f'http://127.0.0.1:{server.server_port}'
+            response = requests.get(f'{url}/metrics')
+            assert response.status_code == 200
+            assert 'up 1' in response.text
+            assert requests.get(f'{url}/other').status_code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert start_server(None) is None
@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+
+import homework
+import outbox as outbox_module
+from digest import DigestQueue
+from outbox import Outbox
+from send_queue import SendQueue
+from utils import MockTelegram
+
+
+class Stalled:
+    """Очередь отправки, которая принимает сообщения и не отправляет их."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, callback=None):
+        self.sent.append((chat_id, text))
+
+
+def records(path):
+    with open(path, encoding='UTF-8') as file:
+        return file.read().splitlines()
+
+
+class TestOutbox:
+
+    def test_delivered_and_acknowledged(self, tmp_path):
+        path = str(tmp_path / 'outbox.log')
+        telegram = MockTelegram()
+        outbound = SendQueue(telegram, workers=1, global_rate=1000,
+                             chat_rate=1000)
+        box = Outbox(outbound, path)
+        box.send_message(chat_id=1, text='первое')
+        box.send_message(chat_id=1, text='второе')
+        outbound.join()
+        assert telegram.sent == [(1, 'первое'), (1, 'второе')]
+        assert box.stats()['pending'] == 0
+        outbound.close()
+        box.close()
+        assert [line.count('"put"') for line in records(path)] == [
+            1, 1, 0, 0]
+
+    def test_replay_after_crash(self, tmp_path):
+        path = str(tmp_path / 'outbox.log')
+        stalled = Stalled()
+        box = Outbox(stalled, path)
+        box.send_message(chat_id=1, text='первое')
+        box.send_message(chat_id=2, text='второе')
+        with open(path, 'ab') as file:
+            file.write(b'{"op": "ack", "id"')
+
+        telegram = MockTelegram()
+        outbound = SendQueue(telegram, workers=1, global_rate=1000,
+                             chat_rate=1000)
+        replayed = Outbox(outbound, path)
+        outbound.join()
+        assert sorted(telegram.sent) == [(1, 'первое'), (2, 'второе')]
+        outbound.close()
+        replayed.close()
+
+        again = Stalled()
+        Outbox(again, path).close()
+        assert again.sent == []
+
+    def test_event_sent_once(self, tmp_path):
+        path = str(tmp_path / 'outbox.log')
+        telegram = MockTelegram()
+        outbound = SendQueue(telegram, workers=1, global_rate=1000,
+                             chat_rate=1000)
+        box = Outbox(outbound, path)
+        event = ('key', 'hw', 'approved', '2022-01-01T00:00:00Z')
+        box.send_message(chat_id=1, text='статус', event=event)
+        box.send_message(chat_id=1, text='статус', event=event)
+        outbound.join()
+        box.close()
+        reopened = Outbox(outbound, path)
+        reopened.send_message(chat_id=1, text='статус', event=event)
+        outbound.join()
+        assert telegram.sent == [(1, 'статус')]
+        outbound.close()
+        reopened.close()
+
+    def test_group_commit(self, tmp_path, monkeypatch):
+        fsync = os.fsync
+
+        def slow_fsync(descriptor):
+            time.sleep(0.01)
+            fsync(descriptor)
+
+        monkeypatch.setattr(outbox_module.os, 'fsync', slow_fsync)
+        stalled = Stalled()
+        box = Outbox(stalled, str(tmp_path / 'outbox.log'))
+        syncs = box.syncs
+        threads = [
+            threading.Thread(target=box.send_message,
+                             kwargs={'chat_id': number, 'text': 'текст'})
+            for number in range(50)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(stalled.sent) == 50
+        assert box.syncs - syncs < 25
+        box.close()
+        assert len(records(box.path)) == 50
+
+    def test_failed_delivery_retried_then_dropped(self, tmp_path):
+        telegram = MockTelegram(fail=ConnectionError('нет сети'))
+        outbound = SendQueue(telegram, workers=1, global_rate=1000,
+                             chat_rate=1000)
+        box = Outbox(outbound, str(tmp_path / 'outbox.log'),
+                     max_attempts=3, retry_delay=0.01)
+        box.send_message(chat_id=1, text='текст')
+        deadline = time.monotonic() + 5
+        while box.stats()['pending'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert box.stats()['pending'] == 0
+        assert outbound.stats()['failed'] == 3
+        outbound.close()
+        box.close()
+
+    def test_run_cycle_after_lost_cursor(self, tmp_path, monkeypatch):
+        response = {'homeworks': [{'homework_name': 'hw',
+                                   'status': 'approved'}],
+                    'current_date': 1}
+        monkeypatch.setattr(homework, 'fetch_homeworks',
+                            lambda timestamp, headers: response)
+        stalled = Stalled()
+        box = Outbox(stalled, str(tmp_path / 'outbox.log'))
+        homework.run_cycle(box, 1, {}, 0, key='key')
+        homework.run_cycle(box, 1, {}, 0, key='key')
+        assert len(stalled.sent) == 1
+        box.close()
+
+    def test_digest_event_logged_before_status(self, tmp_path, monkeypatch):
+        from storage import StatusStore
+
+        response = {'homeworks': [{'homework_name': 'hw',
+                                   'status': 'approved'}],
+                    'current_date': 5}
+        monkeypatch.setattr(homework, 'fetch_homeworks',
+                            lambda timestamp, headers: response)
+        path = str(tmp_path / 'outbox.log')
+        telegram = MockTelegram()
+        outbound = SendQueue(telegram, workers=1, global_rate=1000,
+                             chat_rate=1000)
+        digest = DigestQueue(outbound, window=60)
+        box = Outbox(digest, path)
+        store = StatusStore(':memory:')
+        homework.run_cycle(box, 1, {}, 0, store, 'key')
+        assert store.cursor('key') == 5
+        assert telegram.sent == []
+        assert ['"digest": true' in line for line in records(path)] == [True]
+
+        copy = tmp_path / 'crashed.log'
+        copy.write_bytes(open(path, 'rb').read())
+        replayed = Outbox(DigestQueue(Stalled(), window=60), str(copy))
+        assert replayed.outbound.pending[1][1] == [telegram_text(response)]
+        replayed.close()
+
+        digest.close()
+        outbound.join()
+        assert telegram.sent == [(1, telegram_text(response))]
+        assert box.stats()['pending'] == 0
+        outbound.close()
+        box.close()
+        store.close()
+
+
+def telegram_text(response):
+    return homework.parse_status(response['homeworks'][0])
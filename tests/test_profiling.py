@@ -0,0 +1,141 @@
+import logging
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+import api_client
+import homework
+from benchmarks.simulation import Response
+from profiling import PROFILER, Profiler
+from utils import MockTelegram
+
+
+class Transport:
+
+    def get(self, **parameters):
+        return Response.of({'homeworks': [
+            {'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 1})
+
+
+@pytest.fixture
+def profiler(tmp_path, monkeypatch):
+    monkeypatch.setattr(PROFILER, 'directory', str(tmp_path))
+    previous = api_client.set_client(api_client.PracticumClient(
+        session=Transport(), breaker=None))
+    yield PROFILER
+    api_client.set_client(previous)
+    PROFILER.requested = 0
+
+
+class TestProfiler:
+
+    def test_disabled_overhead(self, tmp_path):
+        profiler = Profiler(directory=str(tmp_path))
+
+        def cycle():
+            return 1
+
+        wrapped = profiler.cycle(cycle)
+        started = time.perf_counter()
+        for _ in range(100000):
+            wrapped()
+        elapsed = time.perf_counter() - started
+        assert wrapped() == 1
+        assert elapsed / 100000 < 2e-6
+        assert os.listdir(tmp_path) == []
+
+    def test_profiles_requested_cycles(self, profiler, tmp_path, caplog):
+        bot = MockTelegram()
+        profiler.request(3)
+        with caplog.at_level(logging.INFO):
+            for _ in range(5):
+                homework.run_cycle(bot, 1, {}, 0)
+        assert len(bot.sent) == 5
+        files = sorted(os.listdir(tmp_path))
+        assert len(files) == 2
+        assert files[0].endswith('.pstats')
+        with open(tmp_path / files[1], encoding='UTF-8') as file:
+            report = file.read()
+        assert 'Профиль 3 циклов' in report
+        for name in ('run_cycle', 'fetch_homeworks', 'check_response',
+                     'parse_status', 'send_chat_message'):
+            assert f'  {name}: вызовов 3,' in report
+        assert report in caplog.text
+
+    def test_cycles_from_threads_merged(self, tmp_path):
+        profiler = Profiler(directory=str(tmp_path))
+        barrier = threading.Barrier(4)
+
+        @profiler.cycle
+        def cycle():
+            barrier.wait(5)
+
+        profiler.request(4)
+        threads = [threading.Thread(target=cycle) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        reports = [name for name in os.listdir(tmp_path)
+                   if name.endswith('.txt')]
+        assert len(reports) == 1
+        assert profiler.requested == profiler.running == 0
+
+    def test_single_active_profiler(self, tmp_path, monkeypatch):
+        import cProfile
+
+        active = []
+
+        class Exclusive(cProfile.Profile):
+            """Как cProfile в Python 3.12+: включён может быть только один."""
+
+            def enable(self, *args, **kwargs):
+                if active:
+                    raise ValueError('Another profiling tool is already '
+                                     'active')
+                active.append(self)
+                super().enable(*args, **kwargs)
+
+            def disable(self):
+                super().disable()
+                if self in active:
+                    active.remove(self)
+
+        monkeypatch.setattr(cProfile, 'Profile', Exclusive)
+        profiler = Profiler(directory=str(tmp_path))
+        barrier = threading.Barrier(3)
+        results = []
+
+        @profiler.cycle
+        def cycle():
+            barrier.wait(5)
+            return 1
+
+        profiler.request(3)
+        threads = [threading.Thread(target=lambda: results.append(cycle()))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [1, 1, 1]
+        assert profiler.requested == profiler.running == 0
+        reports = [name for name in os.listdir(tmp_path)
+                   if name.endswith('.txt')]
+        assert len(reports) == 1
+        with open(tmp_path / reports[0], encoding='UTF-8') as file:
+            assert 'Профиль 3 циклов' in file.read()
+
+    def test_signal_arms_profiler(self, tmp_path):
+        previous = signal.getsignal(signal.SIGUSR1)
+        profiler = Profiler(directory=str(tmp_path), signal_cycles=7)
+        try:
+            profiler.install()
+            os.kill(os.getpid(), signal.SIGUSR1)
+            assert profiler.requested == 7
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
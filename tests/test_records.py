@@ -0,0 +1,41 @@
+import pytest
+
+from records import Homework, Status, to_records
+
+
+class TestRecords:
+
+    def test_statuses_match_verdicts(self):
+        import homework
+
+        assert {status.value for status in Status} == set(
+            homework.HOMEWORK_STATUSES)
+
+    def test_from_payload(self):
+        items = [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+             'reviewer_comment': 'ок', 'date_updated': '2022-01-01T00:00:00Z'},
+            {'homework_name': 'hw2', 'status': 'rejected'},
+        ]
+        first, second = to_records(items)
+        assert first == Homework('hw1', Status.APPROVED,
+                                 '2022-01-01T00:00:00Z')
+        assert second.status is Status.REJECTED
+        assert second.date_updated is None
+        assert not hasattr(first, '__dict__')
+
+    @pytest.mark.parametrize('item', [
+        {'homework_name': 'hw', 'status': 'unknown'},
+        {'homework_name': 'hw'},
+        {'status': 'approved'},
+    ])
+    def test_invalid_payload(self, item):
+        with pytest.raises(KeyError):
+            Homework.from_payload(item)
+
+    def test_parse_status_accepts_records_and_dicts(self):
+        import homework
+
+        record = Homework('hw', Status.REVIEWING)
+        assert homework.parse_status(record) == homework.parse_status(
+            {'homework_name': 'hw', 'status': 'reviewing'})
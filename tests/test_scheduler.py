@@ -0,0 +1,61 @@
+import random
+
+from records import Homework, Status
+from scheduler import AdaptiveSchedule
+
+
+class TestAdaptiveSchedule:
+
+    def test_reviewing_polled_faster(self):
+        schedule = AdaptiveSchedule(jitter=0)
+        now = 10 ** 6
+        assert schedule.interval('reviewing', now, now) < schedule.interval(
+            None, now, now)
+        assert schedule.interval('reviewing', 0, now) == schedule.interval(
+            'reviewing', now, now)
+
+    def test_idle_backoff_capped(self):
+        schedule = AdaptiveSchedule(default=600, max_interval=3600,
+                                    idle_step=86400, jitter=0)
+        now = 10 ** 7
+        assert schedule.interval('rejected', now, now) == 600
+        assert schedule.interval('rejected', now - 86400, now) == 1200
+        assert schedule.interval('approved', 0, now) == 3600
+
+    def test_jitter_bounds(self):
+        schedule = AdaptiveSchedule(jitter=0.1, rng=random.Random(1))
+        delays = {schedule.next_delay(None, 0, 0) for _ in range(100)}
+        assert len(delays) > 1
+        assert all(540 <= delay <= 660 for delay in delays)
+
+    def test_observe_status_change(self):
+        schedule = AdaptiveSchedule()
+        homeworks = [Homework('hw', Status.REVIEWING)]
+        assert schedule.observe(None, 1, homeworks, 5) == ('reviewing', 5)
+        assert schedule.observe('reviewing', 5, homeworks, 9) == (
+            'reviewing', 5)
+        assert schedule.observe('reviewing', 5, [], 9) == ('reviewing', 5)
+        assert schedule.observe('reviewing', 5, None, 9) == ('reviewing', 5)
+
+    def test_observe_newest_or_reviewing(self):
+        schedule = AdaptiveSchedule()
+        older = Homework('old', Status.APPROVED, date_updated='2022-01-01')
+        newer = Homework('new', Status.REJECTED, date_updated='2022-02-01')
+        assert schedule.observe(None, 1, [older, newer], 5) == (
+            'rejected', 5)
+        reviewing = Homework('hw', Status.REVIEWING, date_updated='2021')
+        assert schedule.observe(None, 1, [newer, reviewing], 5) == (
+            'reviewing', 5)
+
+    def test_seed_from_store(self):
+        from storage import StatusStore
+
+        store = StatusStore(':memory:')
+        schedule = AdaptiveSchedule()
+        assert schedule.seed(store, 'key', 50) == (None, 50)
+        store.set_status('key', 'hw', 'reviewing', changed_at=10)
+        store.set_status('key', 'other', 'approved', changed_at=20)
+        assert schedule.seed(store, 'key', 50) == ('reviewing', 20)
+        store.set_status('key', 'hw', 'approved', changed_at=30)
+        assert schedule.seed(store, 'key', 50) == ('approved', 30)
+        store.close()
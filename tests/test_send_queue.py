@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from exceptions import ErrorTimeout
+from send_queue import LazyBot, SendQueue, TokenBucket
+
+
+class RetryAfter(Exception):
+
+    def __init__(self, retry_after):
+        super().__init__(f'Flood control exceeded. Retry in {retry_after}')
+        self.retry_after = retry_after
+
+
+class MockBot:
+
+    def __init__(self, fail_first=0):
+        self.sent = []
+        self.fail_first = fail_first
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        with self.lock:
+            if self.fail_first:
+                self.fail_first -= 1
+                raise RetryAfter(0.01)
+            self.sent.append((chat_id, text, time.monotonic()))
+
+
+class TestTokenBucket:
+
+    def test_reserve(self):
+        now = [0]
+        bucket = TokenBucket(2, clock=lambda: now[0])
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0.5
+        now[0] = 1.5
+        assert bucket.reserve() == 0
+
+
+class TestSendQueue:
+
+    def test_order_and_chat_rate(self):
+        bot = MockBot()
+        outbound = SendQueue(bot, workers=3, global_rate=1000, chat_rate=50)
+        for number in range(5):
+            for chat in range(4):
+                outbound.send_message(chat_id=chat, text=str(number))
+        outbound.join()
+        outbound.close()
+        for chat in range(4):
+            times = [at for chat_id, _, at in bot.sent if chat_id == chat]
+            texts = [text for chat_id, text, _ in bot.sent if chat_id == chat]
+            assert texts == ['0', '1', '2', '3', '4']
+            assert times[-1] - times[0] >= 4 / 50 - 0.01
+        stats = outbound.stats()
+        assert stats['sent'] == 20
+        assert stats['depth'] == 0
+        assert stats['wait_max'] >= stats['wait_avg'] > 0
+
+    def test_rate_limited_chat_does_not_block_others(self):
+        bot = MockBot()
+        outbound = SendQueue(bot, workers=1, global_rate=1000, chat_rate=2)
+        started = time.monotonic()
+        for chat in range(10):
+            outbound.send_message(chat_id=chat, text='первое')
+            outbound.send_message(chat_id=chat, text='второе')
+        outbound.join()
+        elapsed = time.monotonic() - started
+        outbound.close()
+        assert elapsed < 1.5
+        assert [text for _, text, _ in bot.sent[:10]] == ['первое'] * 10
+        for chat in range(10):
+            assert [text for chat_id, text, _ in bot.sent
+                    if chat_id == chat] == ['первое', 'второе']
+        assert outbound.depth() == 0
+
+    def test_retry_after(self):
+        bot = MockBot(fail_first=2)
+        outbound = SendQueue(bot, workers=1)
+        outbound.send_message(chat_id=1, text='hi')
+        outbound.close()
+        assert [text for _, text, _ in bot.sent] == ['hi']
+        assert outbound.stats()['failed'] == 0
+
+
+class TestLazyBot:
+
+    def test_timeouts(self):
+        import telegram.error
+
+        lazy = LazyBot('123:abc', connect_timeout=1, read_timeout=2)
+        request = lazy.connect().request
+        assert request.con_pool_size >= 2
+
+        class TimingOut:
+            def send_message(self, **kwargs):
+                raise telegram.error.TimedOut()
+
+        lazy.bot = TimingOut()
+        with pytest.raises(ErrorTimeout):
+            lazy.send_message(chat_id=1, text='hi')
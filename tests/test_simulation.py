@@ -0,0 +1,59 @@
+import random
+
+import homework
+from benchmarks.simulation import (Cassette, Recorder, SyntheticApi,
+                                   VirtualClock, main, simulate)
+from storage import tenant_key
+
+
+def run(transport, clock, **kwargs):
+    result, store = simulate(transport, clock, seed=1, **kwargs)
+    return result, store
+
+
+class TestSimulation:
+
+    def test_synthetic_months(self):
+        clock = VirtualClock(1_600_000_000)
+        api = SyntheticApi(clock, slots=3, rng=random.Random(1))
+        result, store = run(api, clock, days=60)
+        key = tenant_key('simulation')
+        assert result['virtual_days'] >= 60
+        assert result['cycles'] == api.requests > 1000
+        assert 0 < result['messages'] <= api.changes
+        assert result['cycles_per_sec'] > 100
+        history = store.history(key, 1000)
+        assert history
+        assert all(1_600_000_000 <= changed_at <= clock.time()
+                   for _, _, changed_at in history)
+        store.close()
+        assert homework.PRACTICUM_TOKEN != 'simulation'
+
+    def test_errors_reported(self):
+        clock = VirtualClock(0)
+        api = SyntheticApi(clock, error_rate=1, rng=random.Random(1))
+        result, store = run(api, clock, cycles=5)
+        assert result['cycles'] == 5
+        assert result['messages'] == 1
+        store.close()
+
+    def test_replay_matches_recording(self, tmp_path):
+        path = tmp_path / 'cassette.jsonl'
+        clock = VirtualClock(1_600_000_000)
+        api = SyntheticApi(clock, rng=random.Random(2), error_rate=0.05)
+        recorder = Recorder(api, path)
+        first, store = run(recorder, clock, cycles=300)
+        recorder.close()
+        store.close()
+
+        clock = VirtualClock(1_600_000_000)
+        cassette = Cassette(path)
+        second, store = run(cassette, clock, cycles=300)
+        store.close()
+        assert cassette.replayed == 300
+        assert second['messages'] == first['messages'] > 0
+
+    def test_threshold_exit_code(self, capsys):
+        assert main(['synthetic', '--days', '1', '--seed', '1',
+                     '--min-cycles-per-sec', '1e9']) == 1
+        assert '"cycles_per_sec"' in capsys.readouterr().out
@@ -0,0 +1,29 @@
+from startup import parse_importtime, profile
+
+IMPORTTIME = '''import time: self [us] | cumulative | imported package
+import time:       316 |       4405 | dotenv
+import time:       903 |       1641 |     http.server
+import time:      2195 |       3836 |   metrics
+'''
+
+
+class TestStartup:
+
+    def test_parse_importtime(self):
+        assert parse_importtime(IMPORTTIME) == [
+            ('dotenv', 0.316, 4.405, 0),
+            ('http.server', 0.903, 1.641, 2),
+            ('metrics', 2.195, 3.836, 1),
+        ]
+
+    def test_telegram_not_loaded_before_first_poll(self, tmp_path,
+                                                   monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        log_path = tmp_path / 'record.log'
+        result = profile(log_path=log_path)
+        assert log_path.exists()
+        assert result['first_poll'] > 0
+        assert result['imports'] > 0
+        assert 'requests' in result['loaded']
+        assert 'telegram' not in result['loaded']
+        assert 'http.server' not in result['loaded']
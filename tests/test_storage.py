@@ -0,0 +1,84 @@
+from storage import StatusStore, tenant_key
+from utils import MockTelegram
+
+
+class TestStatusStore:
+
+    def test_restart_resumes_cursor_and_statuses(self, tmp_path):
+        path = tmp_path / 'store.sqlite3'
+        key = tenant_key('token')
+        store = StatusStore(path)
+        store.set_cursor(key, 100)
+        store.set_status(key, 'hw', 'reviewing')
+        store.close()
+
+        store = StatusStore(path)
+        assert store.cursor(key) == 100
+        assert store.status(key, 'hw') == 'reviewing'
+        assert store.cursor(tenant_key('other'), 7) == 7
+        store.close()
+
+    def test_writes_batched(self, tmp_path):
+        path = tmp_path / 'store.sqlite3'
+        store = StatusStore(path, batch_size=3, flush_interval=3600)
+        store.set_cursor('a', 1)
+        store.set_cursor('a', 2)
+        store.set_status('a', 'hw', 'approved')
+        assert store.pending() == 2
+        store.set_cursor('b', 1)
+        assert store.pending() == 0
+        assert StatusStore(path).cursor('a') == 2
+        store.close()
+
+    def test_status_not_resent_after_restart(self, monkeypatch, tmp_path):
+        import homework
+
+        response = {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 200,
+        }
+        monkeypatch.setattr(homework, 'fetch_homeworks',
+                            lambda timestamp, headers: response)
+        path = tmp_path / 'store.sqlite3'
+        bot = MockTelegram()
+        store = StatusStore(path)
+        assert homework.run_cycle(bot, 1, {}, 100, store, 'k')[0] == 200
+        store.close()
+
+        store = StatusStore(path)
+        homework.run_cycle(bot, 1, {}, store.cursor('k'), store, 'k')
+        store.close()
+        assert len(bot.sent) == 1
+
+    def test_every_changed_homework_sent_once(self, monkeypatch, tmp_path):
+        import homework
+
+        response = {
+            'homeworks': [
+                {'homework_name': 'new', 'status': 'reviewing',
+                 'date_updated': '2022-01-02T00:00:00Z'},
+                {'homework_name': 'old', 'status': 'approved',
+                 'date_updated': '2022-01-01T00:00:00Z'},
+                {'homework_name': 'same', 'status': 'approved',
+                 'date_updated': '2021-12-01T00:00:00Z'},
+            ],
+            'current_date': 200,
+        }
+        rendered = []
+        parse_status = homework.parse_status
+        monkeypatch.setattr(homework, 'fetch_homeworks',
+                            lambda timestamp, headers: response)
+        monkeypatch.setattr(
+            homework, 'parse_status',
+            lambda hw: rendered.append(hw.name) or parse_status(hw))
+        store = StatusStore(tmp_path / 'store.sqlite3')
+        store.set_status('k', 'same', 'approved')
+        bot = MockTelegram()
+
+        homework.run_cycle(bot, 1, {}, 100, store, 'k')
+        homework.run_cycle(bot, 1, {}, 200, store, 'k')
+        store.close()
+        assert rendered == ['old', 'new']
+        assert len(bot.sent) == 2
+        assert bot.texts()[0].startswith(
+            'Изменился статус проверки работы "old"')
@@ -0,0 +1,140 @@
+import multiprocessing
+import time
+
+import pytest
+
+CONTEXT = multiprocessing.get_context('fork')
+OBSERVED = None
+
+
+def fake_worker(number, entries, control, events):
+    OBSERVED.put(('started', number, sorted(e['token'] for e in entries)))
+    while True:
+        command, payload = control.get()
+        if command == 'add':
+            OBSERVED.put(('added', number,
+                          sorted(e['token'] for e in payload)))
+        elif command == 'remove':
+            events.put(('removed', number, payload))
+        else:
+            return
+
+
+def stuck_worker(number, entries, control, events):
+    OBSERVED.put(('started', number, sorted(e['token'] for e in entries)))
+    while True:
+        command, payload = control.get()
+        if command == 'add':
+            OBSERVED.put(('added', number,
+                          sorted(e['token'] for e in payload)))
+        elif command == 'remove':
+            OBSERVED.put(('removing', number, sorted(payload)))
+        else:
+            return
+
+
+def collect(count, timeout=10):
+    return [OBSERVED.get(timeout=timeout) for _ in range(count)]
+
+
+class TestHashRing:
+
+    def test_deterministic_and_balanced(self):
+        from supervisor import HashRing
+
+        keys = [f'tenant{number}' for number in range(3000)]
+        ring, other = HashRing(range(4)), HashRing(reversed(range(4)))
+        first = [ring.node(key) for key in keys]
+        second = [other.node(key) for key in keys]
+        assert first == second
+        for node in range(4):
+            assert 500 < first.count(node) < 1000
+
+    def test_only_removed_node_keys_move(self):
+        from supervisor import HashRing
+
+        keys = [f'tenant{number}' for number in range(1000)]
+        ring = HashRing(range(4))
+        before = {key: ring.node(key) for key in keys}
+        ring.remove(2)
+        after = {key: ring.node(key) for key in keys}
+        for key in keys:
+            if before[key] != 2:
+                assert after[key] == before[key]
+            else:
+                assert after[key] != 2
+        ring.add(2)
+        assert {key: ring.node(key) for key in keys} == before
+
+    def test_empty_ring(self):
+        from supervisor import HashRing
+
+        with pytest.raises(LookupError):
+            HashRing().node('tenant')
+
+
+class TestSupervisor:
+
+    def test_rebalance_on_worker_death(self, monkeypatch):
+        import supervisor
+
+        monkeypatch.setattr(
+            __import__(__name__), 'OBSERVED', CONTEXT.Queue())
+        entries = [{'token': f'token{number}', 'chat_id': number}
+                   for number in range(30)]
+        pool = supervisor.Supervisor(entries, workers=3, target=fake_worker,
+                                     restart_delay=60, context=CONTEXT)
+        pool.start()
+        shards = {number: tokens for _, number, tokens in collect(3)}
+        assert sorted(sum(shards.values(), [])) == sorted(
+            entry['token'] for entry in entries)
+
+        pool.processes[0].terminate()
+        pool.processes[0].join()
+        now = time.monotonic()
+        pool.check(now)
+        added = collect(len({pool.owners[supervisor.tenant_key(token)]
+                             for token in shards[0]}))
+        assert sorted(sum((tokens for _, _, tokens in added), [])) == (
+            sorted(shards[0]))
+        assert {number for _, number, _ in added} <= {1, 2}
+        assert 0 not in pool.processes
+
+        pool.check(now + 61)
+        assert collect(1) == [('started', 0, shards[0])]
+        assert set(pool.owners.values()) == {0, 1, 2}
+        pool.stop()
+        assert not any(process.is_alive()
+                       for process in pool.processes.values())
+
+    def test_unreleased_keys_wait_for_removed(self, monkeypatch):
+        import supervisor
+
+        monkeypatch.setattr(
+            __import__(__name__), 'OBSERVED', CONTEXT.Queue())
+        entries = [{'token': f'token{number}', 'chat_id': number}
+                   for number in range(30)]
+        pool = supervisor.Supervisor(
+            entries, workers=2, target=stuck_worker, restart_delay=60,
+            context=CONTEXT, handover_timeout=0.1)
+        pool.start()
+        shards = {number: tokens for _, number, tokens in collect(2)}
+        pool.processes[0].terminate()
+        pool.processes[0].join()
+        now = time.monotonic()
+        pool.check(now)
+        assert collect(1) == [('added', 1, shards[0])]
+
+        pool.check(now + 61)
+        removing, started = sorted(collect(2))
+        assert removing[:2] == ('removing', 1)
+        assert started == ('started', 0, [])
+        assert set(pool.handover.values()) == {1}
+        assert all(pool.owners[key] == 0 for key in removing[2])
+
+        pool.events.put(('removed', 1, removing[2]))
+        deadline = time.monotonic() + 10
+        while pool.handover and time.monotonic() < deadline:
+            pool.check()
+        assert collect(1) == [('added', 0, shards[0])]
+        pool.stop()
@@ -0,0 +1,64 @@
+from suppression import ErrorSuppressor, fingerprint
+from utils import Clock, MockTelegram
+
+
+class TestErrorSuppressor:
+
+    def test_fingerprint_ignores_numbers(self):
+        assert fingerprint(ConnectionError('timeout 1639661979')) == (
+            fingerprint(ConnectionError('timeout 1639662579')))
+        assert fingerprint(ConnectionError('x')) != fingerprint(
+            ValueError('x'))
+
+    def test_repeats_suppressed_then_summarized(self):
+        clock = Clock()
+        errors = ErrorSuppressor(window=60, clock=clock)
+        error = ConnectionError('down 1')
+        assert errors.failure(1, error, 'down') == 'down'
+        for second in range(1, 5):
+            clock.now = second
+            assert errors.failure(1, error, 'down') is None
+        assert errors.failure(2, error, 'down') == 'down'
+        clock.now = 61
+        summary = errors.failure(1, error, 'down')
+        assert summary.startswith('Сбой продолжается (повторов: 5)')
+        assert errors.recovery(1) == (
+            'Работа восстановлена. Ошибок за время сбоя: 6')
+        assert errors.recovery(1) is None
+        assert errors.failure(1, error, 'down') == 'down'
+
+    def test_bounded_per_chat(self):
+        errors = ErrorSuppressor(max_size=3)
+        for number in range(10):
+            errors.failure(1, ValueError(f'x{"y" * number}'), 'x')
+        assert len(errors) == 3
+        assert errors.recovery(1) == (
+            'Работа восстановлена. Ошибок за время сбоя: 10')
+
+    def test_many_chats_suppressed(self):
+        errors = ErrorSuppressor(max_size=3)
+        sent = sum(
+            errors.failure(chat, ValueError('x'), 'x') is not None
+            for _ in range(3) for chat in range(2000))
+        assert sent == 2000
+        assert all(errors.recovery(chat) for chat in range(2000))
+        assert len(errors) == 0
+
+    def test_run_cycle_sends_error_once(self, monkeypatch):
+        import homework
+
+        bot = MockTelegram()
+
+        def fail(timestamp, headers):
+            raise ConnectionError('Соединение прервано')
+
+        monkeypatch.setattr(homework, 'fetch_homeworks', fail)
+        errors = ErrorSuppressor(window=3600)
+        for _ in range(3):
+            homework.run_cycle(bot, 1, {}, 0, errors=errors)
+        assert len(bot.sent) == 1
+        monkeypatch.setattr(homework, 'fetch_homeworks',
+                            lambda timestamp, headers: {'homeworks': [],
+                                                        'current_date': 1})
+        homework.run_cycle(bot, 1, {}, 0, errors=errors)
+        assert bot.texts()[-1].startswith('Работа восстановлена')
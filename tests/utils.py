@@ -1,3 +1,4 @@
+import threading
 from inspect import signature
 from types import ModuleType
 
@@ -37,3 +38,34 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class Clock:
+    """Подменные часы: текущее время задаётся полем now."""
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class MockTelegram:
+    """Бот или очередь отправки, которые запоминают (chat_id, text).
+
+    Если задано исключение fail, оно бросается при каждой отправке.
+    """
+
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.fail is not None:
+            raise self.fail
+        with self.lock:
+            self.sent.append((chat_id, text))
+
+    def texts(self):
+        """Тексты отправленных сообщений по порядку."""
+        return [text for _, text in self.sent]